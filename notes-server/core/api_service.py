@@ -1,29 +1,107 @@
 import subprocess, os
+import copy
+import threading
+import time
+from collections import OrderedDict
 from yt_dlp import YoutubeDL
-from openai import OpenAI
 import json, re
 import pandas as pd
 
 from base_config import *
-from faster_whisper import WhisperModel
-
-
-def ytdlp_filename(url):
-    with YoutubeDL({}) as ydl:
-        info_dict = ydl.extract_info(url, download=False)
-        filename = ydl.prepare_filename(info_dict)
-        filename = filename.split(".")[0]
-        return filename
-
-
-def ytdlp_downloader(url):
-    download_folder = UPLOAD_DIR
-    ydl_opts = {
-        'format': 'bv*[ext=mp4]+ba[ext=m4a]/b[ext=mp4] / bv*+ba/b',
-        'paths': {'home': download_folder},
-    }
-    with YoutubeDL(ydl_opts) as ydl:
-        ydl.download(url)
+from model_pool import whisper_model_pool
+from whispercpp_server import whispercpp_server
+from audio import decode_wav_bytes, decode_audio
+from artifacts import atomic_write, normalize_source
+from transcript import parse_subtitle_file
+
+
+YTDLP_VIDEO_OPTS = {
+    'format': 'bv*[ext=mp4]+ba[ext=m4a]/b[ext=mp4] / bv*+ba/b',
+    'merge_output_format': 'mp4',
+    'paths': {'home': UPLOAD_DIR},
+}
+# 仅音频：转写和总结只需要音轨，视频流等到播放时再拉取
+YTDLP_AUDIO_OPTS = {
+    'format': 'ba[ext=m4a]/ba/b',
+    'paths': {'home': UPLOAD_DIR},
+}
+
+# 播放列表/频道只展开条目(extract_flat)，不解析每个视频的格式
+YTDLP_FLAT_OPTS = {
+    'extract_flat': 'in_playlist',
+    'paths': {'home': UPLOAD_DIR},
+}
+
+# 元数据缓存: 规范化URL -> (过期时间, info)，命名和下载共用同一份info
+_info_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_info_lock = threading.Lock()
+# YoutubeDL实例不是线程安全的，按线程复用
+_ydl_local = threading.local()
+
+
+def _get_ydl(ydl_opts=YTDLP_VIDEO_OPTS):
+    instances = getattr(_ydl_local, 'instances', None)
+    if instances is None:
+        instances = _ydl_local.instances = {}
+    key = id(ydl_opts)
+    if key not in instances:
+        instances[key] = YoutubeDL(ydl_opts)
+    return instances[key]
+
+
+def ytdlp_extract_info(url, ydl_opts=YTDLP_VIDEO_OPTS):
+    """extract_info(download=False)只做一次，TTL内重复URL直接复用."""
+    key = normalize_source(url)
+    now = time.monotonic()
+    with _info_lock:
+        cached = _info_cache.get(key)
+        if cached and cached[0] > now:
+            _info_cache.move_to_end(key)
+            return cached[1]
+    info_dict = _get_ydl(ydl_opts).extract_info(url, download=False)
+    with _info_lock:
+        _info_cache[key] = (now + YTDLP_INFO_TTL, info_dict)
+        while len(_info_cache) > YTDLP_INFO_CACHE_SIZE:
+            _info_cache.popitem(last=False)
+    return info_dict
+
+
+def ytdlp_playlist_entries(url, ydl_opts=YTDLP_FLAT_OPTS):
+    """展开播放列表/频道，返回[(url, title)]；单个视频返回它自己."""
+    info_dict = _get_ydl(ydl_opts).extract_info(url, download=False)
+    if info_dict.get('entries') is None:
+        return [(info_dict.get('webpage_url') or url, info_dict.get('title'))]
+    entries = []
+
+    def collect(info):
+        for entry in info.get('entries') or ():
+            if not entry:
+                continue
+            # 频道下的各个tab/子播放列表
+            if entry.get('entries') is not None:
+                collect(entry)
+                continue
+            entry_url = entry.get('webpage_url') or entry.get('url')
+            if entry_url and entry_url.startswith(('http://', 'https://')):
+                entries.append((entry_url, entry.get('title')))
+
+    collect(info_dict)
+    return entries
+
+
+def ytdlp_filename(url, info_dict=None, ydl_opts=YTDLP_VIDEO_OPTS):
+    info_dict = info_dict or ytdlp_extract_info(url, ydl_opts)
+    filename = _get_ydl(ydl_opts).prepare_filename(info_dict)
+    filename = os.path.splitext(os.path.basename(filename))[0]
+    return filename
+
+
+def ytdlp_downloader(url, info_dict=None, ydl_opts=YTDLP_VIDEO_OPTS):
+    """用已提取的info直接下载，不再重复extract_info；按ydl_opts重新选择格式，返回下载后的文件路径."""
+    info_dict = info_dict or ytdlp_extract_info(url, ydl_opts)
+    result = _get_ydl(ydl_opts).process_ie_result(copy.deepcopy(info_dict), download=True)
+    downloads = (result or {}).get('requested_downloads') or [{}]
+    return downloads[0].get('filepath')
 
 
 def generate_wav(video_path):
@@ -52,37 +130,9 @@ def generate_srt_by_whispercpp(video_path):
 
 def parse_srt_to_transcript_segments(whispercpp_srt_path):
     """
-    将 SRT 字幕文件解析为 TranscriptSegment 格式
-    """
+    将 SRT/VTT 字幕文件解析为 TranscriptSegment 格式的dict列表(单遍解析，跳过序号行)
     """
-    解析 SRT 文件并返回时间戳和文本
-    """
-    pattern = re.compile(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})')
-    segments = []
-
-    with open(whispercpp_srt_path, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-
-    current_segment = None
-
-    for line in lines:
-        line = line.strip()
-        if pattern.match(line):
-            if current_segment:
-                segments.append(current_segment)
-            start_time, end_time = pattern.findall(line)[0]
-            current_segment = {
-                "start": srt_time_to_seconds(start_time),
-                "end": srt_time_to_seconds(end_time),
-                "text": ""
-            }
-        elif current_segment:
-            current_segment["text"] += line + " "
-
-    if current_segment:
-        segments.append(current_segment)
-
-    return segments
+    return parse_subtitle_file(whispercpp_srt_path).to_dicts()
 
 
 def srt_time_to_seconds(time_str):
@@ -91,7 +141,30 @@ def srt_time_to_seconds(time_str):
     return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
 
 
+def seconds_to_srt_time(seconds):
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def write_srt(segments, srt_path):
+    """segments: [(start, end, text), ...]，先写临时文件再替换，避免读到半个文件."""
+    with atomic_write(srt_path) as f:
+        for i, (start, end, text) in enumerate(segments, 1):
+            f.write(f"{i}\n{seconds_to_srt_time(start)} --> {seconds_to_srt_time(end)}\n{text.strip()}\n\n")
+    return srt_path
+
+
 def detect_lang_by_whispercpp(new_wave_path):
+    if WHISPERCPP_USE_SERVER:
+        try:
+            output = whispercpp_server.inference(new_wave_path, response_format="verbose_json", language="auto")
+            return output.get('language') or output.get('detected_language')
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
     main = f'{WHISPERCPP_PATH}/main'
     model = f'{WHISPERCPP_PATH}/models/ggml-{WHISPERCPP_MODEL}.bin'
     command = [
@@ -132,28 +205,53 @@ def _generate_srt_by_whispercpp(new_wave_path):
         raise IOError(f"Failed to generate srt {e}.") from e
 
 
+def generate_srt_by_whispercpp_stream(video_path, srt_path=None):
+    """ffmpeg解码到内存后直接提交给whisper.cpp server，不落盘中间wav."""
+    srt_path = srt_path or video_path[:-4] + '.srt'
+    try:
+        wav = decode_wav_bytes(video_path)
+        # if '中文':
+        srt = whispercpp_server.inference(wav, language='zh', prompt=CHINESE_PROMPT)
+        with atomic_write(srt_path) as f:
+            f.write(srt)
+        print("finish srt generation")
+        return srt_path
+    except Exception as e:
+        raise IOError(f"Failed to generate srt {e}.") from e
+
+
 def generate_srt_by_fasterwhisper(file_path, lang = 'en', prompt = '单行尽量简洁'):
-    device = 'cpu'
     model_name = FASTERWHISPER_MODEL
     temp = 0.8
     vad = False
     beam_size = 5
     min_vad = 500
-    model = WhisperModel(model_name, device)
-    segments, _ = model.transcribe(file_path,
-                                   initial_prompt=prompt,
-                                   language=lang,
-                                   beam_size=beam_size,
-                                   vad_filter=vad,
-                                   vad_parameters=dict(min_silence_duration_ms=min_vad),
-                                   temperature=temp
-                                   )
-
-    result = fasterwhisper_result_dict(segments)
+    # 路径则经ffmpeg管道解码为float32数组；也可直接传入已解码的数组
+    audio = decode_audio(file_path) if isinstance(file_path, str) else file_path
+    with whisper_model_pool.lease(model_name) as model:
+        segments, _ = model.transcribe(audio,
+                                       initial_prompt=prompt,
+                                       language=lang,
+                                       beam_size=beam_size,
+                                       vad_filter=vad,
+                                       vad_parameters=dict(min_silence_duration_ms=min_vad),
+                                       temperature=temp
+                                       )
+
+        result = fasterwhisper_result_dict(segments)
     print(result['text'])
     return result
 
 
+def iter_segments_by_fasterwhisper(file_path, lang='zh', prompt=CHINESE_PROMPT, model_name=FASTERWHISPER_MODEL):
+    """惰性产出(start, end, text)，不保留segments列表和tokens；生成器存活期间持有模型lease."""
+    audio = decode_audio(file_path)
+    with whisper_model_pool.lease(model_name) as model:
+        segments, _ = model.transcribe(audio, initial_prompt=prompt, language=lang, beam_size=5)
+        for segment in segments:
+            yield segment.start, segment.end, segment.text.strip()
+
+
 # def generate_srt_by_funasr_sensevoice(audio_path):
 #     model_dir = "iic/SenseVoiceSmall"
 #
@@ -203,34 +301,22 @@ def fasterwhisper_result_dict(segments):
     return segments_dict
 
 
-def generate_markdown_llm(model_type, srt_content):
+MARKDOWN_SYSTEM_PROMPT = "你是十分专业的全能专家，同时也是一个markdown生成器，总是直接输出纯净的markdown内容。"
+MARKDOWN_USER_PROMPT = "将下面的文本进行汇总整理，提炼出主要内容。生成结果并将结果转换为markdown文本，请直接输出纯净的markdown格式内容，不要包含任何代码块标记（如```markdown或```）：{content}"
+
+
+def clean_markdown(result):
+    return result.replace("```markdown", "").replace("```", "")
+
+
+def llm_provider(model_type):
+    """按模型名选择服务商：返回(provider, api_key, base_url)."""
     if "deepseek" in model_type:
-        api_key = deepseek_key
-        base_url = deepseek_base
+        return "deepseek", deepseek_key, deepseek_base
     elif "gpt-4o" in model_type:
-        api_key = openai_key
-        base_url = openai_base
+        return "openai", openai_key, openai_base
     elif "glm" in model_type:
-        api_key = chatglm_key
-        base_url = chatglm_base
+        return "chatglm", chatglm_key, chatglm_base
     elif "kimi" in model_type:
-        api_key = kimi_key
-        base_url = kimi_base
-    client = OpenAI(api_key=api_key, base_url=base_url)
-
-    try:
-        response = client.chat.completions.create(
-            model=model_type,
-            messages=[
-                {"role": "system",
-                 "content": f"你是十分专业的全能专家，同时也是一个markdown生成器，总是直接输出纯净的markdown内容。"},
-                {"role": "user",
-                 "content": f"将下面的文本进行汇总整理，提炼出主要内容。生成结果并将结果转换为markdown文本，请直接输出纯净的markdown格式内容，不要包含任何代码块标记（如```markdown或```）：{str(srt_content)}"}
-            ])
-        result = response.choices[0].message.content
-        result = result.replace("```markdown", "").replace("```", "")
-        print(result)
-        return result
-    except Exception as e:
-        print(f"Error generate markdown: {e}")
-        raise IOError(f"Failed to generate markdown {e}.") from e
+        return "kimi", kimi_key, kimi_base
+    raise ValueError(f"不支持的模型: {model_type}")
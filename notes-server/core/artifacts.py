@@ -0,0 +1,208 @@
+# backend/app/artifacts.py
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from base_config import *
+from sqlite_store import connect
+
+"""
+产物存储与索引(SQLite)：
+sources   : 规范化URL/内容哈希 -> video_id，命中时无需任何网络请求
+refs      : 上传文件的引用计数，内容相同的上传共用同一份文件，计数归零才删除产物
+artifacts : (video_id, kind, params) -> 文件路径，kind为video/audio/transcript等，
+            params为生成参数(模型、语言、prompt...)，不同参数的字幕互不复用
+所有产物文件先写临时文件再os.replace，并发任务不会读到写了一半的文件。
+"""
+
+ARTIFACT_DB = UPLOAD_DIR + "artifacts.db"
+# 跟踪参数：utm_前缀，其余按完整参数名匹配(sig、size等同前缀的参数是区分视频的)
+_TRACKING_PREFIXES = ('utm_',)
+_TRACKING_PARAMS = frozenset(('spm', 'from', 'share_source', 'si'))
+
+
+def normalize_source(url: str) -> str:
+    """去掉fragment和跟踪参数、统一大小写与参数顺序，作为URL的缓存键."""
+    parts = urlsplit(url.strip())
+    netloc = parts.netloc.lower()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k not in _TRACKING_PARAMS and not k.startswith(_TRACKING_PREFIXES))
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path.rstrip("/"), urlencode(query), ""))
+
+
+def job_source(source: str, is_url: bool) -> str:
+    """处理任务的来源部分：规范化URL或上传文件id."""
+    return normalize_source(source) if is_url else f"file:{os.path.basename(source)}"
+
+
+def job_key(source: str, is_url: bool, subtitle_model: str = None) -> str:
+    """处理任务的来源键：job_source加上字幕模型；用于合并并发任务和查找已有结果."""
+    return f"{job_source(source, is_url)}|{subtitle_model or ''}"
+
+
+def content_source(digest: str) -> str:
+    return f"sha256:{digest}"
+
+
+def file_digest(path: str, block_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            h.update(block)
+    return h.hexdigest()
+
+
+def params_key(params: dict) -> str:
+    return json.dumps(params or {}, sort_keys=True, ensure_ascii=False)
+
+
+def params_tag(params: dict) -> str:
+    return hashlib.sha1(params_key(params).encode("utf-8")).hexdigest()[:10]
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w", **kwargs):
+    """写到同目录下唯一的临时文件，成功后原子替换为目标文件."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    if "b" not in mode:
+        kwargs.setdefault("encoding", "utf-8")
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class ArtifactStore:
+    def __init__(self, db_path: str = ARTIFACT_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = connect(db_path, """
+            CREATE TABLE IF NOT EXISTS sources (
+                source_key TEXT PRIMARY KEY,
+                video_id   TEXT NOT NULL,
+                title      TEXT,
+                created    REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sources_video ON sources(video_id);
+            CREATE TABLE IF NOT EXISTS artifacts (
+                video_id TEXT NOT NULL,
+                kind     TEXT NOT NULL,
+                params   TEXT NOT NULL,
+                path     TEXT NOT NULL,
+                size     INTEGER,
+                created  REAL NOT NULL,
+                PRIMARY KEY (video_id, kind, params)
+            );
+            CREATE TABLE IF NOT EXISTS refs (
+                video_id TEXT PRIMARY KEY,
+                count    INTEGER NOT NULL
+            );
+        """)
+
+    def _execute(self, sql: str, args: tuple = ()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    # --- sources ---
+    def lookup_source(self, source_key: str):
+        rows = self._execute("SELECT video_id FROM sources WHERE source_key = ?", (source_key,))
+        return rows[0][0] if rows else None
+
+    def register_source(self, source_key: str, video_id: str, title: str = None):
+        self._execute("INSERT OR REPLACE INTO sources(source_key, video_id, title, created) VALUES (?, ?, ?, ?)",
+                      (source_key, video_id, title, time.time()))
+
+    def claim_source(self, source_key: str, video_id: str) -> str:
+        """原子地登记来源：已被其它video_id占用时返回该video_id，否则登记并返回video_id."""
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO sources(source_key, video_id, title, created) "
+                               "VALUES (?, ?, NULL, ?)", (source_key, video_id, time.time()))
+            return self._conn.execute("SELECT video_id FROM sources WHERE source_key = ?",
+                                      (source_key,)).fetchone()[0]
+
+    def sources_for(self, video_id: str) -> list:
+        return [row[0] for row in self._execute("SELECT source_key FROM sources WHERE video_id = ?", (video_id,))]
+
+    # --- artifacts ---
+    def artifact_path(self, video_id: str, kind: str, params: dict = None, ext: str = "") -> str:
+        """按参数生成产物文件名；无参数时沿用 video_id+ext 的命名."""
+        if params:
+            return f"{UPLOAD_DIR}{video_id}.{params_tag(params)}{ext}"
+        return f"{UPLOAD_DIR}{video_id}{ext}"
+
+    def get(self, video_id: str, kind: str, params: dict = None):
+        """返回已登记且文件仍存在的产物路径；文件已被删除则清理索引."""
+        key = params_key(params)
+        rows = self._execute("SELECT path FROM artifacts WHERE video_id = ? AND kind = ? AND params = ?",
+                             (video_id, kind, key))
+        if not rows:
+            return None
+        path = rows[0][0]
+        if os.path.exists(path):
+            return path
+        self.remove(video_id, kind, params)
+        return None
+
+    def latest(self, video_id: str, kind: str):
+        rows = self._execute("SELECT path FROM artifacts WHERE video_id = ? AND kind = ? ORDER BY created DESC",
+                             (video_id, kind))
+        for (path,) in rows:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, video_id: str, kind: str, path: str, params: dict = None):
+        size = os.path.getsize(path) if os.path.exists(path) else None
+        self._execute("INSERT OR REPLACE INTO artifacts(video_id, kind, params, path, size, created) "
+                      "VALUES (?, ?, ?, ?, ?, ?)", (video_id, kind, params_key(params), path, size, time.time()))
+        return path
+
+    def remove(self, video_id: str, kind: str, params: dict = None):
+        self._execute("DELETE FROM artifacts WHERE video_id = ? AND kind = ? AND params = ?",
+                      (video_id, kind, params_key(params)))
+
+    # --- refs ---
+    def acquire(self, video_id: str) -> int:
+        with self._lock:
+            self._conn.execute("INSERT INTO refs(video_id, count) VALUES (?, 1) "
+                               "ON CONFLICT(video_id) DO UPDATE SET count = count + 1", (video_id,))
+            return self._conn.execute("SELECT count FROM refs WHERE video_id = ?", (video_id,)).fetchone()[0]
+
+    def release(self, video_id: str):
+        """
+        引用计数减一，返回剩余计数；归零时删除该video_id的全部产物文件和索引。
+        只有acquire过的video_id(上传文件)才有refs记录，没有记录时不做任何删除，返回None。
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT count FROM refs WHERE video_id = ?", (video_id,)).fetchone()
+            if row is None:
+                return None
+            if row[0] > 1:
+                self._conn.execute("UPDATE refs SET count = count - 1 WHERE video_id = ?", (video_id,))
+                return row[0] - 1
+            self._conn.execute("DELETE FROM refs WHERE video_id = ?", (video_id,))
+        self.purge(video_id)
+        return 0
+
+    def purge(self, video_id: str) -> list:
+        """删除video_id的全部产物文件和索引；由它生成的处理结果和检索索引由uploads.release_upload一并删除."""
+        paths = [row[0] for row in self._execute("SELECT path FROM artifacts WHERE video_id = ?", (video_id,))]
+        self._execute("DELETE FROM artifacts WHERE video_id = ?", (video_id,))
+        self._execute("DELETE FROM sources WHERE video_id = ?", (video_id,))
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        return paths
+
+
+artifact_store = ArtifactStore()
@@ -0,0 +1,77 @@
+# backend/app/audio.py
+import struct
+import subprocess
+
+import numpy as np
+
+"""
+ffmpeg直接解码到管道(16kHz单声道pcm_s16le)，不再落盘中间wav：
+whisper.cpp server直接接收内存中的wav字节，faster-whisper直接接收numpy数组。
+解码是整段的：读完整个PCM流后才交给推理，解码与推理不重叠；省掉的是临时文件的写入和读取，
+代价是整段PCM常驻内存，faster-whisper还需同时持有float32数组(峰值约为PCM大小的3倍)。超长音频使用分块转写(TRANSCRIBE_CHUNKED)，按窗口解码。
+"""
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # pcm_s16le
+WAV_HEADER_SIZE = 44
+READ_CHUNK = 1024 * 1024
+
+
+def ffmpeg_pcm_command(media_path: str, start: float = None, duration: float = None) -> list:
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+    if start:
+        command += ["-ss", f"{start:.3f}"]
+    command += ["-i", media_path]
+    if duration:
+        command += ["-t", f"{duration:.3f}"]
+    command += ["-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-acodec", "pcm_s16le", "-f", "s16le", "pipe:1"]
+    return command
+
+
+def read_pcm(media_path: str, reserve: int = 0, start: float = None, duration: float = None) -> bytearray:
+    """解码音频(默认整段)为PCM字节；预留reserve字节的头部空间，便于原地写wav头避免再拷贝."""
+    buffer = bytearray(reserve)
+    proc = subprocess.Popen(ffmpeg_pcm_command(media_path, start, duration),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            chunk = proc.stdout.read(READ_CHUNK)
+            if not chunk:
+                break
+            buffer += chunk
+        stderr = proc.stderr.read()
+        if proc.wait() != 0:
+            raise IOError(f"Failed to decode audio {media_path}: {stderr.decode(errors='ignore').strip()}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    return buffer
+
+
+def write_wav_header(buffer: bytearray, data_size: int):
+    buffer[:WAV_HEADER_SIZE] = struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, 1, SAMPLE_RATE, SAMPLE_RATE * SAMPLE_WIDTH, SAMPLE_WIDTH, SAMPLE_WIDTH * 8,
+        b'data', data_size)
+
+
+def decode_wav_bytes(media_path: str) -> bytearray:
+    """内存中的完整wav(头+PCM)，用于提交给whisper.cpp server."""
+    buffer = read_pcm(media_path, reserve=WAV_HEADER_SIZE)
+    write_wav_header(buffer, len(buffer) - WAV_HEADER_SIZE)
+    return buffer
+
+
+def pcm_to_float32(pcm):
+    """int16 PCM -> [-1, 1] float32数组；np.frombuffer不拷贝，仅归一化产生一次拷贝."""
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    audio = samples.astype(np.float32)
+    audio /= 32768.0
+    return audio
+
+
+def decode_audio(media_path: str, start: float = None, duration: float = None):
+    """整段解码为faster-whisper可直接使用的float32数组."""
+    return pcm_to_float32(read_pcm(media_path, start=start, duration=duration))
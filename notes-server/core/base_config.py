@@ -3,7 +3,8 @@ import toml
 
 current_file = os.path.abspath(__file__)
 PROJECT_ROOT = os.path.dirname(current_file)
-UPLOAD_DIR = os.path.dirname(PROJECT_ROOT) + "/uploads/"
+# NOTES_UPLOAD_DIR可改写上传/产物/数据库目录(测试使用临时目录)
+UPLOAD_DIR = os.path.join(os.environ.get("NOTES_UPLOAD_DIR") or os.path.dirname(PROJECT_ROOT) + "/uploads", "")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 config_dir = PROJECT_ROOT + '/config/'
@@ -28,8 +29,98 @@ origins = [
 WHISPERCPP_PATH = "<path>/whisper.cpp"
 WHISPERCPP_MODEL = 'medium'
 CHINESE_PROMPT = '以下是普通话的句子'
+# 常驻whisper.cpp server：模型只加载一次，任务通过本地HTTP提交；关闭后回退为每次调用main
+WHISPERCPP_USE_SERVER = True
+WHISPERCPP_SERVER = f"{WHISPERCPP_PATH}/server"
+WHISPERCPP_SERVER_PORT = 8910
+WHISPERCPP_SERVER_START_TIMEOUT = 120
+# /inference请求的连接与读取超时(秒)：server卡死时释放线程和并发名额
+WHISPERCPP_CONNECT_TIMEOUT = 10
+WHISPERCPP_INFERENCE_TIMEOUT = 1800
+WHISPERCPP_THREADS = 4
 
 FASTERWHISPER_MODEL = 'tiny'
 FASTERWHISPER_MODELS = ['tiny', 'tiny.en', 'base', 'base.en', 'small', 'small.en', 'medium', 'medium.en',
                         'large-v1','large-v2', 'large-v3', 'large', 'distil-small.en', 'distil-medium.en',
-                        'distil-large-v2','distil-large-v3']
\ No newline at end of file
+                        'distil-large-v2','distil-large-v3']
+
+# 执行器并发上限：CPU_WORKERS对应ffmpeg/whisper进程池，IO_WORKERS对应yt-dlp/LLM线程池
+CPU_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+IO_WORKERS = 8
+# 长时间运行的转写(进程内faster-whisper流式推理、等待whisper.cpp server响应)使用单独的线程池，不占用IO_WORKERS
+INFERENCE_WORKERS = 2
+
+# faster-whisper常驻模型池：内存预算(MB)超出后按LRU淘汰空闲模型
+FASTERWHISPER_DEVICE = 'cpu'
+FASTERWHISPER_COMPUTE_TYPE = 'default'
+FASTERWHISPER_NUM_WORKERS = 2  # 同一模型允许并发推理的线程数
+FASTERWHISPER_CPU_THREADS = 0  # 每个模型的推理线程数，0为默认；分块并行时建议设为 核数/TRANSCRIBE_CHUNK_WORKERS
+FASTERWHISPER_MEMORY_BUDGET_MB = 4096
+
+# 分块并行转写：按VAD静音边界切分，每块在进程池中并行转写后拼接时间轴
+TRANSCRIBE_CHUNKED = False
+TRANSCRIBE_CHUNK_SECONDS = 300
+TRANSCRIBE_CHUNK_WORKERS = CPU_WORKERS
+
+# 流式字幕：每条WebSocket消息最多携带的segments数
+TRANSCRIPT_STREAM_BATCH = 20
+
+# yt-dlp元数据缓存：同一URL在TTL(秒)内只提取一次
+YTDLP_INFO_TTL = 600
+YTDLP_INFO_CACHE_SIZE = 256
+
+# 仅音频拉取：下载只取音轨(ba)，视频在处理完成后后台下载；PREFETCH_VIDEO为True时在转写的同时就开始下载视频
+AUDIO_ONLY_INGEST = True
+PREFETCH_VIDEO = False
+# /video请求时视频仍在下载：最多等待的秒数，超时返回503并让播放器在Retry-After秒后重试
+VIDEO_FETCH_WAIT = 2
+VIDEO_FETCH_RETRY_AFTER = 5
+
+# 长文本分层总结(map-reduce)：每次LLM调用的输入token预算，以及每个服务商同时进行的请求数上限
+LLM_CHUNK_TOKENS = 6000
+LLM_PROVIDER_CONCURRENCY = {"deepseek": 4, "openai": 4, "chatglm": 4, "kimi": 2}
+
+# LLM响应磁盘缓存：有效期(秒)和总大小上限(字节)
+LLM_CACHE_TTL = 7 * 24 * 3600
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# LLM客户端连接池：空闲keep-alive连接保留时间与单次请求超时(秒)
+LLM_KEEPALIVE_EXPIRY = 60
+LLM_REQUEST_TIMEOUT = 600
+
+# 上传：边接收边按块落盘并计算哈希；分片上传建议的分片大小与未完成会话的保留时间(秒)
+UPLOAD_WRITE_BUFFER = 1024 * 1024
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_SESSION_TTL = 24 * 3600
+
+# markdown页面渲染缓存：内存中最多保留的页面数(含gzip/brotli预压缩版本)
+PAGE_CACHE_SIZE = 128
+
+# 处理结果存储(SQLite WAL，多worker共享)：进程内LRU条数、结果保留时间(秒)与总大小上限(字节)
+RESULT_CACHE_SIZE = 128
+RESULT_STORE_TTL = 30 * 24 * 3600
+RESULT_STORE_MAX_BYTES = 512 * 1024 * 1024
+# 进程内缓存命中后超过该秒数，再按主键核对一次数据库(其它worker可能已删除或覆盖该结果)
+RESULT_CACHE_REVALIDATE = 5
+
+# 字幕时间索引：内存中保留的列式字幕数，按时间范围查询时每页最多返回的段数
+TRANSCRIPT_INDEX_SIZE = 64
+TRANSCRIPT_PAGE_SIZE = 200
+
+# 全文检索：每次查询最多返回的命中数
+SEARCH_MAX_RESULTS = 50
+
+# 字幕问答：按时间窗口(秒)切块建BM25索引，每个问题取最相关的块数放入prompt
+QA_CHUNK_SECONDS = 60
+QA_TOP_K = 4
+QA_INDEX_CACHE_SIZE = 32
+
+# 流水线各阶段跨任务的并发上限：同时下载、转写、生成总结的视频数(批量导入时尤其需要)
+PIPELINE_DOWNLOAD_CONCURRENCY = 3
+PIPELINE_TRANSCRIBE_CONCURRENCY = 2
+PIPELINE_LLM_CONCURRENCY = 4
+
+# 批量导入(播放列表/频道/多个URL/上传文件)：同时在处理中的条目数、单批最多条目数、结束后状态在内存中保留的时间(秒)
+BATCH_CONCURRENCY = 4
+BATCH_MAX_ITEMS = 500
+BATCH_RESULT_TTL = 24 * 3600
@@ -0,0 +1,227 @@
+# backend/app/batch.py
+import asyncio
+import time
+import traceback
+import uuid
+from typing import Any, AsyncGenerator, Dict, List
+
+from base_config import *
+from api_service import ytdlp_playlist_entries
+from artifacts import job_key
+from executor import run_io
+from jobs import job_registry
+from processing import create_status_dict
+from result_store import result_store
+
+"""
+批量导入：一批可以包含播放列表/频道URL、普通URL和已上传的file_id。
+URL先用yt-dlp的extract_flat展开为视频条目(只取元数据)，去重后逐条走同一条处理流水线：
+同时处理的条目数受BATCH_CONCURRENCY限制，下载/转写/LLM各阶段另有跨任务的并发上限(PIPELINE_*_CONCURRENCY)。
+每个条目经job_registry提交，与交互请求的相同来源任务合并；已有处理结果的来源直接记为cached(除非reprocess)。
+批次在后台运行，客户端断开不影响；进度按条目推送，GET可随时查询汇总状态。
+"""
+
+
+class BatchJob:
+    __slots__ = ("batch_id", "subtitle_model", "reprocess", "items", "status", "created", "finished",
+                 "task", "subscribers")
+
+    def __init__(self, subtitle_model: str = None, reprocess: bool = False):
+        self.batch_id = str(uuid.uuid4())
+        self.subtitle_model = subtitle_model
+        self.reprocess = reprocess
+        self.items: List[dict] = []
+        self.status = "expanding"
+        self.created = time.time()
+        self.finished = None
+        self.task = None
+        self.subscribers = set()
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for item in self.items:
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+        return counts
+
+    def snapshot(self) -> dict:
+        return {"batch_id": self.batch_id, "status": self.status, "total": len(self.items),
+                "counts": self.counts(), "created": self.created, "finished": self.finished,
+                "items": [dict(item) for item in self.items]}
+
+    def final_update(self, message: str) -> dict:
+        """批次结束的消息：异常终止时为error，其余(完成/取消)为complete."""
+        status = "error" if self.status == "error" else "complete"
+        return create_status_dict(status, message, status, self.snapshot())
+
+    def publish(self, update):
+        for queue in self.subscribers:
+            queue.put_nowait(update)
+
+    def publish_item(self, item: dict, message: str):
+        self.publish(create_status_dict("batch_item", message, item["status"],
+                                        {"batch_id": self.batch_id, "item": dict(item), "counts": self.counts()}))
+
+
+def new_item(index: int, source: str, is_url: bool, title: str = None) -> dict:
+    return {"index": index, "source": source, "is_url": is_url, "title": title, "status": "pending",
+            "stage": None, "message": None, "video_id": None, "error": None, "elapsed": None}
+
+
+async def expand_sources(urls: List[str], file_ids: List[str]) -> List[dict]:
+    """展开播放列表/频道并按规范化来源去重；展开失败的URL作为一个error条目保留."""
+    items, seen = [], set()
+
+    def add(source, is_url, title=None, error=None):
+        key = job_key(source, is_url)
+        if key in seen or len(items) >= BATCH_MAX_ITEMS:
+            return
+        seen.add(key)
+        item = new_item(len(items), source, is_url, title)
+        if error:
+            item.update(status="error", error=error)
+        items.append(item)
+
+    for url in urls:
+        try:
+            entries = await run_io(ytdlp_playlist_entries, url)
+        except Exception as e:
+            print(f"展开批量来源失败 {url}: {e}")
+            add(url, True, error=f"展开失败: {e}")
+            continue
+        for entry_url, title in entries:
+            add(entry_url, True, title)
+    for file_id in file_ids:
+        add(file_id, False)
+    return items
+
+
+class BatchRegistry:
+    def __init__(self, ttl: float = BATCH_RESULT_TTL):
+        self.ttl = ttl
+        self._batches: Dict[str, BatchJob] = {}
+
+    def _expire(self):
+        now = time.time()
+        for batch_id, batch in list(self._batches.items()):
+            if batch.finished is not None and batch.finished < now - self.ttl:
+                del self._batches[batch_id]
+
+    def get(self, batch_id: str):
+        return self._batches.get(batch_id)
+
+    def start(self, urls: List[str], file_ids: List[str], subtitle_model: str = None,
+              reprocess: bool = False) -> BatchJob:
+        if not urls and not file_ids:
+            raise ValueError("批量任务至少需要一个URL或file_id.")
+        bad = [url for url in urls if not url.startswith(("http://", "https://"))]
+        if bad:
+            raise ValueError(f"无效的URL: {bad[0]}")
+        self._expire()
+        batch = BatchJob(subtitle_model, reprocess)
+        self._batches[batch.batch_id] = batch
+        batch.task = asyncio.ensure_future(self._run(batch, urls, file_ids))
+        return batch
+
+    def cancel(self, batch_id: str) -> bool:
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            return False
+        if batch.task is not None and not batch.task.done():
+            batch.task.cancel()
+        return True
+
+    async def _run(self, batch: BatchJob, urls: List[str], file_ids: List[str]):
+        started = time.monotonic()
+        try:
+            batch.items = await expand_sources(urls, file_ids)
+            batch.status = "processing"
+            print(f"批量任务{batch.batch_id}: 共{len(batch.items)}个条目")
+            batch.publish(create_status_dict("batch", f"已展开{len(batch.items)}个条目.", "processing",
+                                             batch.snapshot()))
+            slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+            tasks = [asyncio.ensure_future(self._run_item(batch, item, slots)) for item in batch.items
+                     if item["status"] == "pending"]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                # 某个条目异常时停止其它条目，不留下无人等待的任务
+                for task in tasks:
+                    task.cancel()
+            batch.status = "complete"
+        except asyncio.CancelledError:
+            batch.status = "cancelled"
+            for item in batch.items:
+                if item["status"] in ("pending", "processing"):
+                    item.update(status="cancelled", message="批量任务已取消.")
+        except Exception as e:
+            print(f"批量任务{batch.batch_id}异常: {e}")
+            traceback.print_exc()
+            batch.status = "error"
+            for item in batch.items:
+                if item["status"] in ("pending", "processing"):
+                    item.update(status="error", error=item["error"] or f"批量任务异常: {e}")
+        finally:
+            batch.finished = time.time()
+            counts = batch.counts()
+            message = (f"批量处理结束，耗时{time.monotonic() - started:.1f}s: "
+                       + ", ".join(f"{status} {count}" for status, count in sorted(counts.items())))
+            print(f"批量任务{batch.batch_id}: {message}")
+            batch.publish(batch.final_update(message))
+            # None作为结束标记
+            batch.publish(None)
+
+    async def _run_item(self, batch: BatchJob, item: dict, slots: asyncio.Semaphore):
+        if not batch.reprocess:
+            video_id = await run_io(result_store.latest_for_job,
+                                    job_key(item["source"], item["is_url"], batch.subtitle_model))
+            if video_id:
+                item.update(status="cached", video_id=video_id, message="已有处理结果.")
+                batch.publish_item(item, item["message"])
+                return
+        async with slots:
+            started = time.monotonic()
+            item.update(status="processing")
+            try:
+                async for update in job_registry.subscribe(item["source"], item["is_url"], batch.subtitle_model):
+                    # 逐条字幕和逐token的增量消息不转发，批量进度只需要阶段变化
+                    if update.get("status") in ("partial", "delta"):
+                        continue
+                    item["stage"], item["message"] = update.get("stage"), update.get("message")
+                    if update.get("status") == "complete":
+                        item.update(status="complete", video_id=(update.get("data") or {}).get("video_id"))
+                    elif update.get("status") == "error":
+                        # 保留最先出错的阶段消息
+                        item.update(status="error", error=item["error"] or update.get("message"))
+                    batch.publish_item(item, f"[{item['index'] + 1}/{len(batch.items)}] {item['message']}")
+            except Exception as e:
+                item.update(status="error", error=str(e))
+                batch.publish_item(item, f"[{item['index'] + 1}/{len(batch.items)}] 处理失败: {e}")
+            finally:
+                item["elapsed"] = round(time.monotonic() - started, 3)
+            if item["status"] == "processing":
+                # 流结束但没有complete消息(任务被取消等)
+                item.update(status="error", error=item["error"] or "处理未完成.")
+                batch.publish_item(item, f"[{item['index'] + 1}/{len(batch.items)}] 处理未完成.")
+
+    async def subscribe(self, batch_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """先发送当前汇总状态，再推送后续的条目进度，批次结束时以complete(异常终止时为error)消息收尾."""
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            raise KeyError(batch_id)
+        if batch.finished is not None:
+            yield batch.final_update("批量处理已结束.")
+            return
+        queue = asyncio.Queue()
+        batch.subscribers.add(queue)
+        try:
+            yield create_status_dict("batch", f"批量任务{batch.status}.", "processing", batch.snapshot())
+            while True:
+                update = await queue.get()
+                if update is None:
+                    return
+                yield update
+        finally:
+            batch.subscribers.discard(queue)
+
+
+batch_registry = BatchRegistry()
@@ -0,0 +1,71 @@
+# backend/app/chunking.py
+import re
+
+from base_config import *
+from audio import SAMPLE_RATE, decode_audio
+from model_pool import whisper_model_pool
+
+"""
+分块并行转写：
+1. plan_transcription_chunks: VAD检测语音区间，在静音处切成不超过chunk_seconds的窗口
+2. transcribe_chunk: 进程池worker按窗口独立解码(ffmpeg -ss/-t)并转写，时间戳加上窗口偏移
+3. merge_chunk_segments: 按时间顺序拼接，去除块边界处重复的文本
+"""
+
+
+def plan_transcription_chunks(media_path: str, chunk_seconds: float = TRANSCRIBE_CHUNK_SECONDS,
+                              min_silence_ms: int = 500) -> list:
+    """返回[(start, end), ...]秒级窗口；窗口之间只包含静音，不做转写."""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+    audio = decode_audio(media_path)
+    # max_speech_duration_s让VAD在过长的连续语音内部也选择停顿点切开
+    speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=min_silence_ms,
+                                                     max_speech_duration_s=chunk_seconds))
+    windows = []
+    start = end = None
+    for ts in speech:
+        speech_start, speech_end = ts['start'] / SAMPLE_RATE, ts['end'] / SAMPLE_RATE
+        if start is None:
+            start = speech_start
+        elif speech_end - start > chunk_seconds:
+            windows.append((start, end))
+            start = speech_start
+        end = speech_end
+    if start is not None:
+        windows.append((start, end))
+    print(f"VAD分块: {len(windows)} 块, 音频时长 {len(audio) / SAMPLE_RATE:.1f}s")
+    return windows
+
+
+def transcribe_chunk(media_path: str, start: float, end: float, lang: str = 'zh',
+                     prompt: str = CHINESE_PROMPT, model_name: str = FASTERWHISPER_MODEL) -> list:
+    """转写单个窗口，返回已校正为全局时间的[(start, end, text), ...]."""
+    audio = decode_audio(media_path, start=start, duration=end - start)
+    with whisper_model_pool.lease(model_name) as model:
+        segments, _ = model.transcribe(audio, initial_prompt=prompt, language=lang, beam_size=5)
+        return [(start + seg.start, start + seg.end, seg.text.strip()) for seg in segments]
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'[\W_]+', '', text).lower()
+
+
+def merge_chunk_segments(chunk_results: list) -> list:
+    """按块顺序拼接；与前一段时间重叠且文本重复(相等或互相包含)的边界段合并为一段."""
+    merged = []
+    for segments in chunk_results:
+        for start, end, text in segments:
+            if not text:
+                continue
+            if merged:
+                prev_start, prev_end, prev_text = merged[-1]
+                if start < prev_end:
+                    a, b = _normalize(prev_text), _normalize(text)
+                    if a and b and (a in b or b in a):
+                        merged[-1] = (prev_start, max(prev_end, end), text if len(b) > len(a) else prev_text)
+                        continue
+                    start = prev_end
+                if end <= start:
+                    end = start + 0.01
+            merged.append((start, end, text))
+    return merged
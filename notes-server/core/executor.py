@@ -0,0 +1,142 @@
+# backend/app/executor.py
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from base_config import *
+
+"""
+流水线执行层：
+CPU密集型阶段(ffmpeg转码、whisper推理)提交到进程池，
+IO密集型阶段(yt-dlp下载、LLM HTTP请求)提交到线程池，
+长时间运行的转写(进程内共享常驻模型的faster-whisper推理、等待whisper.cpp server响应)提交到单独的推理线程池，
+事件循环只负责await结果，保证进度消息和其它WebSocket连接不被阻塞。
+"""
+
+_cpu_pool = None
+_io_pool = None
+_inference_pool = None
+# 每个池各自的并发上限；信号量在运行中的事件循环里懒加载创建
+# 排队的任务停在信号量上而不是执行器内部队列，客户端断连时可以直接取消
+_limits: dict = {}
+
+
+def get_cpu_pool() -> ProcessPoolExecutor:
+    global _cpu_pool
+    if _cpu_pool is None:
+        # spawn: 避免在已有线程(HTTP连接池等)的进程里fork
+        _cpu_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+    return _cpu_pool
+
+
+def get_io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="notes-io")
+    return _io_pool
+
+
+def get_inference_pool() -> ThreadPoolExecutor:
+    global _inference_pool
+    if _inference_pool is None:
+        _inference_pool = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="notes-inference")
+    return _inference_pool
+
+
+def _get_limit(name: str, size: int) -> asyncio.Semaphore:
+    limit = _limits.get(name)
+    if limit is None:
+        limit = asyncio.Semaphore(size)
+        _limits[name] = limit
+    return limit
+
+
+def stage_limit(name: str, size: int) -> asyncio.Semaphore:
+    """流水线阶段(下载/转写/LLM)跨任务共享的并发上限."""
+    return _get_limit(f"stage:{name}", size)
+
+
+async def run_cpu(func, *args, **kwargs):
+    """在进程池中执行CPU密集型函数(需可pickle的模块级函数)."""
+    loop = asyncio.get_running_loop()
+    async with _get_limit("cpu", CPU_WORKERS):
+        return await loop.run_in_executor(get_cpu_pool(), functools.partial(func, *args, **kwargs))
+
+
+async def run_io(func, *args, **kwargs):
+    """在线程池中执行阻塞IO函数."""
+    loop = asyncio.get_running_loop()
+    async with _get_limit("io", IO_WORKERS):
+        return await loop.run_in_executor(get_io_pool(), functools.partial(func, *args, **kwargs))
+
+
+async def run_inference(func, *args, **kwargs):
+    """在推理线程池中执行长时间运行的转写函数，不占用短IO任务的并发名额."""
+    loop = asyncio.get_running_loop()
+    async with _get_limit("inference", INFERENCE_WORKERS):
+        return await loop.run_in_executor(get_inference_pool(), functools.partial(func, *args, **kwargs))
+
+
+async def iterate_inference(func, *args, max_batch: int = 64, **kwargs):
+    """
+    在推理线程池中消费同步生成器func(*args)(如faster-whisper流式转写)，按批产出已就绪的元素(list)。
+    生产线程每产出一项就投递回事件循环，消费方拿到时把队列中已就绪的元素一起取走，
+    首批结果不必等待凑满一批；消费方提前退出时通知生产线程停止并关闭生成器。
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+    done = object()
+
+    def produce():
+        iterator = func(*args, **kwargs)
+        try:
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (done, e))
+            return
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+        loop.call_soon_threadsafe(queue.put_nowait, (done, None))
+
+    async with _get_limit("inference", INFERENCE_WORKERS):
+        producer = loop.run_in_executor(get_inference_pool(), produce)
+        try:
+            while True:
+                batch = []
+                item, error = await queue.get()
+                while item is not done:
+                    batch.append(item)
+                    if len(batch) >= max_batch or queue.empty():
+                        break
+                    item, error = queue.get_nowait()
+                if batch:
+                    yield batch
+                if item is done:
+                    if error is not None:
+                        raise error
+                    break
+        finally:
+            stopped.set()
+            await asyncio.shield(producer)
+
+
+def shutdown_executors():
+    global _cpu_pool, _io_pool, _inference_pool
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=False, cancel_futures=True)
+        _cpu_pool = None
+    if _io_pool is not None:
+        _io_pool.shutdown(wait=False, cancel_futures=True)
+        _io_pool = None
+    if _inference_pool is not None:
+        _inference_pool.shutdown(wait=False, cancel_futures=True)
+        _inference_pool = None
+    _limits.clear()
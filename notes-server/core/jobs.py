@@ -0,0 +1,112 @@
+# backend/app/jobs.py
+import asyncio
+from typing import Any, AsyncGenerator, Dict, List
+
+from artifacts import job_key
+from processing import process_video_stream_dict_updates
+
+"""
+进行中任务的登记表(single-flight)：同一来源(规范化URL或上传文件id)+字幕模型同时只跑一个处理任务。
+后到的请求挂到正在运行的任务上：先收到合并后的当前状态(每个阶段的最新消息，流式字幕和总结token各合并为一条)，
+再接收后续消息，最终共享同一份结果；任务不保留原始消息记录，内存不随token/字幕批次数增长。
+不会重复下载、转写和调用LLM，也不会并发写同一批UPLOAD_DIR文件。
+所有订阅者都断开后任务被取消(与单连接时断连即取消的行为一致)；任务结束后从登记表移除，
+之后的请求由产物/结果缓存直接命中。
+"""
+
+
+class Job:
+    __slots__ = ("key", "stages", "subscribers", "task", "done")
+
+    def __init__(self, key: str):
+        self.key = key
+        # 阶段 -> [最新状态消息, 最新增量消息(partial/delta), 累积的增量内容]，按阶段首次出现的顺序
+        self.stages: Dict[str, list] = {}
+        self.subscribers = set()
+        self.task = None
+        self.done = False
+
+    def _record(self, update: dict):
+        entry = self.stages.setdefault(update.get("stage"), [None, None, []])
+        status = update.get("status")
+        if status == "partial":
+            entry[1] = update
+            entry[2].extend((update.get("data") or {}).get("segments") or [])
+        elif status == "delta":
+            entry[1] = update
+            entry[2].append((update.get("data") or {}).get("delta") or "")
+            if len(entry[2]) >= 256:
+                entry[2][:] = ["".join(entry[2])]
+        else:
+            entry[0] = update
+
+    def replay(self) -> List[dict]:
+        """后加入的订阅者收到的合并状态：每个阶段的最新状态消息，以及合并为一条的增量消息."""
+        updates = []
+        for latest, stream, parts in self.stages.values():
+            if latest is not None:
+                updates.append(latest)
+            if stream is None:
+                continue
+            if stream["status"] == "partial":
+                data = {"offset": 0, "segments": list(parts)}
+            else:
+                parts[:] = ["".join(parts)]
+                data = {"delta": parts[0]}
+            updates.append(dict(stream, data=data))
+        return updates
+
+    def publish(self, update):
+        if update is not None:
+            self._record(update)
+        for queue in self.subscribers:
+            queue.put_nowait(update)
+
+
+class JobRegistry:
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+
+    async def _run(self, job: Job, source: str, is_url: bool, subtitle_model: str = None):
+        async for update in process_video_stream_dict_updates(source, is_url, subtitle_model):
+            job.publish(update)
+
+    def _finish(self, job: Job):
+        # 放在done回调里：任务在开始执行前被取消时同样会清理
+        job.done = True
+        # None作为结束标记
+        job.publish(None)
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+
+    async def subscribe(self, source: str, is_url: bool,
+                        subtitle_model: str = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """返回任务的进度消息流；相同来源的任务正在运行时直接挂上去."""
+        key = job_key(source, is_url, subtitle_model)
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = Job(key)
+            job.task = asyncio.ensure_future(self._run(job, source, is_url, subtitle_model))
+            job.task.add_done_callback(lambda _: self._finish(job))
+        else:
+            print(f"相同来源的任务正在处理，共享其进度: {key} (订阅者{len(job.subscribers) + 1})")
+        queue = asyncio.Queue()
+        for update in job.replay():
+            queue.put_nowait(update)
+        if job.done:
+            queue.put_nowait(None)
+        job.subscribers.add(queue)
+        try:
+            while True:
+                update = await queue.get()
+                if update is None:
+                    return
+                yield update
+        finally:
+            job.subscribers.discard(queue)
+            if not job.subscribers and not job.done:
+                print(f"任务已无订阅者，取消: {key}")
+                job.task.cancel()
+
+
+job_registry = JobRegistry()
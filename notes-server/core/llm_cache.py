@@ -0,0 +1,70 @@
+# backend/app/llm_cache.py
+import hashlib
+import threading
+import time
+
+from base_config import *
+from sqlite_store import SizedTable, connect
+
+"""
+LLM响应的磁盘缓存(SQLite)：
+key = sha256(服务商, 模型, system prompt, user prompt模板, 字幕内容哈希)
+分层总结的每个分块调用各自命中缓存，重试或重新生成同一视频的笔记几乎不再请求服务商。
+超过TTL的条目视为失效；总大小超过上限时按最近访问时间淘汰(sqlite_store.SizedTable)。
+"""
+
+LLM_CACHE_DB = UPLOAD_DIR + "llm_cache.db"
+
+
+def llm_cache_key(provider: str, model_type: str, system_prompt: str, user_prompt: str, content: str) -> str:
+    content_hash = hashlib.sha256(str(content).encode("utf-8")).hexdigest()
+    h = hashlib.sha256()
+    for part in (provider, model_type, system_prompt, user_prompt, content_hash):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class LLMCache:
+    def __init__(self, db_path: str = LLM_CACHE_DB, ttl: float = LLM_CACHE_TTL, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = connect(db_path, """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key      TEXT PRIMARY KEY,
+                value    TEXT NOT NULL,
+                size     INTEGER NOT NULL,
+                created  REAL NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed);
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created);
+        """)
+        self._table = SizedTable(self._conn, "llm_cache", "key", ttl, max_bytes)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO llm_cache(key, value, size, created, accessed) "
+                               "VALUES (?, ?, ?, ?, ?)", (key, value, size, now, now))
+            self._table.evict(now)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+
+llm_cache = LLMCache()
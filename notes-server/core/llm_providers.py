@@ -0,0 +1,172 @@
+# backend/app/llm_providers.py
+import asyncio
+from typing import AsyncIterator
+
+import httpx
+from openai import AsyncOpenAI
+
+from base_config import *
+from api_service import llm_provider, clean_markdown, MARKDOWN_SYSTEM_PROMPT, MARKDOWN_USER_PROMPT
+from llm_cache import llm_cache, llm_cache_key
+from executor import run_io
+
+"""
+LLM服务商注册表：每个服务商一个常驻的AsyncOpenAI客户端(httpx连接池 + keep-alive)，
+多个任务共享已建立的TLS连接；并用信号量限制每个服务商同时进行的请求数。
+"""
+
+
+class LLMProvider:
+    def __init__(self, name: str, api_key: str, base_url: str, max_concurrency: int):
+        self.name = name
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self._client = None
+        self._limit = None
+        self._loop = None
+
+    def _bind_loop(self):
+        # 连接池和信号量都绑定在创建它们的事件循环上，循环变化时(如测试中多次asyncio.run)重新创建
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 旧循环仍在运行时在它上面关闭旧客户端，释放连接；已关闭的循环上连接无法再关闭，直接丢弃
+            if self._client is not None and self._loop is not None and not self._loop.is_closed():
+                asyncio.run_coroutine_threadsafe(self._client.close(), self._loop)
+            self._client = None
+            self._limit = None
+            self._loop = loop
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        self._bind_loop()
+        if self._client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency,
+                                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY),
+                timeout=httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=10.0))
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=http_client)
+        return self._client
+
+    @property
+    def limit(self) -> asyncio.Semaphore:
+        # 第一次请求时才创建，与client共用_bind_loop的事件循环检查
+        self._bind_loop()
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.max_concurrency)
+        return self._limit
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        self._limit = None
+
+
+class ProviderRegistry:
+    def __init__(self):
+        self._providers: dict = {}
+
+    def get(self, model_type: str) -> LLMProvider:
+        name, api_key, base_url = llm_provider(model_type)
+        provider = self._providers.get(name)
+        if provider is None:
+            provider = self._providers[name] = LLMProvider(name, api_key, base_url,
+                                                           LLM_PROVIDER_CONCURRENCY.get(name, 4))
+        return provider
+
+    async def aclose(self):
+        for provider in self._providers.values():
+            await provider.aclose()
+        self._providers.clear()
+
+
+provider_registry = ProviderRegistry()
+
+
+async def agenerate_markdown_llm(model_type, srt_content, user_prompt=MARKDOWN_USER_PROMPT, use_cache=True):
+    """调用LLM生成markdown：共享服务商客户端，受服务商并发上限约束；缓存读写在线程池中执行."""
+    provider = provider_registry.get(model_type)
+    cache_key = llm_cache_key(provider.name, model_type, MARKDOWN_SYSTEM_PROMPT, user_prompt, srt_content)
+    if use_cache:
+        cached = await run_io(llm_cache.get, cache_key)
+        if cached is not None:
+            print(f"LLM缓存命中: {model_type}")
+            return cached
+
+    try:
+        async with provider.limit:
+            response = await provider.client.chat.completions.create(
+                model=model_type,
+                messages=[
+                    {"role": "system",
+                     "content": MARKDOWN_SYSTEM_PROMPT},
+                    {"role": "user",
+                     "content": user_prompt.format(content=str(srt_content))}
+                ])
+        result = response.choices[0].message.content
+        result = clean_markdown(result)
+        await run_io(llm_cache.put, cache_key, result)
+        return result
+    except Exception as e:
+        print(f"Error generate markdown: {e}")
+        raise IOError(f"Failed to generate markdown {e}.") from e
+
+
+async def astream_markdown_llm(model_type, srt_content, user_prompt=MARKDOWN_USER_PROMPT, use_cache=True):
+    """
+    流式生成：逐个产出服务商返回的增量文本(未做代码块标记清理，调用方用clean_markdown_stream包装)。
+    缓存命中时一次性产出完整结果；流正常结束后写入缓存。
+    """
+    provider = provider_registry.get(model_type)
+    cache_key = llm_cache_key(provider.name, model_type, MARKDOWN_SYSTEM_PROMPT, user_prompt, srt_content)
+    if use_cache:
+        cached = await run_io(llm_cache.get, cache_key)
+        if cached is not None:
+            print(f"LLM缓存命中: {model_type}")
+            yield cached
+            return
+
+    parts = []
+    try:
+        async with provider.limit:
+            stream = await provider.client.chat.completions.create(
+                model=model_type,
+                messages=[
+                    {"role": "system",
+                     "content": MARKDOWN_SYSTEM_PROMPT},
+                    {"role": "user",
+                     "content": user_prompt.format(content=str(srt_content))}
+                ],
+                stream=True)
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+    except Exception as e:
+        print(f"Error generate markdown: {e}")
+        raise IOError(f"Failed to generate markdown {e}.") from e
+    await run_io(llm_cache.put, cache_key, clean_markdown("".join(parts)))
+
+
+_FENCE = "```markdown"
+
+
+async def clean_markdown_stream(deltas: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    流式版本的clean_markdown：去掉```markdown和```标记。
+    标记可能被拆在相邻的增量里，末尾可能是标记开头的部分先保留，等下一个增量到达后再决定是否输出。
+    """
+    buffer = ""
+    async for delta in deltas:
+        buffer += delta
+        keep = next((k for k in range(len(_FENCE) - 1, 0, -1) if buffer.endswith(_FENCE[:k])), 0)
+        text = clean_markdown(buffer[:len(buffer) - keep])
+        buffer = buffer[len(buffer) - keep:]
+        if text:
+            yield text
+    text = clean_markdown(buffer)
+    if text:
+        yield text
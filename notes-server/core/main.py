@@ -1,15 +1,29 @@
 from fastapi import FastAPI, Request, Body, UploadFile, File, Form, Query, HTTPException, BackgroundTasks
 from fastapi import WebSocket, WebSocketDisconnect, Depends
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware  # Import CORS
 import markdown
+import hashlib
 import os
 import logging
 
 from base_config import *
 from models import *
 from processing import *
+from executor import shutdown_executors
+from whispercpp_server import whispercpp_server
+from llm_providers import provider_registry
+from media_response import RangeFileResponse
+from page_cache import page_cache, page_response
+from result_store import result_store
+from search_index import search_index
+from qa_index import qa_index_store
+from transcript import dumps_with_transcripts
+from transcript_index import transcript_index
+from jobs import job_registry
+from batch import batch_registry
+from uploads import save_upload, release_upload, upload_sessions, UploadOffsetError
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,6 +39,13 @@ app.add_middleware(
 templates = Jinja2Templates(directory="templates")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_executors()
+    whispercpp_server.stop()
+    await provider_registry.aclose()
+
+
 def read_markdown_file(file_path):
     with open(file_path, 'r', encoding='utf-8') as file:
         return file.read()
@@ -45,10 +66,12 @@ def index(request: Request):
 
 
 @app.get("/AGI")
-async def get_markdown():
+def get_markdown(request: Request):
     project_dir = os.path.dirname(os.path.abspath(__file__)).replace("\\", "/")
     markdown_file_path = project_dir + '/mds/AGI.md'
-    return FileResponse(markdown_file_path, media_type="text/markdown")
+    page = page_cache.get("raw:AGI", [markdown_file_path], lambda: read_markdown_file(markdown_file_path),
+                          "text/markdown")
+    return page_response(page, request.headers)
 
 
 @app.get('/md/{md_name}')
@@ -56,36 +79,47 @@ def markdowns(md_name: str, request: Request):
     project_dir = os.path.dirname(os.path.abspath(__file__)).replace("\\", "/")
     markdown_file_path = project_dir + '/mds/' + md_name + '.md'
     print(markdown_file_path)
-    markdown_content = read_markdown_file(markdown_file_path)
-    html_content = markdown_to_html(markdown_content)
-    # return render_template(f'{md_name.split(".")[0]}.html', content=html_content)
-    return templates.TemplateResponse('output.html', {
-        "request": request,
-        "context": html_content,
-        "title": "Markdown Demo",
-        "content": html_content
-    })
+    if not os.path.isfile(markdown_file_path):
+        raise HTTPException(status_code=404, detail="Markdown not found.")
+
+    def render():
+        markdown_content = read_markdown_file(markdown_file_path)
+        html_content = markdown_to_html(markdown_content)
+        # return render_template(f'{md_name.split(".")[0]}.html', content=html_content)
+        return templates.get_template('output.html').render(
+            context=html_content, title="Markdown Demo", content=html_content)
+
+    # 渲染结果按md文件和模板的mtime/size缓存，命中时直接返回预压缩的页面
+    template_path = project_dir + '/templates/output.html'
+    page = page_cache.get(f"md:{md_name}", [markdown_file_path, template_path], render)
+    return page_response(page, request.headers)
 
 
 @app.get("/video/{video_id}")
-def stream_video(video_id: str):
+async def stream_video(video_id: str, request: Request):
     video_path = f"{UPLOAD_DIR}{video_id}"
+    if not os.path.exists(video_path):
+        # 仅音频拉取的任务：视频在后台下载，短暂等待仍未完成时返回503，播放器按Retry-After重试
+        try:
+            video_path = await asyncio.wait_for(ensure_video(os.path.splitext(video_id)[0]), VIDEO_FETCH_WAIT)
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="视频下载中，请稍后重试.",
+                                headers={"Retry-After": str(VIDEO_FETCH_RETRY_AFTER)})
     print(video_path)
-    def stream_video_file():
-        with open(video_path, "rb") as file:
-            while chunk := file.read(1024 * 1024):
-                yield chunk
-    return StreamingResponse(stream_video_file(), media_type="video/mp4")
+    # 支持Range分段请求，拖动进度条只传输请求的区间
+    return RangeFileResponse(video_path, request.headers, media_type="video/mp4")
 
 
-@app.post("/api/search")
-async def process_search(request_data: UrlRequest):
-    submitted_url = str(request_data.url)  # Get URL as string
-    logger.info(f"Received URL for processing: {submitted_url}")
-    return {
-        "message": "URL received successfully!",
-        "processed_url": submitted_url,
-    }
+@app.get("/api/search", response_model=SearchResponse)
+async def process_search(q: str = Query(..., min_length=1), video_id: Optional[str] = None,
+                         kind: Optional[str] = None, limit: int = Query(20, ge=1, le=SEARCH_MAX_RESULTS),
+                         offset: int = Query(0, ge=0)):
+    """全文检索所有字幕段和笔记，按相关度返回video_id和时间戳."""
+    logger.info(f"Search: {q}")
+    hits = await run_io(search_index.search, q, limit, offset, video_id, kind)
+    return SearchResponse(query=q, hits=hits)
 
 
 @app.post("/api/v1/download",
@@ -104,6 +138,31 @@ async def download_video(payload: DownloadRequest):
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred during download: {e}")
 
 
+@app.post("/api/v1/batch", response_model=BatchStatus, responses={400: {"model": ErrorDetail}})
+async def start_batch(payload: BatchRequest):
+    """批量导入：展开播放列表/频道后在后台逐条处理，返回batch_id供查询进度."""
+    try:
+        batch = batch_registry.start(payload.urls, payload.file_ids, payload.subtitle_model, payload.reprocess)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return batch.snapshot()
+
+
+@app.get("/api/v1/batch/{batch_id}", response_model=BatchStatus, responses={404: {"model": ErrorDetail}})
+async def get_batch(batch_id: str):
+    batch = batch_registry.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    return batch.snapshot()
+
+
+@app.delete("/api/v1/batch/{batch_id}")
+async def cancel_batch(batch_id: str):
+    if not batch_registry.cancel(batch_id):
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    return {"message": "Batch cancelled."}
+
+
 @app.post("/api/v1/transcribe",
           response_model=TranscribeResponse,
           responses={404: {"model": ErrorDetail}, 500: {"model": ErrorDetail}})
@@ -142,7 +201,8 @@ async def generate_markdown(payload: GenerateRequest, background_tasks: Backgrou
     """ AI Markdown generation based on transcript_id."""
     print(f" AI generation markdown using '{payload.model_type}' for transcript_id: {payload.transcript_id}")
     transcript_filename = f"{payload.transcript_id}.srt"
-    transcript_path = os.path.join(UPLOAD_DIR, transcript_filename)
+    transcript_path = artifact_store.latest(payload.transcript_id, "transcript") or os.path.join(
+        UPLOAD_DIR, transcript_filename)
 
     if not os.path.exists(transcript_path):
         print(f"Transcript file not found for generation: {transcript_path}")
@@ -173,8 +233,31 @@ async def generate_markdown(payload: GenerateRequest, background_tasks: Backgrou
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred during generation: {e}")
 
 
-# In-memory storage for demo purposes. Use a DB in production.
-results_store: dict = {}
+@app.post("/api/v1/generate/stream",
+          responses={400: {"model": ErrorDetail}, 404: {"model": ErrorDetail}})
+async def generate_markdown_stream(payload: GenerateRequest):
+    """Streams generated markdown (text/markdown chunks) as the model produces it."""
+    if not payload.transcript_id:
+        raise HTTPException(status_code=400, detail="Missing transcript_id.")
+    if not payload.model_type:
+        raise HTTPException(status_code=400, detail="Missing model_type.")
+    transcript_path = artifact_store.latest(payload.transcript_id, "transcript") or os.path.join(
+        UPLOAD_DIR, f"{payload.transcript_id}.srt")
+    if not os.path.exists(transcript_path):
+        raise HTTPException(status_code=404, detail=f"Transcript file for ID {payload.transcript_id} not found.")
+    with open(transcript_path, "r") as f:
+        transcript_text = f.read()
+
+    async def markdown_chunks():
+        try:
+            async for delta in stream_ai_generation(transcript_text, payload.model_type):
+                yield delta
+        except Exception as e:
+            # 响应头已发送，只能在流末尾附上错误信息
+            print(f"Error streaming markdown: {e}")
+            yield f"\n\n> 生成失败: {e}\n"
+
+    return StreamingResponse(markdown_chunks(), media_type="text/markdown; charset=utf-8")
 
 
 # @app.post("/api/process/url",
@@ -225,10 +308,86 @@ results_store: dict = {}
 @app.get("/api/result/{video_id}", response_model=ProcessResponse)
 async def get_result(video_id: str):
     """Retrieves cached results (if needed, e.g., for long tasks)."""
-    result = results_store.get(video_id)
-    if not result:
+    # 处理完成时由流水线写入result_store，重启后和多worker下都可查询
+    payload = await run_io(result_store.get_json, video_id)
+    if not payload:
         raise HTTPException(status_code=404, detail="Result not found.")
-    return result
+    # 存储的就是序列化好的JSON，直接返回，不再逐段校验
+    return Response(content=payload, media_type="application/json")
+
+
+@app.get("/api/transcript/{video_id}/segments")
+async def transcript_segments(video_id: str, request: Request,
+                              t_from: Optional[float] = Query(None, alias="from", ge=0),
+                              t_to: Optional[float] = Query(None, alias="to", gt=0),
+                              t: Optional[float] = Query(None, ge=0),
+                              offset: int = Query(0, ge=0),
+                              limit: int = Query(TRANSCRIPT_PAGE_SIZE, ge=1, le=1000)):
+    """
+    按时间查询字幕：from/to返回与[from, to)重叠的段，t返回包含时间t的段及其后续段，都不传时返回全部；
+    结果按offset/limit分页，带ETag可被浏览器缓存。
+    """
+    version, transcript = await run_io(transcript_index.get, video_id)
+    if transcript is None:
+        raise HTTPException(status_code=404, detail="Transcript not found.")
+    etag = '"' + hashlib.sha1(f"{version}|{video_id}|{request.url.query}".encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    current = None
+    if t is not None:
+        index = transcript.index_at(t)
+        # t落在两段之间时从下一段开始
+        current = index if index >= 0 else None
+        lo = index if index >= 0 else transcript.window(t, float("inf"))[0]
+        hi = len(transcript)
+    elif t_from is not None or t_to is not None:
+        lo, hi = transcript.window(t_from or 0.0, t_to if t_to is not None else float("inf"))
+    else:
+        lo, hi = 0, len(transcript)
+    start = min(hi, lo + offset)
+    stop = min(hi, start + limit)
+    next_offset = offset + (stop - start) if stop < hi else None
+    # 段列表直接由列式字幕编码，不经过逐段的Pydantic对象
+    body = (f'{{"video_id":{json.dumps(video_id)},"total":{hi - lo},"offset":{offset},'
+            f'"start_index":{start},"current":{json.dumps(current)},'
+            f'"next_offset":{json.dumps(next_offset)},"segments":{transcript.slice(start, stop).to_json()}}}')
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.post("/api/qa", response_model=QAResponse,
+          responses={404: {"model": ErrorDetail}, 500: {"model": ErrorDetail}})
+async def question_answer(payload: QARequest):
+    """基于字幕检索的问答：只把最相关的几个时间片段发给LLM."""
+    if not payload.question.strip():
+        raise HTTPException(status_code=400, detail="Missing question.")
+    try:
+        answer, hits = await answer_question(payload.video_id, payload.question, payload.model_type,
+                                             payload.top_k or QA_TOP_K)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IOError as e:
+        raise HTTPException(status_code=500, detail=f"Question answering failed: {e}")
+    return QAResponse(answer=answer, model_used=payload.model_type, sources=hits)
+
+
+@app.get("/api/results", response_model=ResultListResponse)
+async def list_results(page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=100)):
+    """按完成时间倒序分页列出处理结果."""
+    total, items = await run_io(result_store.list, page, page_size)
+    return ResultListResponse(total=total, page=page, page_size=page_size, items=items)
+
+
+@app.delete("/api/result/{video_id}")
+async def delete_result(video_id: str):
+    await run_io(result_store.delete, video_id)
+    await run_io(search_index.remove, video_id)
+    await run_io(qa_index_store.remove, video_id)
+    transcript_index.remove(video_id)
+    return {"message": "Result deleted."}
 
 
 @app.post("/upload/file", responses={400: {"model": ErrorResponse}})
@@ -240,25 +399,77 @@ async def upload_video_file(file: UploadFile = File(...)):
 
     # Generate a unique filename to avoid conflicts and potential security issues
     ext = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{ext}"
-    file_location = os.path.join(UPLOAD_DIR, unique_filename)
+
+    async def file_chunks():
+        while chunk := await file.read(UPLOAD_WRITE_BUFFER):
+            yield chunk
 
     try:
-        with open(file_location, "wb+") as file_object:
-            # Consider reading in chunks for large files
-            file_object.write(await file.read())
+        # 按块写入临时文件并同时计算哈希，完成后原子替换
+        unique_filename, _ = await save_upload(file_chunks(), ext)
 
         # Return the unique filename (or a full path/ID) to the client
         return {"file_id": unique_filename, "message": "File uploaded successfully."}
     except Exception as e:
-        # Clean up partially saved file on error
-        if os.path.exists(file_location):
-            os.remove(file_location)
         raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
     finally:
         await file.close()
 
 
+@app.delete("/upload/file/{file_id}", responses={404: {"model": ErrorResponse}})
+async def release_video_file(file_id: str):
+    """释放一次上传引用；相同内容的上传共用文件，最后一个引用释放时才删除."""
+    remaining = await run_io(release_upload, file_id)
+    if remaining is None:
+        raise HTTPException(status_code=404, detail="Uploaded file not found.")
+    return {"file_id": file_id, "refcount": remaining}
+
+
+def upload_session_status(session: dict) -> UploadSessionStatus:
+    return UploadSessionStatus(chunk_size=UPLOAD_CHUNK_SIZE, **session)
+
+
+@app.post("/upload/sessions", response_model=UploadSessionStatus, responses={400: {"model": ErrorResponse}})
+async def create_upload_session(payload: UploadSessionRequest):
+    """创建可续传的分片上传会话."""
+    if payload.content_type and not payload.content_type.startswith(("video/", "audio/")):
+        raise HTTPException(status_code=400, detail="Invalid file type.")
+    try:
+        return upload_session_status(await run_io(upload_sessions.create, payload.filename, payload.size))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/upload/sessions/{upload_id}", response_model=UploadSessionStatus, responses={404: {"model": ErrorResponse}})
+async def get_upload_session(upload_id: str):
+    """查询已接收的字节数，客户端断线后从offset继续上传."""
+    session = await run_io(upload_sessions.get, upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found.")
+    return upload_session_status(session)
+
+
+@app.put("/upload/sessions/{upload_id}", response_model=UploadSessionStatus,
+         responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 409: {"model": ErrorResponse}})
+async def upload_session_chunk(upload_id: str, request: Request, offset: int = Query(...)):
+    """请求体为原始字节，从offset开始追加；全部接收后返回file_id."""
+    try:
+        session = await upload_sessions.append(upload_id, offset, request.stream())
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadOffsetError as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return upload_session_status(session)
+
+
+@app.delete("/upload/sessions/{upload_id}")
+async def abort_upload_session(upload_id: str):
+    await run_io(upload_sessions.abort, upload_id)
+    return {"message": "Upload session aborted."}
+
+
 # # --- SSE服务节点 ---
 # @app.get("/api/process/stream")
 # async def process_stream(
@@ -293,12 +504,13 @@ async def upload_video_file(file: UploadFile = File(...)):
 #     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 
-async def processing_task(websocket: WebSocket, source: str, is_url: bool):
+async def processing_task(websocket: WebSocket, source: str, is_url: bool, subtitle_model: str = None):
     """The actual processing logic wrapped for WebSocket communication."""
     try:
         # Modify process_video_stream to yield python dicts instead of formatted strings
-        async for update in process_video_stream_dict_updates(source, is_url): # Needs modification in services.py
-            await websocket.send_text(json.dumps(update))
+        # 相同来源的任务正在运行时共享其进度和结果，不重复处理
+        async for update in job_registry.subscribe(source, is_url, subtitle_model):
+            await websocket.send_text(dumps_with_transcripts(update))
             # Check if client disconnected during a long step
             # Note: FastAPI handles disconnect exceptions generally, but explicit checks can be added
     except WebSocketDisconnect:
@@ -319,6 +531,17 @@ async def processing_task(websocket: WebSocket, source: str, is_url: bool):
         # Optionally send a final "closed" message if needed, though disconnect usually handles it
 
 
+async def batch_task(websocket: WebSocket, batch_id: str):
+    """推送批量任务的条目进度；连接断开只停止推送，批量任务继续在后台运行."""
+    try:
+        async for update in batch_registry.subscribe(batch_id):
+            await websocket.send_text(json.dumps(update, ensure_ascii=False))
+    except KeyError:
+        await websocket.send_text(json.dumps({"status": "error", "message": f"批量任务{batch_id}不存在"}))
+    except WebSocketDisconnect:
+        print(f"批量任务推送期间客户端断连 {batch_id}")
+
+
 """
 SSE: 单向（服务器 -> 客户端），基于标准 HTTP，EventSource API 简单，适合纯粹的进度推送。
 WebSockets: 双向，需要特定协议和 API，但连接持久高效，适合需要交互或低延迟的场景。FastAPI 支持良好。
@@ -344,17 +567,31 @@ async def websocket_endpoint(websocket: WebSocket):
             # 消息格式
             # {"type": "url", "value": "http://...", "subtitle_model": "whispercpp(medium)", "llm_model":"deepseekk-coder"}
             # {"type": "file", "value": "unique_file_id", "subtitle_model": "whispercpp(medium)", "llm_model":"deepseekk-coder"}
+            # {"type": "batch", "urls": [...], "file_ids": [...], "subtitle_model": "..."} 新建批量任务
+            # {"type": "batch", "batch_id": "..."} 重新订阅已有批量任务的进度
+            if data.get("type") == "batch":
+                batch_id = data.get("batch_id")
+                if not batch_id:
+                    try:
+                        batch_id = batch_registry.start(data.get("urls") or [], data.get("file_ids") or [],
+                                                        data.get("subtitle_model"),
+                                                        bool(data.get("reprocess"))).batch_id
+                    except ValueError as e:
+                        await websocket.send_text(json.dumps({"status": "error", "message": str(e)}))
+                        continue
+                processing_job = asyncio.create_task(batch_task(websocket, batch_id))
+                break
             if "type" in data and "value" in data:
                 source_type = data["type"]
                 source_value = data["value"]  #url
-                subtitle_model = data['subtitle_model']
-                llm_model = data['llm_model']
+                subtitle_model = data.get('subtitle_model')
+                llm_model = data.get('llm_model')
                 print(f"type={source_type}, value={source_value}, subtitle_mode={subtitle_model}, llm_model={llm_model}")
 
                 if source_type == "url":
                     # Start the processing task in the background
                     processing_job = asyncio.create_task(
-                        processing_task(websocket, source_value, is_url=True)
+                        processing_task(websocket, source_value, is_url=True, subtitle_model=subtitle_model)
                     )
                     # Don't await here, let it run in background while this loop waits for potential disconnect
                     # Optional: Send an ack back? await websocket.send_text(...)
@@ -362,7 +599,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 elif source_type == "file":
                     # Assuming file_id is passed after upload
                     processing_job = asyncio.create_task(
-                        processing_task(websocket, source_value, is_url=False)
+                        processing_task(websocket, source_value, is_url=False, subtitle_model=subtitle_model)
                     )
                     break # Exit the receive loop
                 else:
@@ -0,0 +1,134 @@
+# backend/app/media_response.py
+import hashlib
+import os
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+"""
+音视频文件的分段(Range)响应：
+支持 Range/If-Range/If-None-Match，返回206/304/416，并带 Accept-Ranges、ETag、Last-Modified，
+播放器拖动进度条时只传输请求的字节区间。
+服务器支持ASGI http.response.zerocopysend扩展时由操作系统sendfile直接发送，
+否则在线程池中按块pread读取，每块只经过一次用户态拷贝。
+"""
+
+MEDIA_CHUNK_SIZE = 256 * 1024
+
+
+def file_etag(st: os.stat_result) -> str:
+    raw = f"{st.st_mtime_ns}-{st.st_size}-{st.st_ino}".encode()
+    return '"' + hashlib.md5(raw).hexdigest() + '"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个字节区间，返回闭区间(start, end)；
+    返回None表示忽略Range按完整文件响应(多区间、格式错误)，区间不可满足时抛ValueError.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    if first == "":
+        # bytes=-500：最后500字节
+        if not last.isdigit():
+            return None
+        if int(last) == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - int(last)), size - 1
+    if not first.isdigit() or (last and not last.isdigit()):
+        return None
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+def _read_at(fd: int, size: int, offset: int) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(fd, size, offset)
+    # Windows没有pread；每个响应独占一个fd，lseek不会互相干扰
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+class RangeFileResponse(Response):
+    def __init__(self, path: str, request_headers, media_type: str = "application/octet-stream",
+                 chunk_size: int = MEDIA_CHUNK_SIZE):
+        super().__init__(content=None, media_type=media_type)
+        self.path = path
+        self.chunk_size = chunk_size
+        st = os.stat(path)
+        if not stat.S_ISREG(st.st_mode):
+            raise FileNotFoundError(path)
+        self.size = st.st_size
+        etag = file_etag(st)
+        last_modified = formatdate(st.st_mtime, usegmt=True)
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["etag"] = etag
+        self.headers["last-modified"] = last_modified
+
+        self.start, self.end = 0, self.size - 1
+        if etag in [tag.strip() for tag in request_headers.get("if-none-match", "").split(",")]:
+            self.status_code = 304
+            self.start, self.end = 0, -1
+            del self.headers["content-length"]
+            return
+        range_header = request_headers.get("range")
+        if range_header and self._if_range_matches(request_headers.get("if-range"), etag, st.st_mtime):
+            try:
+                byte_range = parse_range(range_header, self.size)
+            except ValueError:
+                self.status_code = 416
+                self.headers["content-range"] = f"bytes */{self.size}"
+                self.headers["content-length"] = "0"
+                self.start, self.end = 0, -1
+                return
+            if byte_range is not None:
+                self.start, self.end = byte_range
+                self.status_code = 206
+                self.headers["content-range"] = f"bytes {self.start}-{self.end}/{self.size}"
+        self.headers["content-length"] = str(self.end - self.start + 1)
+
+    @staticmethod
+    def _if_range_matches(if_range: Optional[str], etag: str, mtime: float) -> bool:
+        # 文件已变化时忽略Range，返回完整的新文件
+        if not if_range:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith(('"', 'W/')):
+            return if_range == etag
+        try:
+            return parsedate_to_datetime(if_range).timestamp() >= int(mtime)
+        except (TypeError, ValueError):
+            return False
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        if scope.get("method") == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        fd = os.open(self.path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": fd,
+                            "offset": self.start, "count": count, "more_body": False})
+                return
+            offset, end = self.start, self.end + 1
+            while offset < end:
+                chunk = await run_in_threadpool(_read_at, fd, min(self.chunk_size, end - offset), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": offset < end})
+            if offset < end:
+                # 文件在传输中被截断
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(fd)
@@ -0,0 +1,116 @@
+# backend/app/model_pool.py
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from base_config import *
+
+"""
+进程内常驻的faster-whisper模型池：
+按(model_name, compute_type, device)缓存已加载的WhisperModel，连续任务只付推理开销；
+超出内存预算时按LRU淘汰空闲模型，正在使用(lease)的模型不会被淘汰。
+"""
+
+# 模型参数量(百万)，用于估算常驻内存
+_MODEL_PARAMS_M = {
+    'tiny': 39, 'base': 74, 'small': 244, 'medium': 769,
+    'large-v1': 1550, 'large-v2': 1550, 'large-v3': 1550, 'large': 1550,
+    'distil-small': 166, 'distil-medium': 394, 'distil-large-v2': 756, 'distil-large-v3': 756,
+}
+_BYTES_PER_PARAM = {'int8': 1, 'int8_float32': 1, 'int8_float16': 1, 'int8_bfloat16': 1,
+                    'float16': 2, 'bfloat16': 2}
+
+
+def estimate_model_mb(model_name: str, compute_type: str) -> int:
+    params = _MODEL_PARAMS_M.get(model_name.replace('.en', ''), 1550)
+    return params * _BYTES_PER_PARAM.get(compute_type, 4)
+
+
+class _PoolEntry:
+    __slots__ = ('model', 'size_mb', 'leases')
+
+    def __init__(self, model, size_mb):
+        self.model = model
+        self.size_mb = size_mb
+        self.leases = 0
+
+
+class WhisperModelPool:
+    def __init__(self, budget_mb: int = FASTERWHISPER_MEMORY_BUDGET_MB):
+        self.budget_mb = budget_mb
+        self._entries: "OrderedDict[tuple, _PoolEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 同一个key只加载一次，其它线程等待加载完成后共享
+        self._loading: dict = {}
+        # 正在加载的模型预占的内存，并发加载不同模型时彼此计入
+        self._loading_mb: dict = {}
+
+    def _used_mb(self) -> int:
+        return sum(entry.size_mb for entry in self._entries.values()) + sum(self._loading_mb.values())
+
+    def _evict(self, incoming_mb: int, keep: tuple = None):
+        """按LRU淘汰空闲模型直到放得下incoming_mb；keep(刚用完的模型)不淘汰，单个超预算的模型不会每次重新加载."""
+        for key in list(self._entries.keys()):
+            if self._used_mb() + incoming_mb <= self.budget_mb:
+                break
+            entry = self._entries[key]
+            if entry.leases == 0 and key != keep:
+                print(f"淘汰whisper模型: {key}")
+                del self._entries[key]
+
+    def _acquire(self, key: tuple):
+        from faster_whisper import WhisperModel
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry.leases += 1
+                    return entry
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    # 先淘汰再加载，新旧模型不会同时超出预算常驻
+                    size_mb = estimate_model_mb(key[0], key[1])
+                    self._evict(size_mb)
+                    self._loading_mb[key] = size_mb
+                    break
+            loading.wait()
+
+        model_name, compute_type, device = key
+        try:
+            print(f"加载whisper模型: {key}")
+            model = WhisperModel(model_name, device, compute_type=compute_type,
+                                 cpu_threads=FASTERWHISPER_CPU_THREADS,
+                                 num_workers=FASTERWHISPER_NUM_WORKERS)
+            with self._lock:
+                entry = self._entries[key] = _PoolEntry(model, size_mb)
+                entry.leases += 1
+                return entry
+        finally:
+            with self._lock:
+                self._loading_mb.pop(key)
+                self._loading.pop(key).set()
+
+    @contextmanager
+    def lease(self, model_name: str, compute_type: str = FASTERWHISPER_COMPUTE_TYPE,
+              device: str = FASTERWHISPER_DEVICE):
+        """借用模型；with块内模型不会被淘汰，faster-whisper的惰性segments需在块内消费完."""
+        key = (model_name, compute_type, device)
+        entry = self._acquire(key)
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.leases -= 1
+                if key in self._entries:
+                    # 加载时仍在使用而没能淘汰的模型，用完后再淘汰
+                    self._evict(0, keep=key)
+
+    def clear(self):
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry.leases == 0]:
+                del self._entries[key]
+
+
+whisper_model_pool = WhisperModelPool()
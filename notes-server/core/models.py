@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, HttpUrl
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class UrlRequest(BaseModel):
@@ -59,10 +59,110 @@ class ProcessResponse(BaseModel):
     # Provide a URL the frontend can use to stream/fetch the video
     # This might be the original URL if allowed, or a path to a locally served file
     video_source_url: str
-    transcript: List[TranscriptSegment]
+    transcript: List[TranscriptSegment] = []
+    # 流式字幕时segments已通过partial消息推送，这里只记录数量
+    transcript_streamed: bool = False
+    transcript_segment_count: Optional[int] = None
     brief_summary: str
     detailed_summary: Optional[str] = None
-    # Add other fields as needed: article, qna_enabled, etc.
+    qna_enabled: bool = False  # 已建好字幕问答索引，可调用/api/qa
+    # Add other fields as needed: article, etc.
+
+
+class ResultSummary(BaseModel):
+    video_id: str
+    source: Optional[str] = None
+    video_source_url: Optional[str] = None
+    size: int
+    created: float
+
+
+class ResultListResponse(BaseModel):
+    total: int
+    page: int
+    page_size: int
+    items: List[ResultSummary]
+
+
+class SearchHit(BaseModel):
+    video_id: str
+    kind: str  # segment / brief_summary / detailed_summary
+    start: Optional[float] = None  # 字幕段的时间戳，笔记命中时为空
+    end: Optional[float] = None
+    text: str
+    score: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    hits: List[SearchHit]
+
+
+class QARequest(BaseModel):
+    video_id: str
+    question: str
+    model_type: str = "deepseek-coder"
+    top_k: Optional[int] = None  # 放入prompt的字幕块数，默认QA_TOP_K
+
+
+class QASource(BaseModel):
+    start: float
+    end: float
+    text: str
+    score: float
+
+
+class QAResponse(BaseModel):
+    answer: str
+    model_used: str
+    sources: List[QASource]
+
+
+class BatchRequest(BaseModel):
+    urls: List[str] = []  # 视频、播放列表或频道URL
+    file_ids: List[str] = []  # /upload返回的file_id
+    subtitle_model: Optional[str] = None
+    reprocess: bool = False  # 为True时已有结果的来源也重新处理
+
+
+class BatchItem(BaseModel):
+    index: int
+    source: str
+    is_url: bool
+    title: Optional[str] = None
+    status: str  # pending / processing / complete / cached / error / cancelled
+    stage: Optional[str] = None
+    message: Optional[str] = None
+    video_id: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: Optional[float] = None
+
+
+class BatchStatus(BaseModel):
+    batch_id: str
+    status: str  # expanding / processing / complete / cancelled / error
+    total: int
+    counts: Dict[str, int]
+    created: float
+    finished: Optional[float] = None
+    items: List[BatchItem]
+
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: int  # 文件总字节数
+    content_type: Optional[str] = None
+
+
+class UploadSessionStatus(BaseModel):
+    upload_id: str
+    filename: Optional[str] = None
+    size: int
+    offset: int  # 已接收的字节数，续传从这里开始
+    status: str  # uploading / complete
+    chunk_size: Optional[int] = None
+    file_id: Optional[str] = None
+    digest: Optional[str] = None  # 完成后文件的sha256
 
 
 class ErrorResponse(BaseModel):
@@ -0,0 +1,101 @@
+# backend/app/page_cache.py
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Callable, Sequence
+
+from starlette.responses import Response
+
+from base_config import *
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只提供gzip
+    brotli = None
+
+"""
+渲染结果的内存缓存：按源文件(mtime, size)失效，命中时不再读文件和转换markdown。
+每个页面渲染一次后同时保存原文、gzip和brotli(若已安装)压缩版本，
+响应时按Accept-Encoding选择，并支持ETag/If-None-Match返回304。
+"""
+
+
+class RenderedPage:
+    __slots__ = ("validator", "etags", "last_modified", "media_type", "body", "gzip", "br")
+
+    def __init__(self, validator: tuple, body: bytes, media_type: str, mtime: float):
+        self.validator = validator
+        self.body = body
+        self.media_type = media_type
+        digest = hashlib.sha1(body).hexdigest()
+        # 强ETag要求字节一致，每种编码使用各自的ETag
+        self.etags = {None: f'"{digest}"', "gzip": f'"{digest}-gz"', "br": f'"{digest}-br"'}
+        self.last_modified = formatdate(mtime, usegmt=True)
+        self.gzip = gzip.compress(body, compresslevel=9, mtime=0)
+        self.br = brotli.compress(body) if brotli is not None else None
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class PageCache:
+    def __init__(self, max_entries: int = PAGE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._pages: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, paths: Sequence[str], render: Callable[[], str],
+            media_type: str = "text/html") -> RenderedPage:
+        """paths为页面依赖的文件(源文件、模板)，任一文件的mtime/size变化即重新渲染."""
+        stats = [os.stat(path) for path in paths]
+        validator = tuple((st.st_mtime_ns, st.st_size) for st in stats)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None and page.validator == validator:
+                self._pages.move_to_end(key)
+                return page
+        body = render().encode("utf-8")
+        page = RenderedPage(validator, body, media_type, max(st.st_mtime for st in stats))
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
+
+    def invalidate(self, key: str = None):
+        with self._lock:
+            if key is None:
+                self._pages.clear()
+            else:
+                self._pages.pop(key, None)
+
+
+def page_response(page: RenderedPage, request_headers) -> Response:
+    accept_encoding = request_headers.get("accept-encoding", "")
+    body, coding = page.body, None
+    if page.br is not None and _accepts(accept_encoding, "br"):
+        body, coding = page.br, "br"
+    elif _accepts(accept_encoding, "gzip"):
+        body, coding = page.gzip, "gzip"
+    headers = {"ETag": page.etags[coding], "Last-Modified": page.last_modified,
+               "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    # 任一编码的ETag都表示内容未变化，客户端切换Accept-Encoding时仍可返回304
+    if_none_match = request_headers.get("if-none-match", "")
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if if_none_match.strip() == "*" or any(tag in page.etags.values() for tag in tags):
+        return Response(status_code=304, headers=headers)
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type=page.media_type, headers=headers)
+
+
+page_cache = PageCache()
@@ -0,0 +1,121 @@
+# backend/app/pipeline.py
+import asyncio
+import time
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Sequence
+
+"""
+流水线阶段调度(DAG)：
+每个阶段声明依赖的阶段，依赖全部成功后立即启动(事件驱动，没有固定等待)；
+互不依赖的阶段(如主题大纲和详细笔记)并发执行。
+所有阶段的进度消息汇总到同一个队列，由run()按到达顺序产出；
+任一阶段失败时取消其余阶段并抛出StageFailed。每个阶段记录自己的开始/结束时间。
+"""
+
+
+class Stage:
+    __slots__ = ("name", "func", "deps", "messages", "success_data", "started", "finished", "status")
+
+    def __init__(self, name: str, func: Callable, deps: Sequence[str] = (),
+                 messages: Sequence[str] = ("", "", "{error}"), success_data: Callable = None):
+        # func(ctx, emit)的返回值保存在ctx[name]；messages为(开始, 成功, 失败)提示，失败提示可引用{error}
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.messages = tuple(messages)
+        self.success_data = success_data
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.status = "pending"
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        if self.started is None or self.finished is None:
+            return None
+        return round(self.finished - self.started, 3)
+
+    def timing(self) -> Dict[str, Any]:
+        return {"started": self.started, "finished": self.finished,
+                "elapsed": self.elapsed, "status": self.status}
+
+
+class StageFailed(Exception):
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(str(error))
+        self.stage = stage
+        self.error = error
+
+
+class StageGraph:
+    def __init__(self, make_status: Callable):
+        # make_status(stage, message, status, data) -> 进度消息dict
+        self.make_status = make_status
+        self.stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, func: Callable, deps: Sequence[str] = (), **kwargs) -> Stage:
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"阶段{name}依赖的阶段{dep}未定义.")
+        stage = self.stages[name] = Stage(name, func, deps, **kwargs)
+        return stage
+
+    def timings(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stage.timing() for name, stage in self.stages.items()}
+
+    async def run(self, ctx: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
+        """执行整张图，按到达顺序产出各阶段的进度消息."""
+        queue: asyncio.Queue = asyncio.Queue()
+        ready = {name: asyncio.Event() for name in self.stages}
+        finished = object()
+
+        async def run_stage(stage: Stage):
+            # 依赖完成即被唤醒，不轮询
+            for dep in stage.deps:
+                await ready[dep].wait()
+            start_message, success_message, error_message = stage.messages
+
+            def emit(message: str, status: str = "processing", data: Any = None):
+                queue.put_nowait(self.make_status(stage.name, message, status, data))
+
+            stage.started = time.time()
+            stage.status = "running"
+            emit(start_message, data={"started": stage.started})
+            try:
+                result = await stage.func(ctx, emit)
+            except asyncio.CancelledError:
+                stage.status = "cancelled"
+                stage.finished = time.time()
+                raise
+            except Exception as e:
+                stage.status = "error"
+                stage.finished = time.time()
+                emit(error_message.format(error=e), "error", {"timing": stage.timing()})
+                raise StageFailed(stage.name, e) from e
+            ctx[stage.name] = result
+            stage.status = "success"
+            stage.finished = time.time()
+            data = dict(stage.success_data(result)) if stage.success_data else {}
+            data["timing"] = stage.timing()
+            emit(f"{success_message} (耗时 {stage.elapsed:.1f}s)", "success", data)
+            ready[stage.name].set()
+
+        tasks: List[asyncio.Task] = [asyncio.ensure_future(run_stage(stage)) for stage in self.stages.values()]
+        for task in tasks:
+            # 完成回调在阶段最后一条消息之后入队
+            task.add_done_callback(lambda t: queue.put_nowait((finished, t)))
+        remaining = len(tasks)
+        try:
+            while remaining:
+                item = await queue.get()
+                if isinstance(item, tuple) and item[0] is finished:
+                    remaining -= 1
+                    task = item[1]
+                    if not task.cancelled() and task.exception() is not None:
+                        raise task.exception()
+                    continue
+                yield item
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
@@ -11,25 +11,110 @@ import uuid
 import traceback
 from typing import List, Dict, Any, AsyncGenerator, Tuple
 from models import *
-
-
-async def download(url: str) -> str:
+from executor import run_cpu, run_io, run_inference, iterate_inference, stage_limit
+from chunking import plan_transcription_chunks, transcribe_chunk, merge_chunk_segments
+from summarizer import summarize_transcript, stream_summary
+from artifacts import artifact_store, atomic_write, normalize_source, content_source, file_digest, job_key
+from pipeline import StageGraph
+from result_store import result_store
+from search_index import search_index
+from transcript import Transcript, parse_subtitle_file
+from transcript_index import transcript_index
+from qa_index import qa_index_store
+from llm_providers import agenerate_markdown_llm, clean_markdown_stream
+
+
+async def download(url: str, audio_only: bool = AUDIO_ONLY_INGEST) -> str:
     """download, saves a dummy file, returns file ID."""
     print(f"download for: {url}")
-    video_filename = ytdlp_filename(url)
+    # 先查产物索引：同一URL已下载过则不发起任何网络请求
+    source_key = normalize_source(url)
+    video_filename = artifact_store.lookup_source(source_key)
+    if video_filename and (artifact_store.get(video_filename, "video") or
+                           (audio_only and artifact_store.get(video_filename, "audio"))):
+        return video_filename
+    # 元数据只提取一次，命名和下载共用
+    info_dict = await run_io(ytdlp_extract_info, url)
+    video_filename = ytdlp_filename(url, info_dict)
     print(video_filename)
     video_path = UPLOAD_DIR + video_filename + '.mp4'
-    if os.path.exists(video_path):
-        return video_filename
     try:
-        ytdlp_downloader(url)
+        if audio_only and not os.path.exists(video_path):
+            audio_path = await run_io(ytdlp_downloader, url, info_dict, YTDLP_AUDIO_OPTS)
+            artifact_store.put(video_filename, "audio", audio_path)
+            artifact_store.register_source(source_key, video_filename)
+            if PREFETCH_VIDEO:
+                asyncio.ensure_future(prefetch_video(video_filename))
+            return video_filename
+        if not os.path.exists(video_path):
+            await run_io(ytdlp_downloader, url, info_dict)
         # uuid5_name = uuid.uuid5(uuid.NAMESPACE_URL, video_filename)
+        artifact_store.put(video_filename, "video", video_path)
+        artifact_store.register_source(source_key, video_filename)
         return video_filename
     except Exception as e:
         print(f"Error during dummy file creation: {e}")
         raise IOError(f"Failed to simulate file storage for download.") from e
 
 
+# 正在进行的按需视频下载，同一视频并发请求共享同一个任务
+_video_fetches: Dict[str, asyncio.Future] = {}
+
+
+async def _fetch_video(video_id: str) -> str:
+    urls = [key for key in artifact_store.sources_for(video_id) if not key.startswith("sha256:")]
+    if not urls:
+        raise FileNotFoundError(f"未找到视频{video_id}的来源URL.")
+    info_dict = await run_io(ytdlp_extract_info, urls[0])
+    video_path = await run_io(ytdlp_downloader, urls[0], info_dict) or UPLOAD_DIR + video_id + '.mp4'
+    print(f"视频下载完成: {video_path}")
+    return artifact_store.put(video_id, "video", video_path)
+
+
+async def ensure_video(video_id: str) -> str:
+    """返回视频文件路径；仅音频拉取的任务在这里下载视频流(已在后台下载时等待同一个任务)."""
+    video_path = artifact_store.get(video_id, "video")
+    if video_path:
+        return video_path
+    fetch = _video_fetches.get(video_id)
+    if fetch is None:
+        fetch = _video_fetches[video_id] = asyncio.ensure_future(_fetch_video(video_id))
+        fetch.add_done_callback(lambda _: _video_fetches.pop(video_id, None))
+    # shield: 单个请求断开或等待超时不会取消其它请求共享的下载
+    return await asyncio.shield(fetch)
+
+
+async def prefetch_video(video_id: str):
+    try:
+        await ensure_video(video_id)
+    except Exception as e:
+        print(f"后台视频下载失败 {video_id}: {e}")
+
+
+async def register_upload(file_id: str) -> str:
+    """登记上传文件：内容哈希 -> video_id，以及video产物路径；返回video_id."""
+    file_path = os.path.join(UPLOAD_DIR, file_id)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"未找到上传文件{file_id}.")
+    video_id = os.path.splitext(file_id)[0]
+    if not artifact_store.get(video_id, "video"):
+        digest = await run_io(file_digest, file_path)
+        artifact_store.put(video_id, "video", file_path)
+        artifact_store.register_source(content_source(digest), video_id)
+    return video_id
+
+
+def resolve_media_path(video_id: str) -> str:
+    """转写用的音视频文件：优先仅音频产物，其次视频，兼容旧的 video_id.mp4 命名."""
+    return (artifact_store.get(video_id, "audio") or artifact_store.get(video_id, "video") or
+            os.path.join(UPLOAD_DIR, f"{video_id}.mp4"))
+
+
+def transcript_params(backend: str, model_name: str) -> dict:
+    """字幕产物的缓存键：同一视频不同模型/语言/prompt生成的字幕互不复用."""
+    return {"backend": backend, "model": model_name, "language": "zh", "prompt": CHINESE_PROMPT}
+
+
 # # --- Simulation Functions (Synchronous for Frontend) ---
 # async def simulate_download(url: str) -> str:
 #     """Simulates video download, saves a dummy file, returns file ID."""
@@ -49,21 +134,57 @@ async def download(url: str) -> str:
 #         raise IOError(f"Failed to simulate file storage for download.") from e
 
 
-async def transcription(video_id: str) -> str:
+async def transcribe_chunked(video_path: str, srt_path: str, model_name: str = FASTERWHISPER_MODEL,
+                             chunk_seconds: float = TRANSCRIBE_CHUNK_SECONDS,
+                             parallelism: int = TRANSCRIBE_CHUNK_WORKERS) -> str:
+    """按VAD静音边界分块，用model_name指定的faster-whisper模型在进程池中并行转写，拼接为一个SRT."""
+    windows = await run_cpu(plan_transcription_chunks, video_path, chunk_seconds)
+    limit = asyncio.Semaphore(parallelism)
+
+    async def transcribe_window(window):
+        async with limit:
+            return await run_cpu(transcribe_chunk, video_path, *window, model_name=model_name)
+
+    chunk_results = await asyncio.gather(*[transcribe_window(window) for window in windows])
+    return write_srt(merge_chunk_segments(chunk_results), srt_path)
+
+
+async def transcription(video_id: str, subtitle_model: str = None, chunked: bool = TRANSCRIBE_CHUNKED) -> str:
     """ transcription based on video_id, returns transcript_id and text."""
     print(f"字幕video_id: {video_id}")
-    video_filename = f"{video_id}.mp4"
-    video_path = os.path.join(UPLOAD_DIR, video_filename)
+    video_path = resolve_media_path(video_id)
 
     if not os.path.exists(video_path):
         print(f"未找到音视频文件: {video_path}")
         raise FileNotFoundError(f"未找到音视频文件{video_id}.")
 
-    transcript_path = UPLOAD_DIR + video_id + '.srt'
+    backend, model_name = parse_subtitle_model(subtitle_model)
+    if chunked and backend != "fasterwhisper":
+        # 分块并行模式基于faster-whisper，字幕缓存键随之使用实际运行的模型
+        print(f"分块转写只支持faster-whisper：请求的{backend}({model_name})改用fasterwhisper({FASTERWHISPER_MODEL})")
+        backend, model_name = "fasterwhisper", FASTERWHISPER_MODEL
+    params = transcript_params(backend, model_name)
+    cached_path = artifact_store.get(video_id, "transcript", params)
+    if cached_path:
+        print(f"字幕缓存命中: {cached_path}")
+        return cached_path
+
+    transcript_path = artifact_store.artifact_path(video_id, "transcript", params, ".srt")
     print("before = " + transcript_path)
     try:
-        if not os.path.exists(transcript_path):
-            transcript_path = generate_srt_by_whispercpp(UPLOAD_DIR + video_filename)
+        if backend == "fasterwhisper":
+            if chunked:
+                await transcribe_chunked(video_path, transcript_path, model_name)
+            else:
+                async for _ in transcribe_audio_stream(video_id, model_name):
+                    pass
+        elif WHISPERCPP_USE_SERVER:
+            # ffmpeg解码到管道、推理交给常驻whisper.cpp server，本进程只读管道和等待HTTP响应
+            await run_inference(generate_srt_by_whispercpp_stream, video_path, transcript_path)
+        else:
+            srt_path = await run_cpu(generate_srt_by_whispercpp, video_path)
+            os.replace(srt_path, transcript_path)
+        artifact_store.put(video_id, "transcript", transcript_path, params)
         print("generate = " + transcript_path)
         print(f"字幕解析成功. Transcript ID: {video_id}")
         return transcript_path
@@ -111,11 +232,39 @@ async def ai_generation(transcript_text: str, model_type: str) -> str:
     else:
         model_note = f"Output generated using the '{model_type}'."
 
-    # Basic simulated markdown generation
-    markdown_content = generate_markdown_llm(model_type.lower(), transcript_text)
+    # 长字幕走分层总结：按预算切块并发总结后再合并
+    markdown_content = await summarize_transcript(transcript_text, model_type.lower())
     return markdown_content
 
 
+async def stream_ai_generation(transcript_text: str, model_type: str) -> AsyncGenerator[str, None]:
+    """ai_generation的流式版本，逐段产出markdown增量(已去掉代码块标记)."""
+    async for delta in clean_markdown_stream(stream_summary(transcript_text, model_type.lower())):
+        yield delta
+
+
+QA_PROMPT = "下面是一个问题和视频字幕中与之最相关的片段(方括号内为片段的时间)。请仅根据这些片段回答问题，并注明依据的时间点；片段中没有相关信息时请直接说明。请直接输出纯净的markdown格式内容，不要包含任何代码块标记（如```markdown或```）：{content}"
+
+
+async def answer_question(video_id: str, question: str, model_type: str = "deepseek-coder",
+                          top_k: int = QA_TOP_K) -> Tuple[str, List[Dict[str, Any]]]:
+    """检索问题最相关的top_k个字幕块，只把这些块发给LLM；返回(回答, 引用的块)."""
+    index = await run_io(qa_index_store.get, video_id)
+    if index is None:
+        # 旧结果或只有字幕产物时按需建索引
+        _, transcript = await run_io(transcript_index.get, video_id)
+        if transcript is None:
+            raise FileNotFoundError(f"未找到视频{video_id}的字幕.")
+        index = await run_io(qa_index_store.build, video_id, transcript)
+    hits = index.search(question, top_k)
+    if not hits:
+        return "字幕中没有找到与问题相关的内容。", []
+    snippets = "\n".join(f"[{seconds_to_srt_time(hit['start'])[:8]} - {seconds_to_srt_time(hit['end'])[:8]}] {hit['text']}"
+                         for hit in sorted(hits, key=lambda hit: hit["start"]))
+    answer = await agenerate_markdown_llm(model_type.lower(), f"问题：{question}\n\n字幕片段：\n{snippets}", QA_PROMPT)
+    return answer, hits
+
+
 # async def simulate_ai_generation(transcript_id: str, model_type: str) -> str:
 #     """Simulates AI Markdown generation based on transcript_id."""
 #     print(f"Simulating AI generation using '{model_type}' for transcript_id: {transcript_id}")
@@ -418,9 +567,8 @@ async def download_and_prep_audio(source: str, is_url: bool) -> Tuple[str, str]:
     # --- End  ---
 
     # Determine paths/URLs - Actual logic would go here
-    video_filename = await download(source)
-
     if is_url:
+        video_filename = await download(source)
         # Real logic: Use yt-dlp to download, ffmpeg to extract audio to local_audio_path
         # media_source_url might be the original URL if playable, or a path if served locally
         media_source_url = f"http://localhost:8000/video/" + video_filename + '.mp4'
@@ -431,13 +579,13 @@ async def download_and_prep_audio(source: str, is_url: bool) -> Tuple[str, str]:
         # Construct the URL the frontend can use to access the original file
         media_source_url = f"/static/uploads/{source}"
         #local_audio_path = os.path.join("static/uploads", source)  # Use the actual uploaded path for processing
+        video_filename = await register_upload(source)
         print(f"上传文件: {source}. 地址: {video_filename}，{media_source_url}")
-        # Add checks here: if not os.path.exists(local_audio_path): raise FileNotFoundError(...)
 
     return media_source_url, video_filename
 
 
-async def transcribe_audio(video_filename: str) -> str:
+async def transcribe_audio(video_filename: str, subtitle_model: str = None) -> str:
     """
     Transcribes the audio file at the given path. Returns list of segments.
     Raises exceptions on failure.
@@ -447,17 +595,53 @@ async def transcribe_audio(video_filename: str) -> str:
         raise ValueError(" 字幕失败.")
     print(f"字幕: {video_filename}")
     # --- End  ---
-    transcript_path = await transcription(video_filename)
+    transcript_path = await transcription(video_filename, subtitle_model)
     print(transcript_path)
     return transcript_path
 
 
-async def transcribe_audio_tosegment(transcript_path) -> List[TranscriptSegment]:
-    transcript_segments = parse_srt_to_transcript_segments(transcript_path)
-    transcript = []
-    for segment in transcript_segments:
-        transcript.append(TranscriptSegment(start=segment['start'], end=segment['end'], text=segment['text'].strip()))
-    return transcript
+def parse_subtitle_model(subtitle_model: str) -> Tuple[str, str]:
+    """
+    'fasterwhisper_tiny' -> ('fasterwhisper', 'tiny')；未指定时使用whispercpp。
+    whisper.cpp(常驻server和命令行)只加载WHISPERCPP_MODEL，返回实际运行的模型，字幕缓存键与之一致。
+    """
+    if not subtitle_model:
+        return "whispercpp", WHISPERCPP_MODEL
+    backend, _, model_name = subtitle_model.partition("_")
+    if backend == "fasterwhisper":
+        return backend, model_name or FASTERWHISPER_MODEL
+    if model_name and model_name != WHISPERCPP_MODEL:
+        print(f"whisper.cpp只加载{WHISPERCPP_MODEL}模型，忽略请求的{model_name}")
+    return "whispercpp", WHISPERCPP_MODEL
+
+
+async def transcribe_audio_stream(video_filename: str, model_name: str = FASTERWHISPER_MODEL) -> AsyncGenerator[List[Dict[str, Any]], None]:
+    """
+    faster-whisper边解码边产出字幕批次，同时增量写入SRT；
+    全部完成后才原子替换为正式字幕并登记产物，中途失败/断连不会留下半个字幕文件。
+    """
+    video_path = resolve_media_path(video_filename)
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"未找到音视频文件{video_filename}.")
+    params = transcript_params("fasterwhisper", model_name)
+    srt_path = artifact_store.artifact_path(video_filename, "transcript", params, ".srt")
+    index = 0
+    with atomic_write(srt_path) as srt_file:
+        async for batch in iterate_inference(iter_segments_by_fasterwhisper, video_path, model_name=model_name,
+                                             max_batch=TRANSCRIPT_STREAM_BATCH):
+            segments = []
+            for start, end, text in batch:
+                index += 1
+                srt_file.write(f"{index}\n{seconds_to_srt_time(start)} --> {seconds_to_srt_time(end)}\n{text}\n\n")
+                segments.append({"start": start, "end": end, "text": text})
+            srt_file.flush()
+            yield segments
+    artifact_store.put(video_filename, "transcript", srt_path, params)
+
+
+async def transcribe_audio_tosegment(transcript_path) -> Transcript:
+    # 列式字幕：单遍解析，不逐段创建Pydantic对象
+    return await run_io(parse_subtitle_file, transcript_path)
 
 
 async def generate_summary(full_text: str, brief: bool) -> str:
@@ -482,78 +666,134 @@ async def generate_summary(full_text: str, brief: bool) -> str:
     return summary
 
 
+async def generate_summary_stream(full_text: str) -> AsyncGenerator[str, None]:
+    """
+    Streams the brief summary as markdown deltas.
+    Raises exceptions on failure.
+    """
+    if "fail_summary" in full_text:  # Trigger specific failure
+        raise ValueError(" brief summary异常.")
+    print(" brief 流式生成summary...")
+    async for delta in stream_ai_generation(full_text, "deepseek-coder"):
+        yield delta
+
+
 # --- Main Generator Service Function (Handles ALL Yielding) ---
-async def process_video_stream_dict_updates(source: str, is_url: bool) -> AsyncGenerator[Dict[str, Any], None]:
+def build_pipeline(source: str, is_url: bool, subtitle_model: str, final_result_payload: Dict[str, Any]) -> StageGraph:
+    """
+    download -> transcription -> (summary_brief || summary_detailed)
+    两个summary只依赖字幕，字幕完成后同时启动。
+    """
+    async def download_stage(ctx, emit):
+        async with stage_limit("download", PIPELINE_DOWNLOAD_CONCURRENCY):
+            media_source_url, video_filename = await download_and_prep_audio(source, is_url)
+        final_result_payload["video_source_url"] = media_source_url
+        ctx["local_audio_path_to_clean"] = os.path.join(UPLOAD_DIR, video_filename + '.mp4')
+        return video_filename
+
+    async def transcribe(ctx, emit):
+        video_filename = ctx["download"]
+        backend, model_name = parse_subtitle_model(subtitle_model)
+        streaming = (backend == "fasterwhisper" and not TRANSCRIBE_CHUNKED and not artifact_store.get(
+            video_filename, "transcript", transcript_params(backend, model_name)))
+        if streaming:
+            # 流式字幕：每批segments解码出来就推送给客户端，complete消息只引用不重复发送
+            texts = []
+            segments = ctx["streamed_segments"] = []
+            async for batch in transcribe_audio_stream(video_filename, model_name):
+                emit(f"已解析 {len(texts) + len(batch)} 条字幕", "partial",
+                     {"offset": len(texts), "segments": batch})
+                texts.extend(segment["text"] for segment in batch)
+                segments.extend(batch)
+            final_result_payload["transcript_streamed"] = True
+            final_result_payload["transcript_segment_count"] = len(texts)
+            # 按行拼接，保留字幕段边界供分层总结切块
+            return {"text": "\n".join(texts), "segment_count": len(texts)}
+        transcript_path = await transcribe_audio(video_filename, subtitle_model)
+        transcript = await transcribe_audio_tosegment(transcript_path)
+        # 发送时由dumps_with_transcripts直接编码为JSON数组
+        final_result_payload["transcript"] = transcript
+        return {"text": transcript.text, "segment_count": len(transcript)}
+
+    async def transcription_stage(ctx, emit):
+        async with stage_limit("transcribe", PIPELINE_TRANSCRIBE_CONCURRENCY):
+            return await transcribe(ctx, emit)
+
+    async def summary_brief_stage(ctx, emit):
+        # 逐token转发给客户端，首个token到达即可展示
+        brief_parts = []
+        async with stage_limit("llm", PIPELINE_LLM_CONCURRENCY):
+            async for delta in generate_summary_stream(ctx["transcription"]["text"]):
+                brief_parts.append(delta)
+                emit("", "delta", {"delta": delta})
+        final_result_payload["brief_summary"] = clean_markdown("".join(brief_parts))
+
+    async def summary_detailed_stage(ctx, emit):
+        async with stage_limit("llm", PIPELINE_LLM_CONCURRENCY):
+            final_result_payload["detailed_summary"] = await generate_summary(ctx["transcription"]["text"], False)
+
+    graph = StageGraph(create_status_dict)
+    graph.add("download", download_stage,
+              messages=(f"开始下载，请求资源为(url/文件): {source}", "下载成功.", "下载失败: {error}"))
+    graph.add("transcription", transcription_stage, deps=["download"],
+              messages=("开始字幕解析...", "字幕解析成功.", "字幕解析失败: {error}"),
+              success_data=lambda result: {"segment_count": result["segment_count"]})
+    graph.add("summary_brief", summary_brief_stage, deps=["transcription"],
+              messages=("开始生成主题大纲summary...", "主题大纲summary生成成功.", "主题大纲生成失败: {error}"))
+    graph.add("summary_detailed", summary_detailed_stage, deps=["transcription"],
+              messages=("开始生成笔记summary...", "笔记summary生成成功.", "笔记summary生成失败: {error}"))
+    return graph
+
+
+async def run_after_complete(description: str, func, *args) -> bool:
+    """流程完成后的附加步骤：在线程池中执行，异常打印后返回False."""
+    try:
+        await run_io(func, *args)
+        return True
+    except Exception as e:
+        print(f"{description}失败: {e}")
+        traceback.print_exc()
+        return False
+
+
+def store_result(video_id: str, result: dict, source: str, key: str):
+    """持久化结果；同一job_key重新处理时替换旧结果，旧结果的全文索引和问答索引一并删除，搜索不会出现重复."""
+    for old_id in result_store.put(video_id, result, source, key):
+        search_index.remove(old_id)
+        qa_index_store.remove(old_id)
+        transcript_index.remove(old_id)
+
+
+async def process_video_stream_dict_updates(source: str, is_url: bool, subtitle_model: str = None) -> AsyncGenerator[Dict[str, Any], None]:
     """
     Orchestrates processing and yields status update dictionaries.
     """
     video_id = str(uuid.uuid4())
     final_result_payload = {"video_id": video_id}
-    local_audio_path_to_clean = None  # Keep track of temp file if created
+    ctx: Dict[str, Any] = {}
+    graph = build_pipeline(source, is_url, subtitle_model, final_result_payload)
 
     try:
-        # === Step 1: Download/Preparation ===
-        stage = "download"
-        yield create_status_dict(stage, f"开始下载，请求资源为(url/文件): {source}")
-        await asyncio.sleep(1)
-        try:
-            # Await the result directly from the sub-function
-            media_source_url, video_filename = await download_and_prep_audio(source, is_url)
-            final_result_payload["video_source_url"] = media_source_url
-            local_audio_path_to_clean = os.path.join(UPLOAD_DIR, video_filename + '.mp4')
-            yield create_status_dict(stage, f"下载成功：{media_source_url}.", status="success")
-        except Exception as e:
-            yield create_status_dict(stage, f"下载失败: {str(e)}", status="error")
-            raise  # Re-raise to stop the entire process
-
-        # === Step 2: Transcription ===
-        stage = "transcription"
-        yield create_status_dict(stage, f"开始字幕解析...")
-        await asyncio.sleep(1)
-        try:
-            # Await the result directly
-            transcript_path = await transcribe_audio(video_filename)
-            transcript_segments = await transcribe_audio_tosegment(transcript_path)
-            # Convert Pydantic models to dicts for the final JSON payload
-            try:  # Pydantic V2+
-                final_result_payload["transcript"] = [seg.model_dump() for seg in transcript_segments]
-            except AttributeError:  # Pydantic V1
-                final_result_payload["transcript"] = [seg.dict() for seg in transcript_segments]
-            yield create_status_dict(stage, "字幕解析成功.", status="success",
-                                     data={"segment_count": len(transcript_segments)})
-        except Exception as e:
-            yield create_status_dict(stage, f"字幕解析失败: {str(e)}", status="error")
-            raise  # Re-raise
-
-        # === Step 3: Summarization ===
-        full_transcript_text = " ".join(
-            [seg.text for seg in transcript_segments])  # Use .text directly from Pydantic obj
-
-        # --- Brief Summary ---
-        stage = "summary_brief"
-        yield create_status_dict(stage, f"开始生成主题大纲summary...")
-        await asyncio.sleep(1)
-        try:
-            # Await the result directly
-            brief_summary = await generate_summary(full_transcript_text, True)
-            final_result_payload["brief_summary"] = brief_summary
-            yield create_status_dict(stage, "主题大纲summary生成成功.", status="success")
-        except Exception as e:
-            yield create_status_dict(stage, f"主题大纲生成失败: {str(e)}", status="error")
-            raise  # Re-raise (or decide if you want to continue to detailed summary)
-
-        # --- Detailed Summary ---
-        stage = "summary_detailed"
-        yield create_status_dict(stage, f"开始生成笔记summary...")
-        await asyncio.sleep(1)
-        try:
-            # Await the result directly
-            detailed_summary = await generate_summary(full_transcript_text, False)
-            final_result_payload["detailed_summary"] = detailed_summary
-            yield create_status_dict(stage, "笔记summary生成成功.", status="success")
-        except Exception as e:
-            yield create_status_dict(stage, f"笔记summary生成失败: {str(e)}", status="error")
-            raise  # Re-raise
+        # 各阶段按依赖关系调度，消息按到达顺序转发；失败阶段已自行发出error消息
+        async for update in graph.run(ctx):
+            yield update
+        final_result_payload["stage_timings"] = graph.timings()
+        if is_url and AUDIO_ONLY_INGEST and not PREFETCH_VIDEO:
+            # 转写只用了音轨：处理完成后立即后台下载视频，播放器首次请求时不必等完整下载
+            asyncio.ensure_future(prefetch_video(ctx["download"]))
+        transcript = final_result_payload.get("transcript")
+        if "streamed_segments" in ctx:
+            transcript = Transcript.from_dicts(ctx["streamed_segments"])
+        # 以下索引/持久化失败只记录日志，不影响已完成的任务，客户端仍然收到complete
+        if transcript and await run_after_complete("问答索引构建", qa_index_store.build, video_id, transcript):
+            # 预先建好问答检索索引，提问时只需检索
+            final_result_payload["qna_enabled"] = True
+        # 持久化完整结果(流式字幕在这里补全segments)，/api/result在重启后和其它worker中同样可查
+        stored_result = dict(final_result_payload)
+        stored_result["transcript"] = transcript or []
+        await run_after_complete("结果持久化", store_result, video_id, stored_result, source,
+                                 job_key(source, is_url, subtitle_model))
+        await run_after_complete("全文索引", search_index.index_result, video_id, stored_result, source)
 
         # === Step 4: Completion ===
         # If we reached here, all mandatory steps succeeded
@@ -577,6 +817,7 @@ async def process_video_stream_dict_updates(source: str, is_url: bool) -> AsyncG
     finally:
         # Cleanup temporary files if needed
         # Example: Adapt this logic based on where/if you create temp files
+        local_audio_path_to_clean = ctx.get("local_audio_path_to_clean")  # Keep track of temp file if created
         if local_audio_path_to_clean and "temp_" in local_audio_path_to_clean and os.path.exists(
                 local_audio_path_to_clean):
             try:
@@ -0,0 +1,135 @@
+# backend/app/qa_index.py
+import heapq
+import json
+import math
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import List
+
+from base_config import *
+from artifacts import artifact_store, atomic_write
+from search_index import search_tokens
+from transcript import Transcript
+
+"""
+字幕问答的检索索引：字幕按QA_CHUNK_SECONDS的时间窗口切块，建BM25倒排表，
+以JSON保存在产物目录(kind="qa_index")，与字幕等产物一起按video_id管理。
+提问时只把最相关的top-k个块放进prompt，而不是每次发送整份字幕。
+"""
+
+QA_INDEX_VERSION = 1
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def qa_index_params(chunk_seconds: float = QA_CHUNK_SECONDS) -> dict:
+    return {"version": QA_INDEX_VERSION, "chunk_seconds": chunk_seconds}
+
+
+def time_chunks(transcript: Transcript, chunk_seconds: float = QA_CHUNK_SECONDS) -> List[dict]:
+    """按时间窗口合并连续的字幕段，窗口边界落在段边界上."""
+    chunks, texts, chunk_start = [], [], None
+    for start, end, text in zip(transcript.starts, transcript.ends, transcript.texts()):
+        if chunk_start is None:
+            chunk_start = start
+        elif start - chunk_start >= chunk_seconds:
+            chunks.append({"start": chunk_start, "end": chunk_end, "text": " ".join(texts)})
+            texts, chunk_start = [], start
+        texts.append(text)
+        chunk_end = end
+    if texts:
+        chunks.append({"start": chunk_start, "end": chunk_end, "text": " ".join(texts)})
+    return chunks
+
+
+class BM25Index:
+    __slots__ = ("chunks", "lengths", "avgdl", "postings")
+
+    def __init__(self, chunks: List[dict], lengths: List[int], postings: dict):
+        self.chunks = chunks
+        self.lengths = lengths
+        self.avgdl = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self.postings = postings  # term -> [[chunk_index, tf], ...]
+
+    @classmethod
+    def build(cls, chunks: List[dict]) -> "BM25Index":
+        lengths, postings = [], {}
+        for index, chunk in enumerate(chunks):
+            counts = Counter(search_tokens(chunk["text"]))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append([index, tf])
+        return cls(chunks, lengths, postings)
+
+    def search(self, query: str, top_k: int = QA_TOP_K) -> List[dict]:
+        n = len(self.chunks)
+        scores = {}
+        for term in set(search_tokens(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for index, tf in posting:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[index] / self.avgdl)
+                scores[index] = scores.get(index, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [dict(self.chunks[index], score=score) for index, score in best]
+
+    def to_dict(self) -> dict:
+        return {"version": QA_INDEX_VERSION, "chunks": self.chunks, "lengths": self.lengths,
+                "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        return cls(data["chunks"], data["lengths"], data["postings"])
+
+
+class QAIndexStore:
+    def __init__(self, max_entries: int = QA_INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, video_id: str, index: BM25Index):
+        with self._lock:
+            self._entries[video_id] = index
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def build(self, video_id: str, transcript: Transcript, chunk_seconds: float = QA_CHUNK_SECONDS) -> BM25Index:
+        index = BM25Index.build(time_chunks(transcript, chunk_seconds))
+        params = qa_index_params(chunk_seconds)
+        path = artifact_store.artifact_path(video_id, "qa_index", params, ".qa.json")
+        with atomic_write(path) as f:
+            json.dump(index.to_dict(), f, ensure_ascii=False)
+        artifact_store.put(video_id, "qa_index", path, params)
+        self._remember(video_id, index)
+        return index
+
+    def get(self, video_id: str, chunk_seconds: float = QA_CHUNK_SECONDS):
+        """内存中或磁盘上的索引，都没有时返回None."""
+        with self._lock:
+            index = self._entries.get(video_id)
+            if index is not None:
+                self._entries.move_to_end(video_id)
+                return index
+        path = artifact_store.get(video_id, "qa_index", qa_index_params(chunk_seconds))
+        if path is None:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            index = BM25Index.from_dict(json.load(f))
+        self._remember(video_id, index)
+        return index
+
+    def remove(self, video_id: str):
+        with self._lock:
+            self._entries.pop(video_id, None)
+        path = artifact_store.get(video_id, "qa_index", qa_index_params())
+        if path and os.path.exists(path):
+            os.remove(path)
+        artifact_store.remove(video_id, "qa_index", qa_index_params())
+
+
+qa_index_store = QAIndexStore()
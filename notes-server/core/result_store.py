@@ -0,0 +1,174 @@
+# backend/app/result_store.py
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from base_config import *
+from sqlite_store import SizedTable, connect
+from transcript import dumps_with_transcripts
+
+"""
+处理结果存储：SQLite(WAL)持久化，服务重启后结果仍在，多个uvicorn worker共享同一个库；
+进程内LRU缓存结果的JSON文本，接口可直接返回而无需重新序列化；缓存命中同样检查TTL，
+并每隔RESULT_CACHE_REVALIDATE秒按主键核对一次库中的记录，其它worker删除/淘汰/覆盖的结果不会一直从缓存返回。
+超过RESULT_STORE_TTL的结果删除；总大小超过上限时按最近访问时间淘汰(访问时间只在读库时更新)。
+"""
+
+RESULT_DB = UPLOAD_DIR + "results.db"
+
+
+class ResultStore:
+    def __init__(self, db_path: str = RESULT_DB, cache_size: int = RESULT_CACHE_SIZE,
+                 ttl: float = RESULT_STORE_TTL, max_bytes: int = RESULT_STORE_MAX_BYTES,
+                 revalidate: float = RESULT_CACHE_REVALIDATE):
+        self.cache_size = cache_size
+        self.revalidate = revalidate
+        self.ttl = ttl
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = connect(db_path, """
+            CREATE TABLE IF NOT EXISTS results (
+                video_id TEXT PRIMARY KEY,
+                source   TEXT,
+                payload  TEXT NOT NULL,
+                size     INTEGER NOT NULL,
+                created  REAL NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_created ON results(created);
+            CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed);
+        """)
+        # 旧库补上job_key列(规范化来源+字幕模型)，按它查找同一来源已有的结果
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(results)").fetchall()]
+        if "job_key" not in columns:
+            self._conn.execute("ALTER TABLE results ADD COLUMN job_key TEXT")
+        self._conn.execute("DROP INDEX IF EXISTS idx_results_source")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_job_key ON results(job_key, created)")
+        self._table = SizedTable(self._conn, "results", "video_id", ttl, max_bytes)
+
+    def _remember(self, video_id: str, payload: str, created: float, now: float):
+        # (JSON文本, 结果创建时间, 上次与数据库核对的时间)
+        self._cache[video_id] = (payload, created, now)
+        self._cache.move_to_end(video_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get_json(self, video_id: str):
+        """返回结果的JSON文本，不存在或已过期返回None."""
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(video_id)
+            if entry is not None:
+                payload, created, checked = entry
+                if now - created > self.ttl:
+                    self._remove(video_id)
+                    return None
+                if now - checked <= self.revalidate:
+                    self._cache.move_to_end(video_id)
+                    return payload
+                row = self._conn.execute("SELECT created FROM results WHERE video_id = ?", (video_id,)).fetchone()
+                if row is not None and row[0] == created:
+                    self._cache[video_id] = (payload, created, now)
+                    self._cache.move_to_end(video_id)
+                    return payload
+                # 已被其它worker删除或覆盖
+                self._cache.pop(video_id, None)
+            row = self._conn.execute("SELECT payload, created FROM results WHERE video_id = ?",
+                                     (video_id,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._remove(video_id)
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE video_id = ?", (now, video_id))
+            self._remember(video_id, row[0], row[1], now)
+            return row[0]
+
+    def created(self, video_id: str):
+        """结果的创建时间(可作为版本号)，不存在或已过期返回None；缓存核对间隔与get_json一致，不读取payload."""
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(video_id)
+            if entry is not None and now - entry[2] <= self.revalidate:
+                created = entry[1]
+            else:
+                row = self._conn.execute("SELECT created FROM results WHERE video_id = ?", (video_id,)).fetchone()
+                created = row[0] if row else None
+        if created is None or now - created > self.ttl:
+            return None
+        return created
+
+    def get(self, video_id: str):
+        payload = self.get_json(video_id)
+        return json.loads(payload) if payload is not None else None
+
+    def put(self, video_id: str, result: dict, source: str = None, job_key: str = None) -> list:
+        """保存结果；同一job_key的旧结果被替换删除，返回旧结果的video_id(调用方删除它们的索引)."""
+        now = time.time()
+        payload = dumps_with_transcripts(result)
+        with self._lock:
+            # 删除旧结果和写入新结果在同一个事务中，其它worker不会看到两份或零份
+            self._conn.execute("BEGIN")
+            try:
+                replaced = []
+                if job_key is not None:
+                    replaced = [row[0] for row in self._conn.execute(
+                        "SELECT video_id FROM results WHERE job_key = ? AND video_id != ?",
+                        (job_key, video_id)).fetchall()]
+                    for old_id in replaced:
+                        self._remove(old_id)
+                self._conn.execute("INSERT OR REPLACE INTO results(video_id, source, job_key, payload, size, "
+                                   "created, accessed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   (video_id, source, job_key, payload, len(payload.encode("utf-8")), now, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._remember(video_id, payload, now, now)
+            self._evict(now)
+        return replaced
+
+    def _evict(self, now: float):
+        for video_id in self._table.evict(now):
+            self._cache.pop(video_id, None)
+
+    def _remove(self, video_id: str):
+        self._conn.execute("DELETE FROM results WHERE video_id = ?", (video_id,))
+        self._cache.pop(video_id, None)
+
+    def delete(self, video_id: str):
+        with self._lock:
+            self._remove(video_id)
+
+    def delete_for_source(self, source: str) -> list:
+        """删除某个来源(artifacts.job_source，任意字幕模型)的全部结果，返回被删除的video_id."""
+        # job_key形如"<来源>|<字幕模型>"，按前缀范围查询可以用上job_key索引；'}'是'|'之后的下一个字符
+        with self._lock:
+            video_ids = [row[0] for row in self._conn.execute(
+                "SELECT video_id FROM results WHERE job_key >= ? AND job_key < ?",
+                (source + "|", source + "}")).fetchall()]
+            for video_id in video_ids:
+                self._remove(video_id)
+        return video_ids
+
+    def latest_for_job(self, job_key: str):
+        """同一job_key(规范化来源+字幕模型)最近一次未过期结果的video_id，没有返回None."""
+        with self._lock:
+            row = self._conn.execute("SELECT video_id FROM results WHERE job_key = ? AND created >= ? "
+                                     "ORDER BY created DESC LIMIT 1", (job_key, time.time() - self.ttl)).fetchone()
+        return row[0] if row else None
+
+    def list(self, page: int = 1, page_size: int = 20):
+        """按创建时间倒序分页，返回(总数, 摘要列表)；摘要不含字幕和笔记正文."""
+        offset = (max(1, page) - 1) * page_size
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT video_id, source, json_extract(payload, '$.video_source_url'), size, created "
+                "FROM results ORDER BY created DESC LIMIT ? OFFSET ?", (page_size, offset)).fetchall()
+        keys = ("video_id", "source", "video_source_url", "size", "created")
+        return total, [dict(zip(keys, row)) for row in rows]
+
+
+result_store = ResultStore()
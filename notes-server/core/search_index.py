@@ -0,0 +1,157 @@
+# backend/app/search_index.py
+import re
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from base_config import *
+from sqlite_store import connect
+
+"""
+全文检索(SQLite FTS5 倒排索引)：索引所有视频的字幕段和生成的笔记，任务完成时增量写入。
+unicode61分词器不切分连续的中文，这里先把中日韩文字切成重叠的二元组(bigram)，
+英文/数字按词，每段中文末尾另记一个单字；查询同样切分后作为短语匹配，命中按bm25排序，返回video_id和时间戳。
+"""
+
+SEARCH_DB = UPLOAD_DIR + "search.db"
+_CJK_RUN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+_WORD = re.compile(r'\w+')
+
+
+def search_tokens(text: str, run_end: bool = False) -> List[str]:
+    """
+    中日韩文字切成重叠的二元组，其余按词。
+    run_end=True(建索引时)把每段连续中文的末字作为单字追加在最后：单字查询用前缀匹配，
+    只有末字不是任何二元组的开头，补上它才能查到(如"机器学习"中的"习")；
+    放在末尾而不是原位，跨中英文的短语查询仍然相邻。
+    """
+    tokens, run_ends = [], []
+    position = 0
+    for match in _CJK_RUN.finditer(text):
+        tokens.extend(_WORD.findall(text[position:match.start()].lower()))
+        run = match.group()
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if run_end:
+                run_ends.append(run[-1])
+        position = match.end()
+    tokens.extend(_WORD.findall(text[position:].lower()))
+    return tokens + run_ends
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """每个空格分隔的词切分后作为一个短语，多个词之间为AND；单个汉字用前缀匹配(同时命中以它开头的二元组和段末单字)."""
+    phrases = []
+    for term in query.split():
+        tokens = search_tokens(term)
+        if not tokens:
+            continue
+        if len(tokens) == 1 and _CJK_RUN.fullmatch(tokens[0]) and len(tokens[0]) == 1:
+            phrases.append(f'"{tokens[0]}"*')
+        else:
+            phrases.append('"' + " ".join(tokens) + '"')
+    return " AND ".join(phrases) if phrases else None
+
+
+def note_chunks(markdown_text: str) -> List[str]:
+    """笔记按空行分段索引."""
+    return [block.strip() for block in re.split(r'\n\s*\n', markdown_text or "") if block.strip()]
+
+
+class SearchIndex:
+    def __init__(self, db_path: str = SEARCH_DB):
+        self._lock = threading.Lock()
+        self._conn = connect(db_path, """
+            CREATE TABLE IF NOT EXISTS docs (
+                id       INTEGER PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                kind     TEXT NOT NULL,
+                start    REAL,
+                end      REAL,
+                text     TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_docs_video ON docs(video_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(tokens, tokenize='unicode61');
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                source   TEXT,
+                indexed  REAL NOT NULL
+            );
+        """)
+
+    def index_video(self, video_id: str, segments: Iterable[Tuple[float, float, str]],
+                    notes: Iterable[Tuple[str, str]] = (), source: str = None):
+        """替换video_id的全部索引：segments为(start, end, text)，notes为(kind, markdown)."""
+        rows = [("segment", start, end, text) for start, end, text in segments if text.strip()]
+        for kind, markdown_text in notes:
+            rows.extend((kind, None, None, chunk) for chunk in note_chunks(markdown_text))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._delete(video_id)
+                for kind, start, end, text in rows:
+                    cursor = self._conn.execute("INSERT INTO docs(video_id, kind, start, end, text) "
+                                                "VALUES (?, ?, ?, ?, ?)", (video_id, kind, start, end, text))
+                    self._conn.execute("INSERT INTO docs_fts(rowid, tokens) VALUES (?, ?)",
+                                       (cursor.lastrowid, " ".join(search_tokens(text, run_end=True))))
+                self._conn.execute("INSERT OR REPLACE INTO videos(video_id, source, indexed) VALUES (?, ?, ?)",
+                                   (video_id, source, time.time()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def index_result(self, video_id: str, result: dict, source: str = None) -> int:
+        """索引一个处理结果：字幕段和主题大纲/详细笔记."""
+        transcript = result.get("transcript") or []
+        if hasattr(transcript, "starts"):
+            segments = zip(transcript.starts, transcript.ends, transcript.texts())
+        else:
+            segments = ((seg["start"], seg["end"], seg["text"]) for seg in transcript)
+        notes = [(kind, result.get(kind)) for kind in ("brief_summary", "detailed_summary") if result.get(kind)]
+        return self.index_video(video_id, segments, notes, source)
+
+    def _delete(self, video_id: str):
+        self._conn.execute("DELETE FROM docs_fts WHERE rowid IN (SELECT id FROM docs WHERE video_id = ?)",
+                           (video_id,))
+        self._conn.execute("DELETE FROM docs WHERE video_id = ?", (video_id,))
+        self._conn.execute("DELETE FROM videos WHERE video_id = ?", (video_id,))
+
+    def remove(self, video_id: str):
+        with self._lock:
+            self._delete(video_id)
+
+    def search(self, query: str, limit: int = SEARCH_MAX_RESULTS, offset: int = 0,
+               video_id: str = None, kind: str = None) -> List[dict]:
+        match = build_match_query(query)
+        if match is None:
+            return []
+        if video_id is None and kind is None:
+            # 无过滤条件：在FTS内按rank取top-k，只回表取这一页
+            sql = ("SELECT d.video_id, d.kind, d.start, d.end, d.text, -r.rank FROM "
+                   "(SELECT rowid, rank FROM docs_fts WHERE docs_fts MATCH ? ORDER BY rank LIMIT ? OFFSET ?) r "
+                   "JOIN docs d ON d.id = r.rowid ORDER BY r.rank")
+            args = [match, limit, offset]
+        else:
+            # rank(bm25)越小越相关，返回时取负数使score越大越相关
+            sql = ("SELECT d.video_id, d.kind, d.start, d.end, d.text, -docs_fts.rank AS score "
+                   "FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid WHERE docs_fts MATCH ?")
+            args = [match]
+            if video_id:
+                sql += " AND d.video_id = ?"
+                args.append(video_id)
+            if kind:
+                sql += " AND d.kind = ?"
+                args.append(kind)
+            sql += " ORDER BY docs_fts.rank LIMIT ? OFFSET ?"
+            args.extend([limit, offset])
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        keys = ("video_id", "kind", "start", "end", "text", "score")
+        return [dict(zip(keys, row)) for row in rows]
+
+
+search_index = SearchIndex()
@@ -0,0 +1,80 @@
+# backend/app/sqlite_store.py
+import sqlite3
+from typing import List
+
+"""
+各存储共用的SQLite工具：
+connect   : WAL模式的共享连接，多个线程(调用方加锁)和多个uvicorn worker进程共用同一个库
+SizedTable: 带TTL和总大小上限的缓存表(llm_cache/results)，总大小由触发器记在table_sizes中，
+            其它worker的写入同样计入，写入时只读一行而不必每次SUM(size)
+"""
+
+# 其它worker持有写锁时最多等待的秒数
+BUSY_TIMEOUT = 30
+# 淘汰时每次取出的行数
+EVICT_BATCH = 64
+
+
+def connect(db_path: str, schema: str = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # INSERT OR REPLACE替换旧行时触发DELETE触发器，table_sizes才能减去旧行的大小
+    conn.execute("PRAGMA recursive_triggers=ON")
+    if schema:
+        conn.executescript(schema)
+    return conn
+
+
+class SizedTable:
+    """表需要有键列以及size、created、accessed列(accessed上有索引)."""
+
+    def __init__(self, conn: sqlite3.Connection, table: str, key_column: str, ttl: float, max_bytes: int):
+        self._conn = conn
+        self.table = table
+        self.key_column = key_column
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # 在同一个写事务中统计现有大小并建触发器，其它worker的写入不会漏记
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS table_sizes (name TEXT PRIMARY KEY, total INTEGER NOT NULL)")
+            conn.execute(f"INSERT OR IGNORE INTO table_sizes(name, total) "
+                         f"SELECT ?, COALESCE(SUM(size), 0) FROM {table}", (table,))
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_size_insert AFTER INSERT ON {table} BEGIN "
+                         f"UPDATE table_sizes SET total = total + NEW.size WHERE name = '{table}'; END")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_size_delete AFTER DELETE ON {table} BEGIN "
+                         f"UPDATE table_sizes SET total = total - OLD.size WHERE name = '{table}'; END")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_size_update AFTER UPDATE OF size ON {table} BEGIN "
+                         f"UPDATE table_sizes SET total = total - OLD.size + NEW.size WHERE name = '{table}'; END")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def total(self) -> int:
+        return self._conn.execute("SELECT total FROM table_sizes WHERE name = ?", (self.table,)).fetchone()[0]
+
+    def _delete(self, keys: List[str]):
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE {self.key_column} = ?", [(key,) for key in keys])
+
+    def evict(self, now: float) -> List[str]:
+        """删除超过TTL的条目，总大小仍超过上限时按最近访问时间从旧到新淘汰；返回被删除的键."""
+        removed = [row[0] for row in self._conn.execute(
+            f"SELECT {self.key_column} FROM {self.table} WHERE created < ?", (now - self.ttl,)).fetchall()]
+        self._delete(removed)
+        excess = self.total() - self.max_bytes
+        while excess > 0:
+            rows = self._conn.execute(f"SELECT {self.key_column}, size FROM {self.table} ORDER BY accessed LIMIT ?",
+                                      (EVICT_BATCH,)).fetchall()
+            if not rows:
+                break
+            batch = []
+            for key, size in rows:
+                batch.append(key)
+                excess -= size
+                if excess <= 0:
+                    break
+            self._delete(batch)
+            removed.extend(batch)
+        return removed
@@ -0,0 +1,97 @@
+# backend/app/summarizer.py
+import asyncio
+import re
+from typing import List, Tuple, AsyncGenerator
+
+from base_config import *
+from api_service import MARKDOWN_USER_PROMPT
+from llm_providers import agenerate_markdown_llm, astream_markdown_llm
+
+"""
+长字幕分层总结(map-reduce)：
+map   : 按字幕段边界切成不超过LLM_CHUNK_TOKENS的块，并发总结(受每个服务商的并发上限约束)
+reduce: 部分总结合并后仍超预算则继续分组合并，直到一次调用可以生成最终markdown
+总耗时随树的深度增长，而不是随字幕长度线性增长。
+"""
+
+MAP_PROMPT = "下面是一段较长视频字幕中的一部分。请提炼这一部分的主要内容和关键细节，用markdown要点输出，请直接输出纯净的markdown格式内容，不要包含任何代码块标记（如```markdown或```）：{content}"
+REDUCE_PROMPT = "下面是同一个视频按时间顺序分段整理出的要点。请将它们合并去重，汇总整理成一份结构清晰、完整的markdown笔记，请直接输出纯净的markdown格式内容，不要包含任何代码块标记（如```markdown或```）：{content}"
+
+_CJK = re.compile(r'[\u3000-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符按1个token，其余按4个字符1个token."""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def transcript_units(content) -> List[str]:
+    """切分的最小单位：字幕段列表原样使用；SRT按空行分块；纯文本按行."""
+    if isinstance(content, (list, tuple)):
+        return [str(unit) for unit in content]
+    content = str(content)
+    if "\n\n" in content:
+        return [block for block in re.split(r'\n\s*\n', content) if block.strip()]
+    return [line for line in content.splitlines() if line.strip()]
+
+
+def chunk_units(units: List[str], budget: int) -> List[str]:
+    """在单位边界处贪心打包，每块不超过budget；单个超长单位按字符硬切."""
+    chunks, current, current_tokens = [], [], 0
+    for unit in units:
+        tokens = estimate_tokens(unit)
+        if tokens > budget:
+            step = max(1, len(unit) * budget // tokens)
+            pieces = [unit[i:i + step] for i in range(0, len(unit), step)]
+        else:
+            pieces = [unit]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > budget:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+async def _complete(model_type: str, content: str, prompt: str) -> str:
+    # 服务商并发上限和连接复用由llm_providers统一管理
+    return await agenerate_markdown_llm(model_type, content, prompt)
+
+
+async def _prepare_final(content, model_type: str, budget: int) -> Tuple[str, str]:
+    """完成map和中间层reduce，返回最后一次调用的(输入, prompt)；短字幕直接返回原文."""
+    units = transcript_units(content)
+    text = content if isinstance(content, str) else "\n".join(units)
+    if estimate_tokens(text) <= budget:
+        return text, MARKDOWN_USER_PROMPT
+
+    chunks = chunk_units(units, budget)
+    print(f"分层总结: {len(chunks)} 块 (预算 {budget} tokens)")
+    partials = await asyncio.gather(*[_complete(model_type, chunk, MAP_PROMPT) for chunk in chunks])
+    depth = 1
+    while estimate_tokens("\n\n".join(partials)) > budget and len(partials) > 1:
+        groups = chunk_units(partials, budget)
+        if len(groups) >= len(partials):
+            # 每个部分总结都已接近预算，两两合并保证树能收敛
+            groups = ["\n\n".join(partials[i:i + 2]) for i in range(0, len(partials), 2)]
+        partials = await asyncio.gather(*[_complete(model_type, group, REDUCE_PROMPT) for group in groups])
+        depth += 1
+    print(f"分层总结: 合并深度 {depth + 1}")
+    return "\n\n".join(partials), REDUCE_PROMPT
+
+
+async def summarize_transcript(content, model_type: str, budget: int = LLM_CHUNK_TOKENS) -> str:
+    text, prompt = await _prepare_final(content, model_type, budget)
+    return await _complete(model_type, text, prompt)
+
+
+async def stream_summary(content, model_type: str, budget: int = LLM_CHUNK_TOKENS) -> AsyncGenerator[str, None]:
+    """流式版本：map/中间层reduce完成后，最后一次调用逐token产出."""
+    text, prompt = await _prepare_final(content, model_type, budget)
+    async for delta in astream_markdown_llm(model_type, text, prompt):
+        yield delta
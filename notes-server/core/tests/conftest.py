@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# 模块都以core为根目录平铺导入；各存储的SQLite库和产物写到临时目录，不碰真实的uploads
+CORE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CORE_DIR)
+os.environ.setdefault("NOTES_UPLOAD_DIR", tempfile.mkdtemp(prefix="notes-test-uploads-"))
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from artifacts import ArtifactStore, job_key, normalize_source
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://www.Example.com/watch?v=1#t=30", "https://example.com/watch?v=1"),
+    ("HTTPS://example.com/video/", "https://example.com/video"),
+    ("https://example.com/v?b=2&a=1", "https://example.com/v?a=1&b=2"),
+    ("https://example.com/v?utm_source=x&utm_medium=y&v=1", "https://example.com/v?v=1"),
+    ("https://example.com/v?spm=a.b&from=search&share_source=copy&si=abc&p=2", "https://example.com/v?p=2"),
+    # 只是前缀相同的参数会区分视频，不能去掉
+    ("https://example.com/v?sig=1&size=720&fromage=1", "https://example.com/v?fromage=1&sig=1&size=720"),
+    ("  https://example.com/v?t=  ", "https://example.com/v?t="),
+])
+def test_normalize_source(url, expected):
+    assert normalize_source(url) == expected
+
+
+def test_job_key():
+    assert job_key("https://www.example.com/v?utm_source=x", True, "fasterwhisper_tiny") == \
+        "https://example.com/v|fasterwhisper_tiny"
+    assert job_key("/tmp/uploads/abc.mp4", False) == "file:abc.mp4|"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    return ArtifactStore(str(tmp_path / "artifacts.db"))
+
+
+def make_file(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"data")
+    return str(path)
+
+
+def test_claim_source_first_writer_wins(store):
+    assert store.claim_source("sha256:aa", "first") == "first"
+    assert store.claim_source("sha256:aa", "second") == "first"
+    assert store.lookup_source("sha256:aa") == "first"
+    assert store.claim_source("sha256:bb", "second") == "second"
+    assert sorted(store.sources_for("first")) == ["sha256:aa"]
+
+
+def test_release_counts_down_then_purges(store, tmp_path):
+    video = make_file(tmp_path, "v1.mp4")
+    transcript = make_file(tmp_path, "v1.abc.srt")
+    store.put("v1", "video", video)
+    store.put("v1", "transcript", transcript, {"model": "tiny"})
+    store.register_source("sha256:aa", "v1")
+
+    assert store.acquire("v1") == 1
+    assert store.acquire("v1") == 2
+    assert store.release("v1") == 1
+    assert os.path.exists(video)
+
+    assert store.release("v1") == 0
+    assert not os.path.exists(video) and not os.path.exists(transcript)
+    assert store.get("v1", "video") is None
+    assert store.lookup_source("sha256:aa") is None
+    # 已释放完的id再次释放不会删除任何东西
+    assert store.release("v1") is None
+
+
+def test_release_without_refs_never_purges(store, tmp_path):
+    # URL下载的视频没有引用计数，不能被DELETE /upload/file删除
+    video = make_file(tmp_path, "url-video.mp4")
+    store.put("url-video", "video", video)
+    assert store.release("url-video") is None
+    assert store.get("url-video", "video") == video
+
+
+def test_get_drops_entries_whose_file_is_gone(store, tmp_path):
+    video = make_file(tmp_path, "v1.mp4")
+    store.put("v1", "video", video)
+    os.remove(video)
+    assert store.get("v1", "video") is None
+    assert store._execute("SELECT COUNT(*) FROM artifacts")[0][0] == 0
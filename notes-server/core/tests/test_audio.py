@@ -0,0 +1,40 @@
+import struct
+import sys
+
+import numpy as np
+import pytest
+
+import audio
+from audio import WAV_HEADER_SIZE, decode_audio, decode_wav_bytes
+
+PCM = struct.pack("<4h", 0, 16384, -32768, 32767)
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    # 代替ffmpeg：把固定的PCM写到stdout，failing时以非0退出
+    def command(media_path, start=None, duration=None):
+        if media_path == "broken.mp4":
+            return [sys.executable, "-c", "import sys; sys.stderr.write('invalid data'); sys.exit(1)"]
+        return [sys.executable, "-c", f"import sys; sys.stdout.buffer.write({PCM!r} * 3)"]
+    monkeypatch.setattr(audio, "ffmpeg_pcm_command", command)
+
+
+def test_decode_audio_to_float32(fake_ffmpeg):
+    samples = decode_audio("a.mp4")
+    assert samples.dtype == np.float32
+    assert samples[:4].tolist() == [0.0, 0.5, -1.0, 32767 / 32768]
+    assert len(samples) == 12
+
+
+def test_decode_wav_bytes_has_header(fake_ffmpeg):
+    wav = decode_wav_bytes("a.mp4")
+    riff, size, wave = struct.unpack("<4sI4s", wav[:12])
+    assert (riff, wave, size) == (b"RIFF", b"WAVE", len(wav) - 8)
+    assert struct.unpack("<I", wav[40:44])[0] == len(PCM) * 3
+    assert bytes(wav[WAV_HEADER_SIZE:]) == PCM * 3
+
+
+def test_decode_failure_raises(fake_ffmpeg):
+    with pytest.raises(IOError, match="invalid data"):
+        decode_audio("broken.mp4")
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+import batch as batch_module
+import executor
+from batch import BatchRegistry, expand_sources
+from result_store import ResultStore
+
+
+@pytest.fixture(autouse=True)
+def fresh_executors():
+    executor.shutdown_executors()
+    yield
+    executor.shutdown_executors()
+
+
+@pytest.fixture(autouse=True)
+def playlists(monkeypatch):
+    lists = {
+        "https://example.com/list": [("https://example.com/v/1", "一"), ("https://example.com/v/2", "二")],
+        "https://example.com/v/1": [("https://example.com/v/1?utm_source=x", "一")],
+    }
+
+    def entries(url):
+        if url not in lists:
+            raise OSError("playlist unavailable")
+        return lists[url]
+
+    monkeypatch.setattr(batch_module, "ytdlp_playlist_entries", entries)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ResultStore(str(tmp_path / "results.db"))
+    monkeypatch.setattr(batch_module, "result_store", store)
+    return store
+
+
+class FakeJobs:
+    """代替job_registry：每个来源等待gate后依次产出阶段消息."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.gate = asyncio.Event()
+        self.started = []
+
+    async def subscribe(self, source, is_url, subtitle_model=None):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        self.started.append(source)
+        try:
+            yield {"stage": "download", "message": "开始下载", "status": "processing"}
+            yield {"stage": "transcription", "message": "1条字幕", "status": "partial"}
+            await self.gate.wait()
+            yield {"stage": "complete", "message": "完成", "status": "complete", "data": {"video_id": source[-1]}}
+        finally:
+            self.running -= 1
+
+
+def run_batch(monkeypatch, urls, file_ids=(), concurrency=4, control=None):
+    jobs = FakeJobs()
+    monkeypatch.setattr(batch_module, "job_registry", jobs)
+    monkeypatch.setattr(batch_module, "BATCH_CONCURRENCY", concurrency)
+
+    async def main():
+        registry = BatchRegistry()
+        batch = registry.start(list(urls), list(file_ids))
+        updates = []
+
+        async def consume():
+            async for update in registry.subscribe(batch.batch_id):
+                updates.append(update)
+
+        consumer = asyncio.ensure_future(consume())
+        if control is None:
+            jobs.gate.set()
+        else:
+            await control(registry, batch, jobs)
+        await asyncio.wait_for(consumer, 5)
+        return batch, updates, jobs
+
+    return asyncio.run(main())
+
+
+def test_expand_sources_dedups_and_keeps_failures():
+    items = asyncio.run(expand_sources(
+        ["https://example.com/list", "https://example.com/v/1", "https://example.com/broken"], ["file-a", "file-a"]))
+
+    assert [(item["source"], item["status"]) for item in items] == [
+        ("https://example.com/v/1", "pending"), ("https://example.com/v/2", "pending"),
+        ("https://example.com/broken", "error"), ("file-a", "pending")]
+    assert items[0]["title"] == "一"
+    assert "playlist unavailable" in items[2]["error"]
+    assert [item["index"] for item in items] == [0, 1, 2, 3]
+
+
+def test_expand_sources_respects_max_items(monkeypatch):
+    monkeypatch.setattr(batch_module, "BATCH_MAX_ITEMS", 1)
+    assert len(asyncio.run(expand_sources(["https://example.com/list"], ["file-a"]))) == 1
+
+
+def test_batch_completes_and_skips_cached_sources(monkeypatch, store):
+    store.put("old", {}, "https://example.com/v/2", batch_module.job_key("https://example.com/v/2", True))
+
+    batch, updates, jobs = run_batch(monkeypatch, ["https://example.com/list"])
+
+    assert batch.status == "complete"
+    assert jobs.started == ["https://example.com/v/1"]
+    assert [(item["status"], item["video_id"]) for item in batch.items] == [("complete", "1"), ("cached", "old")]
+    assert updates[-1]["status"] == "complete"
+    # 逐条字幕的增量消息不转发给批量订阅者
+    assert all(update["status"] != "partial" for update in updates)
+
+
+def test_concurrency_limit(monkeypatch, store):
+    async def control(registry, batch, jobs):
+        while len(jobs.started) < 2:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        assert jobs.running == 2
+        jobs.gate.set()
+
+    file_ids = [f"file-{n}" for n in range(5)]
+    batch, _, jobs = run_batch(monkeypatch, [], file_ids, concurrency=2, control=control)
+    assert jobs.peak == 2
+    assert batch.counts() == {"complete": 5}
+
+
+def test_cancel_marks_unfinished_items(monkeypatch, store):
+    async def control(registry, batch, jobs):
+        while not jobs.started:
+            await asyncio.sleep(0.01)
+        assert registry.cancel(batch.batch_id)
+
+    batch, updates, jobs = run_batch(monkeypatch, [], ["file-a", "file-b"], concurrency=1, control=control)
+    assert batch.status == "cancelled"
+    assert batch.counts() == {"cancelled": 2}
+    assert jobs.running == 0
+    assert updates[-1]["data"]["status"] == "cancelled"
+
+
+def test_unexpected_error_ends_batch_with_error(monkeypatch, store):
+    def broken(job_key):
+        raise OSError("database is locked")
+
+    monkeypatch.setattr(store, "latest_for_job", broken)
+    batch, updates, _ = run_batch(monkeypatch, [], ["file-a"])
+
+    assert batch.status == "error" and batch.finished is not None
+    assert batch.items[0]["status"] == "error"
+    assert updates[-1]["status"] == "error"
+    assert "database is locked" in updates[-1]["data"]["items"][0]["error"]
+
+    # 结束后订阅直接拿到同样的终止状态
+    async def late():
+        registry = BatchRegistry()
+        registry._batches[batch.batch_id] = batch
+        return [update async for update in registry.subscribe(batch.batch_id)]
+    assert asyncio.run(late())[0]["status"] == "error"
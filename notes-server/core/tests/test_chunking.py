@@ -0,0 +1,32 @@
+from chunking import merge_chunk_segments
+
+
+def test_chunks_concatenate_in_order():
+    assert merge_chunk_segments([[(0, 1, "a"), (1, 2, "b")], [(3, 4, "c")]]) == [
+        (0, 1, "a"), (1, 2, "b"), (3, 4, "c")]
+
+
+def test_duplicate_boundary_segment_is_merged():
+    # 两个块在边界处都转写出了同一句，保留较完整的文本并合并时间
+    merged = merge_chunk_segments([[(0, 5, "第一句"), (5, 10, "边界上的句")],
+                                   [(9, 12, "边界上的句子"), (12, 15, "下一句")]])
+    assert merged == [(0, 5, "第一句"), (5, 12, "边界上的句子"), (12, 15, "下一句")]
+
+
+def test_duplicate_ignores_punctuation():
+    merged = merge_chunk_segments([[(0, 5, "同一句话")], [(4, 6, "同一句话。")]])
+    assert merged == [(0, 6, "同一句话")]
+
+
+def test_overlapping_different_text_is_shifted():
+    merged = merge_chunk_segments([[(0, 5, "前一句")], [(4, 8, "完全不同")]])
+    assert merged == [(0, 5, "前一句"), (5, 8, "完全不同")]
+
+
+def test_segment_swallowed_by_overlap_keeps_positive_duration():
+    merged = merge_chunk_segments([[(0, 5, "前一句")], [(1, 3, "另一句")]])
+    assert merged[1][0] == 5 and merged[1][1] > merged[1][0]
+
+
+def test_empty_text_and_chunks_are_skipped():
+    assert merge_chunk_segments([[], [(0, 1, "")], [(1, 2, "a")]]) == [(1, 2, "a")]
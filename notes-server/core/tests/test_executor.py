@@ -0,0 +1,66 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+import executor
+from base_config import IO_WORKERS
+from executor import iterate_inference, run_cpu, run_io, stage_limit
+
+
+@pytest.fixture(autouse=True)
+def fresh_executors():
+    # 每个测试使用新的事件循环，信号量和线程池也重新创建
+    executor.shutdown_executors()
+    yield
+    executor.shutdown_executors()
+
+
+def test_run_io_uses_thread_pool():
+    name = asyncio.run(run_io(lambda: threading.current_thread().name))
+    assert name.startswith("notes-io")
+
+
+def test_run_cpu_uses_other_process():
+    assert asyncio.run(run_cpu(os.getpid)) != os.getpid()
+
+
+def test_stage_limit_bounds_concurrency_across_tasks():
+    running, peak = [0], [0]
+
+    async def job():
+        async with stage_limit("transcribe", 2):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+
+    async def main():
+        assert stage_limit("transcribe", 2) is stage_limit("transcribe", 2)
+        await asyncio.gather(*[job() for _ in range(6)])
+
+    asyncio.run(main())
+    assert peak[0] == 2
+
+
+def test_long_running_producer_does_not_take_io_slots():
+    release = threading.Event()
+
+    def produce():
+        yield threading.current_thread().name
+        # 模拟长时间推理：生产线程阻塞期间短IO任务仍然可以执行
+        release.wait(5)
+        yield "end"
+
+    async def main():
+        items = []
+        async for batch in iterate_inference(produce):
+            if not items:
+                await asyncio.wait_for(asyncio.gather(*[run_io(lambda: None) for _ in range(IO_WORKERS * 2)]), 2)
+                release.set()
+            items.extend(batch)
+        return items
+
+    items = asyncio.run(main())
+    assert items[0].startswith("notes-inference") and items[-1] == "end"
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+import jobs as jobs_module
+from jobs import Job, JobRegistry
+
+
+def status(stage, status, data=None, message=""):
+    update = {"stage": stage, "message": message, "status": status}
+    if data is not None:
+        update["data"] = data
+    return update
+
+
+class FakePipeline:
+    """代替process_video_stream_dict_updates：先产出前半段消息，gate打开后产出其余消息."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = asyncio.Event()
+        self.cancelled = False
+
+    async def __call__(self, source, is_url, subtitle_model=None):
+        self.calls.append(source)
+        try:
+            yield status("download", "processing", message="开始下载")
+            yield status("download", "success", message="下载成功")
+            yield status("transcription", "processing")
+            yield status("transcription", "partial", {"offset": 0, "segments": [{"text": "a"}]})
+            yield status("transcription", "partial", {"offset": 1, "segments": [{"text": "b"}, {"text": "c"}]})
+            yield status("transcription", "success")
+            for token in ("# 标", "题", "\n内容"):
+                yield status("summary_brief", "delta", {"delta": token})
+            await self.gate.wait()
+            yield status("complete", "complete", {"video_id": "v1"})
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    pipeline = FakePipeline()
+    monkeypatch.setattr(jobs_module, "process_video_stream_dict_updates", pipeline)
+    return pipeline
+
+
+async def take_until(stream, predicate):
+    updates = []
+    async for update in stream:
+        updates.append(update)
+        if predicate(update):
+            return updates
+    return updates
+
+
+def test_same_source_runs_once_and_late_subscriber_gets_coalesced_state(pipeline):
+    async def main():
+        registry = JobRegistry()
+        first = registry.subscribe("https://example.com/v?utm_source=a", True)
+        first_updates = await take_until(first, lambda u: u["status"] == "delta" and u["data"]["delta"] == "\n内容")
+
+        late = registry.subscribe("https://example.com/v", True)
+        replayed = await take_until(late, lambda u: u["status"] == "delta")
+        pipeline.gate.set()
+        first_updates += [update async for update in first]
+        replayed += [update async for update in late]
+        return registry, first_updates, replayed
+
+    registry, first_updates, replayed = asyncio.run(main())
+
+    assert pipeline.calls == ["https://example.com/v?utm_source=a"]
+    assert first_updates[-1]["status"] == replayed[-1]["status"] == "complete"
+    # 每个阶段只回放最新状态，增量消息各合并为一条
+    assert [(u["stage"], u["status"]) for u in replayed] == [
+        ("download", "success"), ("transcription", "success"), ("transcription", "partial"),
+        ("summary_brief", "delta"), ("complete", "complete")]
+    assert replayed[2]["data"] == {"offset": 0, "segments": [{"text": "a"}, {"text": "b"}, {"text": "c"}]}
+    assert replayed[3]["data"] == {"delta": "# 标题\n内容"}
+    assert registry._jobs == {}
+
+
+def test_finished_job_is_removed_and_next_request_runs_again(pipeline):
+    pipeline.gate.set()
+
+    async def main():
+        registry = JobRegistry()
+        for _ in range(2):
+            updates = [update async for update in registry.subscribe("file-a", False)]
+            assert updates[-1]["status"] == "complete"
+        return registry
+
+    registry = asyncio.run(main())
+    assert pipeline.calls == ["file-a", "file-a"]
+    assert registry._jobs == {}
+
+
+def test_cancelled_when_last_subscriber_leaves(pipeline):
+    async def main():
+        registry = JobRegistry()
+        first = registry.subscribe("file-a", False)
+        second = registry.subscribe("file-a", False)
+        await take_until(first, lambda u: u["status"] == "delta")
+        await take_until(second, lambda u: u["status"] == "delta")
+
+        await first.aclose()
+        await asyncio.sleep(0.01)
+        assert not pipeline.cancelled
+
+        await second.aclose()
+        await asyncio.sleep(0.01)
+        return registry
+
+    registry = asyncio.run(main())
+    assert pipeline.cancelled
+    assert registry._jobs == {}
+
+
+def test_delta_history_is_compacted():
+    job = Job("k")
+    for _ in range(1000):
+        job.publish(status("summary_brief", "delta", {"delta": "x"}))
+    assert len(job.stages["summary_brief"][2]) < 256
+    assert job.replay()[0]["data"]["delta"] == "x" * 1000
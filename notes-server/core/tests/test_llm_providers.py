@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+import types
+
+import pytest
+
+import llm_providers
+from api_service import clean_markdown
+from llm_providers import LLMProvider, clean_markdown_stream
+
+
+async def deltas_of(parts):
+    for part in parts:
+        yield part
+
+
+def stream(parts):
+    async def run():
+        return [delta async for delta in clean_markdown_stream(deltas_of(parts))]
+    return asyncio.run(run())
+
+
+TEXTS = [
+    "```markdown\n# 标题\n内容\n```",
+    "# 无标记\n`行内代码` 和 ``两个反引号``",
+    "前文```markdown中间```后文``",
+    "```",
+    "",
+]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_every_two_way_split_matches_clean_markdown(text):
+    for cut in range(len(text) + 1):
+        assert "".join(stream([text[:cut], text[cut:]])) == clean_markdown(text)
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_character_by_character(text):
+    assert "".join(stream(list(text))) == clean_markdown(text)
+
+
+def test_fence_never_reaches_client():
+    deltas = stream(["``", "`mark", "down\n# 标题", "\n``", "`"])
+    assert all("`" not in delta for delta in deltas)
+    assert "".join(deltas) == "\n# 标题\n"
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.active = self.peak = 0
+
+    async def create(self, model, messages, stream=False):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        message = types.SimpleNamespace(content="```markdown\n# 笔记\n```")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = LLMProvider("fake", "key", "http://127.0.0.1:9/v1", max_concurrency=2)
+    monkeypatch.setattr(llm_providers.provider_registry, "get", lambda model_type: provider)
+    return provider
+
+
+def test_requests_capped_per_provider(provider):
+    completions = FakeCompletions()
+
+    async def run():
+        provider._bind_loop()
+        provider._client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+        return await asyncio.gather(*(llm_providers.agenerate_markdown_llm("fake-model", f"字幕{n}", use_cache=False)
+                                      for n in range(6)))
+
+    assert asyncio.run(run()) == ["\n# 笔记\n"] * 6
+    assert completions.peak == 2
+
+
+def test_client_reused_within_loop_and_closed_when_loop_changes(provider):
+    # 旧客户端所在的事件循环在另一个线程中继续运行
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        async def clients():
+            return provider.client, provider.client
+
+        first, again = asyncio.run_coroutine_threadsafe(clients(), loop).result()
+        assert first is again
+
+        async def rebind():
+            return provider.client
+
+        second = asyncio.run(rebind())
+        assert second is not first
+        time.sleep(0.1)
+        assert first.is_closed() and not second.is_closed()
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
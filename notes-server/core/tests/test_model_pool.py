@@ -0,0 +1,91 @@
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from model_pool import WhisperModelPool, estimate_model_mb
+
+
+class FakeWhisperModel:
+    loads = []
+
+    def __init__(self, model_name, device, compute_type=None, **kwargs):
+        time.sleep(0.05)
+        self.name = model_name
+        FakeWhisperModel.loads.append(model_name)
+
+
+@pytest.fixture(autouse=True)
+def fake_faster_whisper(monkeypatch):
+    FakeWhisperModel.loads = []
+    monkeypatch.setitem(sys.modules, "faster_whisper", types.SimpleNamespace(WhisperModel=FakeWhisperModel))
+
+
+def loaded(pool):
+    return [key[0] for key in pool._entries]
+
+
+def test_estimate_model_mb():
+    assert estimate_model_mb("tiny.en", "int8") == 39
+    assert estimate_model_mb("small", "float16") == 488
+    assert estimate_model_mb("unknown", "float32") == 1550 * 4
+
+
+def test_model_is_reused_across_leases():
+    pool = WhisperModelPool(budget_mb=1000)
+    with pool.lease("tiny", "int8", "cpu") as first:
+        pass
+    with pool.lease("tiny", "int8", "cpu") as second:
+        assert second is first
+    assert FakeWhisperModel.loads == ["tiny"]
+
+
+def test_concurrent_leases_share_one_load():
+    pool = WhisperModelPool(budget_mb=1000)
+    models = []
+
+    def use():
+        with pool.lease("base", "int8", "cpu") as model:
+            models.append(model)
+
+    threads = [threading.Thread(target=use) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert FakeWhisperModel.loads == ["base"]
+    assert len({id(model) for model in models}) == 1
+
+
+def test_idle_model_evicted_before_loading_another():
+    pool = WhisperModelPool(budget_mb=300)
+    with pool.lease("small", "int8", "cpu"):
+        pass
+    # small(244)和base(74)放不下时，加载base前先淘汰空闲的small
+    with pool.lease("base", "int8", "cpu"):
+        assert loaded(pool) == ["base"]
+    with pool.lease("tiny", "int8", "cpu"):
+        pass
+    assert loaded(pool) == ["base", "tiny"]
+
+
+def test_leased_model_is_evicted_after_release():
+    pool = WhisperModelPool(budget_mb=300)
+    with pool.lease("small", "int8", "cpu"):
+        with pool.lease("base", "int8", "cpu"):
+            # small正在使用，暂时超出预算
+            assert loaded(pool) == ["small", "base"]
+        assert loaded(pool) == ["small", "base"]
+    # small用完后淘汰空闲的base，保留刚用完的small
+    assert loaded(pool) == ["small"]
+
+
+def test_single_model_over_budget_stays_loaded():
+    pool = WhisperModelPool(budget_mb=100)
+    for _ in range(2):
+        with pool.lease("small", "int8", "cpu"):
+            pass
+    assert FakeWhisperModel.loads == ["small"]
+    assert loaded(pool) == ["small"]
@@ -0,0 +1,39 @@
+import gzip
+
+from page_cache import PageCache, page_response
+
+
+def make_page(tmp_path):
+    source = tmp_path / "note.md"
+    source.write_text("# 标题")
+    return PageCache().get("note", [str(source)], lambda: "<h1>标题</h1>" * 50)
+
+
+def test_each_coding_has_its_own_etag(tmp_path):
+    page = make_page(tmp_path)
+    identity = page_response(page, {})
+    gzipped = page_response(page, {"accept-encoding": "gzip"})
+
+    assert "content-encoding" not in identity.headers
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(gzipped.body) == identity.body
+    assert identity.headers["etag"] != gzipped.headers["etag"]
+    assert gzipped.headers["etag"] == identity.headers["etag"][:-1] + '-gz"'
+    assert gzipped.headers["vary"] == "Accept-Encoding"
+
+
+def test_any_variant_etag_revalidates(tmp_path):
+    page = make_page(tmp_path)
+    identity_etag = page_response(page, {}).headers["etag"]
+    gzip_etag = page_response(page, {"accept-encoding": "gzip"}).headers["etag"]
+
+    # 客户端切换了Accept-Encoding，持有的另一编码ETag仍然有效
+    response = page_response(page, {"accept-encoding": "gzip", "if-none-match": identity_etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == gzip_etag
+    assert "content-encoding" not in response.headers
+
+    assert page_response(page, {"if-none-match": "W/" + gzip_etag}).status_code == 304
+    assert page_response(page, {"if-none-match": '"other", ' + gzip_etag}).status_code == 304
+    assert page_response(page, {"if-none-match": "*"}).status_code == 304
+    assert page_response(page, {"if-none-match": '"other"'}).status_code == 200
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from pipeline import StageFailed, StageGraph
+
+
+def make_status(stage, message, status="processing", data=None):
+    return {"stage": stage, "message": message, "status": status, "data": data}
+
+
+def collect(graph, ctx=None):
+    async def run():
+        return [update async for update in graph.run(ctx if ctx is not None else {})]
+    return asyncio.run(run())
+
+
+def test_dependencies_and_results_in_ctx():
+    graph = StageGraph(make_status)
+
+    async def download(ctx, emit):
+        return "file"
+
+    async def transcribe(ctx, emit):
+        emit("进度", "partial", {"n": 1})
+        return ctx["download"] + ".srt"
+
+    graph.add("download", download, messages=("开始下载", "下载成功", "下载失败: {error}"))
+    graph.add("transcription", transcribe, deps=["download"],
+              success_data=lambda result: {"path": result})
+    ctx = {}
+    updates = collect(graph, ctx)
+
+    assert ctx == {"download": "file", "transcription": "file.srt"}
+    assert [(u["stage"], u["status"]) for u in updates] == [
+        ("download", "processing"), ("download", "success"),
+        ("transcription", "processing"), ("transcription", "partial"), ("transcription", "success")]
+    assert updates[1]["message"].startswith("下载成功 (耗时")
+    assert updates[-1]["data"]["path"] == "file.srt"
+    assert graph.timings()["transcription"]["status"] == "success"
+
+
+def test_independent_stages_run_concurrently():
+    graph = StageGraph(make_status)
+    running = []
+
+    async def root(ctx, emit):
+        return None
+
+    def branch(name):
+        async def func(ctx, emit):
+            running.append(name)
+            # 两个分支都开始后才能结束；串行执行会一直等待下去
+            while len(running) < 2:
+                await asyncio.sleep(0.01)
+            return name
+        return func
+
+    graph.add("transcription", root)
+    graph.add("brief", branch("brief"), deps=["transcription"])
+    graph.add("detailed", branch("detailed"), deps=["transcription"])
+
+    ctx = {}
+
+    async def run():
+        async for _ in graph.run(ctx):
+            pass
+
+    asyncio.run(asyncio.wait_for(run(), timeout=2))
+    assert ctx["brief"] == "brief" and ctx["detailed"] == "detailed"
+
+
+def test_failure_cancels_other_stages_and_raises():
+    graph = StageGraph(make_status)
+    cancelled = []
+
+    async def root(ctx, emit):
+        return None
+
+    async def slow(ctx, emit):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def broken(ctx, emit):
+        raise IOError("boom")
+
+    graph.add("root", root)
+    graph.add("slow", slow, deps=["root"])
+    graph.add("broken", broken, deps=["root"], messages=("开始", "成功", "失败: {error}"))
+    graph.add("after", root, deps=["broken"])
+
+    updates = []
+
+    async def run():
+        async for update in graph.run({}):
+            updates.append(update)
+
+    with pytest.raises(StageFailed) as excinfo:
+        asyncio.run(run())
+    assert excinfo.value.stage == "broken"
+    assert isinstance(excinfo.value.error, IOError)
+    assert {"stage": "broken", "message": "失败: boom", "status": "error"}.items() <= updates[-1].items()
+    assert cancelled == [True]
+    timings = graph.timings()
+    assert timings["slow"]["status"] == "cancelled"
+    assert timings["after"]["status"] == "pending"
+
+
+def test_unknown_dependency_is_rejected():
+    graph = StageGraph(make_status)
+    with pytest.raises(ValueError):
+        graph.add("transcription", None, deps=["download"])
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+import artifacts
+import executor
+import processing
+from artifacts import ArtifactStore
+from pipeline import StageGraph
+from result_store import ResultStore
+from search_index import SearchIndex
+
+
+@pytest.fixture(autouse=True)
+def fresh_executors():
+    executor.shutdown_executors()
+    yield
+    executor.shutdown_executors()
+
+
+def collect(generator):
+    async def run():
+        return [update async for update in generator]
+    return asyncio.run(run())
+
+
+def fake_pipeline(source, is_url, subtitle_model, payload):
+    async def download(ctx, emit):
+        return "vid"
+
+    async def summary(ctx, emit):
+        payload["brief_summary"] = "# 笔记"
+
+    graph = StageGraph(processing.create_status_dict)
+    graph.add("download", download)
+    graph.add("summary_brief", summary, deps=["download"])
+    return graph
+
+
+@pytest.fixture
+def prefetched(monkeypatch):
+    videos = []
+
+    async def prefetch_video(video_id):
+        videos.append(video_id)
+
+    monkeypatch.setattr(processing, "build_pipeline", fake_pipeline)
+    monkeypatch.setattr(processing, "prefetch_video", prefetch_video)
+    return videos
+
+
+def test_persistence_failure_still_completes(monkeypatch, prefetched):
+    def broken(*args):
+        raise OSError("database is locked")
+
+    indexed = []
+    monkeypatch.setattr(processing.result_store, "put", broken)
+    monkeypatch.setattr(processing.search_index, "index_result", lambda *args: indexed.append(args))
+
+    updates = collect(processing.process_video_stream_dict_updates("https://example.com/v", True))
+
+    assert updates[-1]["status"] == "complete"
+    assert updates[-1]["data"]["brief_summary"] == "# 笔记"
+    # 结果持久化失败后，后续的全文索引仍然执行
+    assert len(indexed) == 1
+
+
+@pytest.mark.parametrize("is_url, prefetch_setting, expected", [
+    (True, False, ["vid"]),   # 仅音频拉取：处理完成后后台下载视频
+    (True, True, []),         # 已在下载阶段开始预取
+    (False, False, []),       # 上传文件本身就是视频
+])
+def test_video_prefetched_after_audio_only_job(monkeypatch, prefetched, is_url, prefetch_setting, expected):
+    monkeypatch.setattr(processing, "PREFETCH_VIDEO", prefetch_setting)
+    monkeypatch.setattr(processing.result_store, "put", lambda *args: [])
+    monkeypatch.setattr(processing.search_index, "index_result", lambda *args: None)
+
+    async def run():
+        updates = [update async for update in processing.process_video_stream_dict_updates("src", is_url)]
+        await asyncio.sleep(0)
+        return updates
+
+    assert asyncio.run(run())[-1]["status"] == "complete"
+    assert prefetched == expected
+
+
+def test_reprocessing_replaces_previous_result(monkeypatch, prefetched, tmp_path):
+    results = ResultStore(str(tmp_path / "results.db"))
+    index = SearchIndex(str(tmp_path / "search.db"))
+    monkeypatch.setattr(processing, "result_store", results)
+    monkeypatch.setattr(processing, "search_index", index)
+
+    first = collect(processing.process_video_stream_dict_updates("https://example.com/v", True))
+    second = collect(processing.process_video_stream_dict_updates("https://example.com/v?utm_source=x", True))
+
+    old_id, new_id = first[-1]["data"]["video_id"], second[-1]["data"]["video_id"]
+    assert results.get(old_id) is None
+    assert results.get(new_id)["brief_summary"] == "# 笔记"
+    assert [hit["video_id"] for hit in index.search("笔记")] == [new_id]
+
+
+@pytest.fixture
+def stream_env(monkeypatch, tmp_path):
+    # 字幕写到tmp_path，产物登记在独立的库中；media文件只需存在
+    media = tmp_path / "v1.mp4"
+    media.write_bytes(b"media")
+    store = ArtifactStore(str(tmp_path / "artifacts.db"))
+    monkeypatch.setattr(artifacts, "UPLOAD_DIR", str(tmp_path) + os.sep)
+    monkeypatch.setattr(processing, "artifact_store", store)
+    monkeypatch.setattr(processing, "resolve_media_path", lambda video_id: str(media))
+    return store, tmp_path
+
+
+def srt_files(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if ".srt" in name)
+
+
+def test_transcribe_stream_emits_batches_before_decoding_finishes(monkeypatch, stream_env):
+    store, tmp_path = stream_env
+    resume = threading.Event()
+
+    def iter_segments(path, model_name):
+        yield 0.0, 1.5, "第一句"
+        # 第一批送到消费方之后才继续产出
+        assert resume.wait(5)
+        yield 1.5, 3.0, "第二句"
+        yield 3.0, 4.25, "第三句"
+
+    monkeypatch.setattr(processing, "iter_segments_by_fasterwhisper", iter_segments)
+
+    async def run():
+        batches = []
+        async for batch in processing.transcribe_audio_stream("v1", "tiny"):
+            batches.append(batch)
+            if len(batches) == 1:
+                # 流式过程中只有临时文件，正式字幕尚未出现
+                assert all(name.endswith(".tmp") for name in srt_files(tmp_path))
+                resume.set()
+        return batches
+
+    batches = asyncio.run(run())
+    assert batches[0] == [{"start": 0.0, "end": 1.5, "text": "第一句"}]
+    assert [seg["text"] for batch in batches for seg in batch] == ["第一句", "第二句", "第三句"]
+
+    params = processing.transcript_params("fasterwhisper", "tiny")
+    srt_path = store.get("v1", "transcript", params)
+    assert srt_files(tmp_path) == [os.path.basename(srt_path)]
+    with open(srt_path, encoding="utf-8") as f:
+        assert f.read() == ("1\n00:00:00,000 --> 00:00:01,500\n第一句\n\n"
+                            "2\n00:00:01,500 --> 00:00:03,000\n第二句\n\n"
+                            "3\n00:00:03,000 --> 00:00:04,250\n第三句\n\n")
+
+
+def test_transcribe_stream_closed_early_leaves_no_transcript(monkeypatch, stream_env):
+    store, tmp_path = stream_env
+    closed = threading.Event()
+
+    def iter_segments(path, model_name):
+        try:
+            n = 0
+            while True:
+                yield float(n), float(n + 1), f"第{n}句"
+                n += 1
+                time.sleep(0.01)
+        finally:
+            closed.set()
+
+    monkeypatch.setattr(processing, "iter_segments_by_fasterwhisper", iter_segments)
+
+    async def run():
+        stream = processing.transcribe_audio_stream("v1", "tiny")
+        async for _ in stream:
+            break
+        await stream.aclose()
+
+    asyncio.run(run())
+    # 生成器被关闭(释放模型lease)，临时文件被删除，也没有登记字幕产物
+    assert closed.is_set()
+    assert srt_files(tmp_path) == []
+    assert store.get("v1", "transcript", processing.transcript_params("fasterwhisper", "tiny")) is None
+
+
+def test_transcribe_stream_failure_leaves_no_transcript(monkeypatch, stream_env):
+    store, tmp_path = stream_env
+
+    def iter_segments(path, model_name):
+        yield 0.0, 1.0, "第一句"
+        raise RuntimeError("decode failed")
+
+    monkeypatch.setattr(processing, "iter_segments_by_fasterwhisper", iter_segments)
+
+    async def run():
+        return [batch async for batch in processing.transcribe_audio_stream("v1", "tiny")]
+
+    with pytest.raises(RuntimeError, match="decode failed"):
+        asyncio.run(run())
+    assert srt_files(tmp_path) == []
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+import processing
+import qa_index
+from artifacts import ArtifactStore
+from qa_index import BM25Index, QAIndexStore, time_chunks
+from transcript import Transcript
+
+
+def make_transcript(texts, step=10.0):
+    return Transcript.from_segments((i * step, i * step + step - 1, text) for i, text in enumerate(texts))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # 每个用例使用独立的产物库，避免video_id之间互相影响
+    monkeypatch.setattr(qa_index, "artifact_store", ArtifactStore(str(tmp_path / "artifacts.db")))
+    return QAIndexStore()
+
+
+def test_time_chunks_split_on_segment_boundaries():
+    transcript = make_transcript(["a", "b", "c", "d", "e"], step=25.0)
+    chunks = time_chunks(transcript, chunk_seconds=60)
+    assert [(chunk["start"], chunk["end"], chunk["text"]) for chunk in chunks] == [
+        (0.0, 74.0, "a b c"), (75.0, 124.0, "d e")]
+
+
+def test_time_chunks_empty():
+    assert time_chunks(Transcript.from_segments([])) == []
+
+
+def test_bm25_ranks_matching_chunk_first():
+    index = BM25Index.build([
+        {"start": 0, "end": 60, "text": "今天介绍注意力机制和向量检索"},
+        {"start": 60, "end": 120, "text": "下周三的会议改到午餐之后"},
+        {"start": 120, "end": 180, "text": "注意力机制的计算复杂度"},
+    ])
+    hits = index.search("会议改到什么时候", top_k=2)
+    assert hits[0]["start"] == 60
+    assert hits[0]["score"] > 0
+    assert index.search("注意力机制", top_k=1)[0]["start"] in (0, 120)
+    assert index.search("zzz") == []
+
+
+def test_bm25_round_trip():
+    index = BM25Index.build([{"start": 0, "end": 1, "text": "机器学习 hello"}])
+    loaded = BM25Index.from_dict(index.to_dict())
+    assert loaded.search("hello") == index.search("hello")
+
+
+def test_store_build_then_load_from_disk(store):
+    transcript = make_transcript(["深度学习入门", "梯度下降算法", "天气预报"], step=70.0)
+    built = store.build("vid", transcript)
+    assert len(built.chunks) == 3
+
+    # 新的实例没有内存缓存，只能从产物文件加载
+    fresh = QAIndexStore()
+    loaded = fresh.get("vid")
+    assert loaded is not None
+    assert loaded.search("天气预报", 1)[0]["start"] == 140.0
+    assert fresh.get("missing") is None
+
+    store.remove("vid")
+    assert QAIndexStore().get("vid") is None
+
+
+def test_answer_question_sends_only_top_chunks(store, monkeypatch):
+    store.build("vid", make_transcript(["无关内容 %d" % i for i in range(20)] + ["会议改到周三下午"], step=70.0))
+    monkeypatch.setattr(processing, "qa_index_store", store)
+    calls = []
+
+    async def fake_llm(model_type, content, prompt):
+        calls.append((model_type, content, prompt))
+        return "周三下午"
+
+    monkeypatch.setattr(processing, "agenerate_markdown_llm", fake_llm)
+    answer, hits = asyncio.run(processing.answer_question("vid", "会议改到什么时候", "DeepSeek-Coder", top_k=2))
+
+    assert answer == "周三下午"
+    assert hits[0]["text"] == "会议改到周三下午"
+    assert len(hits) <= 2
+    model_type, content, prompt = calls[0]
+    assert model_type == "deepseek-coder"
+    assert prompt == processing.QA_PROMPT
+    assert "[00:23:20 - 00:24:29] 会议改到周三下午" in content
+    assert content.count("\n[") <= 2
+
+
+def test_answer_question_without_hits_skips_llm(store, monkeypatch):
+    store.build("vid", make_transcript(["机器学习"]))
+    monkeypatch.setattr(processing, "qa_index_store", store)
+
+    async def fake_llm(*args):
+        raise AssertionError("没有命中时不应调用LLM")
+
+    monkeypatch.setattr(processing, "agenerate_markdown_llm", fake_llm)
+    answer, hits = asyncio.run(processing.answer_question("vid", "zzz"))
+    assert hits == []
+    assert "没有找到" in answer
+
+
+def test_answer_question_unknown_video(store, monkeypatch):
+    monkeypatch.setattr(processing, "qa_index_store", store)
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(processing.answer_question("no-such-video", "问题"))
@@ -0,0 +1,68 @@
+import pytest
+
+from search_index import SearchIndex, build_match_query, note_chunks, search_tokens
+
+
+def test_search_tokens_cjk_bigrams_and_words():
+    assert search_tokens("机器学习 Deep Learning") == ["机器", "器学", "学习", "deep", "learning"]
+    # 建索引时每段中文的末字追加在最后
+    assert search_tokens("机器学习和GPU", run_end=True) == ["机器", "器学", "学习", "习和", "gpu", "和"]
+    assert search_tokens("是") == ["是"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("机器学习", '"机器 器学 学习"'),
+    ("学习 python", '"学习" AND "python"'),
+    ("习", '"习"*'),
+    ("  ", None),
+    ("？！", None),
+])
+def test_build_match_query(query, expected):
+    assert build_match_query(query) == expected
+
+
+def test_note_chunks_split_on_blank_lines():
+    assert note_chunks("# 标题\n\n第一段\n第一段续\n\n  \n第二段") == ["# 标题", "第一段\n第一段续", "第二段"]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    index.index_result("v1", {
+        "transcript": [{"start": 0.0, "end": 2.5, "text": "今天讲机器学习的基本概念"},
+                       {"start": 2.5, "end": 5.0, "text": "然后是深度学习"}],
+        "brief_summary": "# 机器学习\n\n机器学习就是让机器从数据中学习，机器学习很常用",
+    }, source="https://example.com/v1")
+    index.index_result("v2", {
+        "transcript": [{"start": 10.0, "end": 12.0, "text": "机器学习入门"}],
+    })
+    return index
+
+
+def test_search_returns_segments_with_timestamps(index):
+    hits = index.search("深度学习")
+    assert hits == [{"video_id": "v1", "kind": "segment", "start": 2.5, "end": 5.0,
+                     "text": "然后是深度学习", "score": hits[0]["score"]}]
+    # 单字查询命中段末的字
+    assert "然后是深度学习" in [hit["text"] for hit in index.search("习")]
+
+
+def test_search_ranks_by_relevance_and_filters(index):
+    hits = index.search("机器学习")
+    assert len(hits) == 4
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+    # bm25按长度归一化：最短的标题段排在最前
+    assert hits[0]["text"] == "# 机器学习"
+
+    assert {hit["video_id"] for hit in index.search("机器学习", video_id="v2")} == {"v2"}
+    assert [hit["kind"] for hit in index.search("机器学习", kind="brief_summary")] == ["brief_summary"] * 2
+    assert len(index.search("机器学习", limit=2)) == 2
+    assert index.search("机器学习", limit=2, offset=2) == hits[2:]
+
+
+def test_reindex_and_remove(index):
+    index.index_result("v2", {"transcript": [{"start": 0.0, "end": 1.0, "text": "统计方法"}]})
+    assert index.search("入门") == []
+    assert [hit["video_id"] for hit in index.search("统计")] == ["v2"]
+    index.remove("v1")
+    assert index.search("深度学习") == []
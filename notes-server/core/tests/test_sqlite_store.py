@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from llm_cache import LLMCache
+from result_store import ResultStore
+from sqlite_store import SizedTable, connect
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key      TEXT PRIMARY KEY,
+        size     INTEGER NOT NULL,
+        created  REAL NOT NULL,
+        accessed REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed);
+"""
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "store.db")
+
+
+def put(conn, key, size, created=None, accessed=None):
+    now = time.time()
+    conn.execute("INSERT OR REPLACE INTO entries(key, size, created, accessed) VALUES (?, ?, ?, ?)",
+                 (key, size, created or now, accessed or now))
+
+
+def test_total_tracks_insert_replace_delete_across_connections(db_path):
+    conn = connect(db_path, SCHEMA)
+    put(conn, "existing", 5)
+    # 建表之前已有的数据计入初始总量
+    table = SizedTable(conn, "entries", "key", ttl=60, max_bytes=1000)
+    assert table.total() == 5
+
+    # 另一个worker的连接写入同一个库
+    other = connect(db_path, SCHEMA)
+    SizedTable(other, "entries", "key", ttl=60, max_bytes=1000)
+    put(other, "a", 10)
+    put(conn, "a", 30)        # REPLACE：减去旧行再加新行
+    conn.execute("UPDATE entries SET size = 7 WHERE key = 'existing'")
+    other.execute("DELETE FROM entries WHERE key = 'existing'")
+    assert table.total() == 30
+    assert table.total() == conn.execute("SELECT SUM(size) FROM entries").fetchone()[0]
+
+
+def test_evict_expired_then_least_recently_accessed(db_path):
+    conn = connect(db_path, SCHEMA)
+    table = SizedTable(conn, "entries", "key", ttl=60, max_bytes=25)
+    now = time.time()
+    put(conn, "expired", 1, created=now - 120)
+    for n in range(200):
+        put(conn, f"k{n}", 1, accessed=now - 1000 + n)
+
+    removed = table.evict(now)
+
+    assert removed[0] == "expired"
+    assert len(removed) == 1 + 175
+    assert table.total() == 25
+    left = [row[0] for row in conn.execute("SELECT key FROM entries ORDER BY accessed")]
+    assert left == [f"k{n}" for n in range(175, 200)]
+
+
+def test_llm_cache_ttl_and_size_limit(db_path):
+    cache = LLMCache(db_path, ttl=60, max_bytes=10)
+    cache.put("a", "12345")
+    assert cache.get("a") == "12345"
+
+    cache.put("b", "12345")
+    cache.get("a")             # a比b更近被访问
+    cache.put("c", "12345")
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345" and cache.get("c") == "12345"
+
+    expired = LLMCache(db_path, ttl=0, max_bytes=10)
+    time.sleep(0.01)
+    assert expired.get("a") is None
+    assert expired._table.total() == 5
+
+
+def test_result_store_eviction_drops_cached_payloads(db_path):
+    store = ResultStore(db_path, max_bytes=200)
+    store.put("old", {"text": "x" * 100})
+    store.put("new", {"text": "y" * 100})
+    assert "old" not in store._cache
+    assert store.get("old") is None
+    assert store.get("new")["text"] == "y" * 100
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+import summarizer
+from api_service import MARKDOWN_USER_PROMPT
+from summarizer import MAP_PROMPT, REDUCE_PROMPT, chunk_units, estimate_tokens, transcript_units
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("你好") == 3
+    assert estimate_tokens("abcdefgh") == 3
+    assert estimate_tokens("") == 1
+
+
+def test_transcript_units():
+    assert transcript_units([{"text": "a"}, "b"]) == ["{'text': 'a'}", "b"]
+    assert transcript_units("1\n00:00 --> 00:01\n甲\n\n2\n00:01 --> 00:02\n乙\n\n") == \
+        ["1\n00:00 --> 00:01\n甲", "2\n00:01 --> 00:02\n乙"]
+    assert transcript_units("甲\n\n") == ["甲"]
+    assert transcript_units("甲\n乙\n \n丙") == ["甲", "乙", "丙"]
+
+
+def test_chunk_units_packs_on_unit_boundaries():
+    units = [f"第{n}句" + "字" * 10 for n in range(10)]
+    chunks = chunk_units(units, budget=40)
+    assert all(estimate_tokens(chunk) <= 40 for chunk in chunks)
+    assert "\n".join(chunks).split("\n") == units
+    assert len(chunks) == 4
+
+
+def test_chunk_units_splits_oversized_unit():
+    unit = "长" * 95
+    chunks = chunk_units(["短", unit, "尾"], budget=30)
+    assert all(estimate_tokens(chunk) <= 30 for chunk in chunks)
+    assert "".join(chunks).replace("\n", "") == "短" + unit + "尾"
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def complete(model_type, content, prompt):
+        calls.append(prompt)
+        # 每次输出都接近预算，只能靠两两合并收敛
+        return "点" * 40
+
+    monkeypatch.setattr(summarizer, "_complete", complete)
+    return calls
+
+
+def test_short_transcript_is_a_single_call(calls):
+    assert asyncio.run(summarizer.summarize_transcript("短字幕", "model", budget=50)) == "点" * 40
+    assert calls == [MARKDOWN_USER_PROMPT]
+
+
+def test_reduce_converges_when_partials_do_not_shrink(calls):
+    units = ["字" * 20 for _ in range(20)]
+    asyncio.run(summarizer.summarize_transcript(units, "model", budget=50))
+    # 10块map，10 -> 5 -> 3 -> 2 -> 1 两两合并，最后一次生成最终笔记
+    assert calls.count(MAP_PROMPT) == 10
+    assert calls[10:] == [REDUCE_PROMPT] * (5 + 3 + 2 + 1 + 1)
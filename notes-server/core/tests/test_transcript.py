@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from transcript import Transcript, dumps_with_transcripts, iter_subtitle_cues, parse_subtitle_file
+
+SRT = """1
+00:00:00,000 --> 00:00:01,500
+第一句
+
+2
+00:00:01,500 --> 00:00:03,000
+第二句
+换行
+
+3
+01:02:03,456 --> 01:02:04,000
+"引号"\\
+"""
+
+VTT = """WEBVTT
+
+NOTE 注释块
+不是字幕
+
+cue-1
+00:01.000 --> 00:02.500 align:start
+hello
+
+00:00:03.000 --> 00:00:04.000
+world
+"""
+
+
+def test_parse_srt(tmp_path):
+    path = tmp_path / "a.srt"
+    path.write_text("﻿" + SRT, encoding="utf-8")
+    transcript = parse_subtitle_file(str(path))
+    assert transcript.to_dicts() == [
+        {"start": 0.0, "end": 1.5, "text": "第一句"},
+        {"start": 1.5, "end": 3.0, "text": "第二句 换行"},
+        {"start": 3723.456, "end": 3724.0, "text": '"引号"\\'},
+    ]
+
+
+def test_parse_vtt_skips_header_notes_and_cue_ids():
+    cues = list(iter_subtitle_cues(VTT.splitlines()))
+    assert cues == [(1.0, 2.5, "hello"), (3.0, 4.0, "world")]
+
+
+def test_cue_without_trailing_blank_line():
+    assert list(iter_subtitle_cues(["1", "00:00:01,000 --> 00:00:02,000", "last"])) == [(1.0, 2.0, "last")]
+
+
+def test_views_slices_and_json():
+    transcript = Transcript.from_segments([(0, 1, "a"), (1, 2, "b\nc"), (2, 3, "")])
+    assert len(transcript) == 3
+    assert transcript[1].text == "b c"
+    assert transcript[-1].to_dict() == {"start": 2, "end": 3, "text": ""}
+    assert transcript[1:3].to_dicts() == [{"start": 1.0, "end": 2.0, "text": "b c"},
+                                          {"start": 2.0, "end": 3.0, "text": ""}]
+    with pytest.raises(IndexError):
+        transcript[3]
+    assert json.loads(transcript.to_json()) == transcript.to_dicts()
+    assert json.loads(dumps_with_transcripts({"transcript": transcript, "n": 1})) == {
+        "transcript": transcript.to_dicts(), "n": 1}
+
+
+def test_empty_transcript():
+    transcript = Transcript.from_segments([])
+    assert len(transcript) == 0
+    assert transcript.to_dicts() == []
+    assert transcript.to_json() == "[]"
+
+
+@pytest.fixture
+def gapped():
+    # [0,1) [1,2) 间隔 [5,6) [6,8)
+    return Transcript.from_segments([(0, 1, "a"), (1, 2, "b"), (5, 6, "c"), (6, 8, "d")])
+
+
+@pytest.mark.parametrize("t, expected", [(0, 0), (0.5, 0), (1, 1), (1.99, 1), (2, -1), (3, -1),
+                                         (5, 2), (7.9, 3), (8, -1), (-1, -1)])
+def test_index_at(gapped, t, expected):
+    assert gapped.index_at(t) == expected
+
+
+@pytest.mark.parametrize("t_from, t_to, expected", [
+    (0, 10, (0, 4)),
+    (0.5, 1.5, (0, 2)),
+    (1, 2, (1, 2)),     # 结束时间是开区间，[0,1)不与[1,2)重叠
+    (2, 5, (2, 2)),     # 落在间隔里，没有字幕
+    (2, 5.5, (2, 3)),
+    (7, 100, (3, 4)),
+    (9, 10, (4, 4)),
+    (-5, 0, (0, 0)),
+])
+def test_window(gapped, t_from, t_to, expected):
+    assert gapped.window(t_from, t_to) == expected
+
+
+def test_window_on_empty_transcript():
+    assert Transcript.from_segments([]).window(0, 10) == (0, 0)
@@ -0,0 +1,59 @@
+import pytest
+
+import transcript_index as transcript_index_module
+from result_store import ResultStore
+from transcript_index import TranscriptIndex
+
+SEGMENTS = [{"start": 0.0, "end": 1.0, "text": "第一句"}, {"start": 1.0, "end": 2.0, "text": "第二句"}]
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    # 两个ResultStore共用一个库，模拟两个worker
+    path = str(tmp_path / "results.db")
+    local, other = ResultStore(path, revalidate=0), ResultStore(path, revalidate=0)
+    monkeypatch.setattr(transcript_index_module, "result_store", local)
+    return local, other
+
+
+def test_result_transcript_is_cached(stores):
+    local, _ = stores
+    local.put("v1", {"transcript": SEGMENTS})
+    index = TranscriptIndex()
+
+    version, transcript = index.get("v1")
+    assert version.startswith("result:")
+    assert transcript.to_dicts() == SEGMENTS
+    assert index.get("v1")[1] is transcript
+
+
+def test_deleted_result_is_not_served(stores):
+    local, other = stores
+    local.put("v1", {"transcript": SEGMENTS})
+    index = TranscriptIndex()
+    assert index.get("v1")[1] is not None
+
+    # 其它worker删除了结果
+    other.delete("v1")
+    assert index.get("v1") == (None, None)
+
+
+def test_overwritten_result_is_reloaded(stores):
+    local, other = stores
+    local.put("v1", {"transcript": SEGMENTS})
+    index = TranscriptIndex()
+    first_version, _ = index.get("v1")
+
+    other.put("v1", {"transcript": SEGMENTS[:1]})
+    version, transcript = index.get("v1")
+    assert version != first_version
+    assert len(transcript) == 1
+
+
+def test_remove_evicts_entry(stores):
+    local, _ = stores
+    local.put("v1", {"transcript": SEGMENTS})
+    index = TranscriptIndex()
+    index.get("v1")
+    index.remove("v1")
+    assert "v1" not in index._entries
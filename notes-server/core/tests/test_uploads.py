@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from base_config import UPLOAD_DIR
+from uploads import UploadOffsetError, UploadSessionStore
+
+DATA = os.urandom(300 * 1024)
+
+
+async def chunks_of(data, size=64 * 1024, fail_after=None):
+    for position in range(0, len(data), size):
+        if fail_after is not None and position >= fail_after:
+            # 模拟客户端中途断开
+            raise ConnectionResetError("client gone")
+        yield data[position:position + size]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "uploads.db")
+
+
+def test_resume_after_restart(db_path):
+    store = UploadSessionStore(db_path)
+    session = store.create("lecture.mp4", len(DATA))
+    upload_id = session["upload_id"]
+
+    session = asyncio.run(store.append(upload_id, 0, chunks_of(DATA[:100 * 1024])))
+    assert session["offset"] == 100 * 1024 and session["status"] == "uploading"
+
+    # 服务重启：新实例没有增量哈希状态，需要从已写入的部分重新计算
+    restarted = UploadSessionStore(db_path)
+    assert restarted.get(upload_id)["offset"] == 100 * 1024
+    session = asyncio.run(restarted.append(upload_id, 100 * 1024, chunks_of(DATA[100 * 1024:])))
+
+    assert session["status"] == "complete"
+    assert session["digest"] == hashlib.sha256(DATA).hexdigest()
+    with open(os.path.join(UPLOAD_DIR, session["file_id"]), "rb") as f:
+        assert f.read() == DATA
+    assert not os.path.exists(restarted.part_path(upload_id))
+
+
+def test_interrupted_chunk_keeps_received_bytes(db_path):
+    store = UploadSessionStore(db_path)
+    upload_id = store.create("a.mp4", len(DATA))["upload_id"]
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(store.append(upload_id, 0, chunks_of(DATA, fail_after=128 * 1024)))
+    received = store.get(upload_id)["offset"]
+    assert received == 128 * 1024
+
+    session = asyncio.run(store.append(upload_id, received, chunks_of(DATA[received:])))
+    assert session["digest"] == hashlib.sha256(DATA).hexdigest()
+
+
+def test_wrong_offset_is_rejected(db_path):
+    store = UploadSessionStore(db_path)
+    upload_id = store.create("a.mp4", len(DATA))["upload_id"]
+    asyncio.run(store.append(upload_id, 0, chunks_of(DATA[:1024])))
+
+    with pytest.raises(UploadOffsetError) as excinfo:
+        asyncio.run(store.append(upload_id, 0, chunks_of(DATA)))
+    assert excinfo.value.offset == 1024
+
+
+def test_oversized_upload_is_rejected(db_path):
+    store = UploadSessionStore(db_path)
+    upload_id = store.create("a.mp4", 1024)["upload_id"]
+    with pytest.raises(ValueError):
+        asyncio.run(store.append(upload_id, 0, chunks_of(DATA[:2048])))
+    assert store.get(upload_id)["status"] == "uploading"
+
+
+def test_unknown_session_and_abort(db_path):
+    store = UploadSessionStore(db_path)
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(store.append("missing", 0, chunks_of(b"x")))
+    upload_id = store.create("a.mp4", 10)["upload_id"]
+    store.abort(upload_id)
+    assert store.get(upload_id) is None
+    assert not os.path.exists(store.part_path(upload_id))
+    with pytest.raises(ValueError):
+        store.create("empty.mp4", 0)
+
+
+def test_session_locks_only_for_live_sessions(db_path):
+    store = UploadSessionStore(db_path)
+    for _ in range(3):
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(store.append("missing", 0, chunks_of(b"x")))
+    assert store._session_locks == {}
+
+    upload_id = store.create("a.mp4", len(DATA))["upload_id"]
+    asyncio.run(store.append(upload_id, 0, chunks_of(DATA[:1024])))
+    assert list(store._session_locks) == [upload_id]
+
+    session = asyncio.run(store.append(upload_id, 1024, chunks_of(DATA[1024:])))
+    assert session["status"] == "complete"
+    assert store._session_locks == {}
+    # 已完成的会话重复提交最后一片：直接返回结果，不再创建锁
+    assert asyncio.run(store.append(upload_id, 1024, chunks_of(b"")))["file_id"] == session["file_id"]
+    assert store._session_locks == {}
+
+
+def test_release_upload_purges_derived_results(tmp_path, monkeypatch):
+    import qa_index
+    import uploads
+    from artifacts import ArtifactStore, job_key
+    from result_store import ResultStore
+    from search_index import SearchIndex
+    from transcript import Transcript
+
+    artifacts = ArtifactStore(str(tmp_path / "artifacts.db"))
+    results = ResultStore(str(tmp_path / "results.db"))
+    search = SearchIndex(str(tmp_path / "search.db"))
+    for module, name, value in [(uploads, "artifact_store", artifacts), (qa_index, "artifact_store", artifacts),
+                                (uploads, "result_store", results), (uploads, "search_index", search)]:
+        monkeypatch.setattr(module, name, value)
+
+    file_id = "clip.mp4"
+    (tmp_path / file_id).write_bytes(b"video")
+    artifacts.put("clip", "video", str(tmp_path / file_id))
+    artifacts.acquire("clip")
+    artifacts.acquire("clip")
+    result = {"transcript": [{"start": 0.0, "end": 1.0, "text": "机器学习"}]}
+    for video_id, model in [("r1", None), ("r2", "fasterwhisper_tiny")]:
+        results.put(video_id, result, file_id, job_key(file_id, False, model))
+        search.index_result(video_id, result, file_id)
+        uploads.qa_index_store.build(video_id, Transcript.from_dicts(result["transcript"]))
+    # 文件名以同样前缀开头的其它上传不受影响
+    results.put("other", result, "clip.mp4.mp4", job_key("clip.mp4.mp4", False))
+
+    assert uploads.release_upload(file_id) == 1
+    assert results.get("r1") is not None
+
+    assert uploads.release_upload(file_id) == 0
+    assert results.get("r1") is None and results.get("r2") is None
+    assert results.get("other") is not None
+    assert {hit["video_id"] for hit in search.search("机器")} == set()
+    assert uploads.qa_index_store.get("r1") is None
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import processing
+
+
+@pytest.fixture
+def slow_fetch(monkeypatch, tmp_path):
+    """代替yt-dlp下载：release之前视频一直在下载中."""
+    video = tmp_path / "vid.mp4"
+    state = {"calls": 0, "release": None}
+    videos = {}
+
+    async def fetch_video(video_id):
+        state["calls"] += 1
+        await state["release"].wait()
+        video.write_bytes(b"0123456789")
+        videos[video_id] = str(video)
+        return str(video)
+
+    monkeypatch.setattr(processing, "_fetch_video", fetch_video)
+    monkeypatch.setattr(main, "VIDEO_FETCH_WAIT", 0.05)
+    monkeypatch.setattr(processing.artifact_store, "get",
+                        lambda video_id, kind, *args: videos.get(video_id) if kind == "video" else None)
+    return state
+
+
+def test_video_in_progress_returns_503_then_serves(slow_fetch):
+    with TestClient(main.app) as client:
+        slow_fetch["release"] = client.portal.call(asyncio.Event)
+
+        response = client.get("/video/vid.mp4")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == str(main.VIDEO_FETCH_RETRY_AFTER)
+        # 重试时等待同一个下载任务，不重复下载
+        assert client.get("/video/vid.mp4").status_code == 503
+
+        client.portal.call(slow_fetch["release"].set)
+        response = client.get("/video/vid.mp4", headers={"Range": "bytes=0-3"})
+        assert response.status_code == 206 and response.content == b"0123"
+    assert slow_fetch["calls"] == 1
+
+
+def test_video_without_source_is_404(monkeypatch):
+    monkeypatch.setattr(processing.artifact_store, "get", lambda *args: None)
+    monkeypatch.setattr(processing.artifact_store, "sources_for", lambda video_id: [])
+    with TestClient(main.app) as client:
+        assert client.get("/video/unknown.mp4").status_code == 404
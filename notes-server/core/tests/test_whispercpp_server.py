@@ -0,0 +1,76 @@
+import socket
+import sys
+
+import pytest
+
+from whispercpp_server import WhisperCppServer
+
+# 代替whisper.cpp server的脚本：按 --port 监听，/inference 返回固定字幕
+FAKE_SERVER = """#!{python}
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = b"1\\n00:00:00,000 --> 00:00:01,000\\nhello\\n"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+port = int(sys.argv[sys.argv.index("--port") + 1])
+HTTPServer(("127.0.0.1", port), Handler).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def binary(tmp_path):
+    path = tmp_path / "server"
+    path.write_text(FAKE_SERVER.format(python=sys.executable))
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def workers(binary):
+    # 两个实例模拟两个uvicorn worker，共用同一端口和锁文件
+    port = free_port()
+    servers = [WhisperCppServer(binary=binary, port=port) for _ in range(2)]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def test_second_worker_reuses_running_server(workers):
+    first, second = workers
+    assert first.inference(b"RIFF").strip().endswith("hello")
+    assert first.is_running()
+
+    assert second.inference(b"RIFF").strip().endswith("hello")
+    assert not second.is_running()
+
+
+def test_any_worker_respawns_crashed_server(workers):
+    first, second = workers
+    first.ensure_running()
+    first._proc.kill()
+    first._proc.wait()
+
+    # 启动它的worker还活着，但另一个worker的请求同样会重启server
+    assert second.inference(b"RIFF").strip().endswith("hello")
+    assert second.is_running()
+
+    # 原来的worker不会再启动一个，而是连接已重启的server
+    first.ensure_running()
+    assert first._proc is not None and not first.is_running()
+    assert first.inference(b"RIFF").strip().endswith("hello")
@@ -0,0 +1,192 @@
+# backend/app/transcript.py
+import json
+from array import array
+from bisect import bisect_left, bisect_right
+from json.encoder import encode_basestring
+from typing import Iterable, Iterator, Tuple
+
+"""
+列式字幕：开始/结束时间存放在array('d')中，全部文本拼成一个字符串(段间以换行分隔)并记录偏移，
+每段只在访问时生成带__slots__的轻量视图，不再为每段创建dict或Pydantic对象。
+parse_subtitle_file单遍流式解析SRT/VTT；to_json直接拼出JSON数组，跳过逐段的对象转换。
+starts有序，按时间定位(index_at/window)用二分查找。
+"""
+
+
+class SegmentView:
+    __slots__ = ("_transcript", "_index")
+
+    def __init__(self, transcript: "Transcript", index: int):
+        self._transcript = transcript
+        self._index = index
+
+    @property
+    def start(self) -> float:
+        return self._transcript.starts[self._index]
+
+    @property
+    def end(self) -> float:
+        return self._transcript.ends[self._index]
+
+    @property
+    def text(self) -> str:
+        return self._transcript.text_at(self._index)
+
+    def to_dict(self) -> dict:
+        return {"start": self.start, "end": self.end, "text": self.text}
+
+    def __repr__(self):
+        return f"SegmentView({self.start}, {self.end}, {self.text!r})"
+
+
+class Transcript:
+    __slots__ = ("starts", "ends", "text", "offsets")
+
+    def __init__(self, starts: array, ends: array, text: str, offsets: array):
+        # offsets[i]为第i段在text中的起始位置，offsets[-1] = len(text) + 1
+        self.starts = starts
+        self.ends = ends
+        self.text = text
+        self.offsets = offsets
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Tuple[float, float, str]]) -> "Transcript":
+        starts, ends, offsets, texts = array("d"), array("d"), array("q", [0]), []
+        position = 0
+        for start, end, text in segments:
+            text = text.replace("\n", " ")
+            starts.append(start)
+            ends.append(end)
+            texts.append(text)
+            position += len(text) + 1
+            offsets.append(position)
+        return cls(starts, ends, "\n".join(texts), offsets)
+
+    @classmethod
+    def from_dicts(cls, segments: Iterable[dict]) -> "Transcript":
+        return cls.from_segments((seg["start"], seg["end"], seg["text"]) for seg in segments)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("Transcript只支持连续切片.")
+            return self.slice(start, stop)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return SegmentView(self, index)
+
+    def __iter__(self) -> Iterator[SegmentView]:
+        for index in range(len(self)):
+            yield SegmentView(self, index)
+
+    def text_at(self, index: int) -> str:
+        return self.text[self.offsets[index]:self.offsets[index + 1] - 1]
+
+    def texts(self) -> Iterator[str]:
+        return iter(self.text.split("\n")) if len(self) else iter(())
+
+    def slice(self, start: int, stop: int) -> "Transcript":
+        if stop <= start:
+            return Transcript(array("d"), array("d"), "", array("q", [0]))
+        base = self.offsets[start]
+        offsets = array("q", (offset - base for offset in self.offsets[start:stop + 1]))
+        return Transcript(self.starts[start:stop], self.ends[start:stop],
+                          self.text[base:self.offsets[stop] - 1], offsets)
+
+    def index_at(self, t: float) -> int:
+        """时间t所在的字幕段下标；t落在两段之间或范围外时返回-1."""
+        index = bisect_right(self.starts, t) - 1
+        if index >= 0 and t < self.ends[index]:
+            return index
+        return -1
+
+    def window(self, t_from: float, t_to: float) -> Tuple[int, int]:
+        """与[t_from, t_to)有重叠的字幕段下标范围[lo, hi)."""
+        lo = max(0, bisect_right(self.starts, t_from) - 1)
+        if lo < len(self) and self.ends[lo] <= t_from:
+            lo += 1
+        hi = bisect_left(self.starts, t_to, lo)
+        return lo, max(lo, hi)
+
+    def to_dicts(self) -> list:
+        return [{"start": start, "end": end, "text": text}
+                for start, end, text in zip(self.starts, self.ends, self.texts())]
+
+    def to_json(self) -> str:
+        """直接编码为 [{"start":..,"end":..,"text":..}, ...]."""
+        return "[" + ",".join(
+            f'{{"start":{start!r},"end":{end!r},"text":{encode_basestring(text)}}}'
+            for start, end, text in zip(self.starts, self.ends, self.texts())) + "]"
+
+
+def _timestamp(value: str) -> float:
+    # 00:01:02,345 (SRT) / 00:01:02.345 或 01:02.345 (VTT)
+    if len(value) == 12 and value[2] == ":" and value[5] == ":":
+        # 定长格式的快速路径
+        return int(value[:2]) * 3600 + int(value[3:5]) * 60 + int(value[6:8]) + int(value[9:]) / 1000
+    parts = value.replace(",", ".").split(":")
+    seconds = float(parts[-1])
+    if len(parts) > 1:
+        seconds += int(parts[-2]) * 60
+    if len(parts) > 2:
+        seconds += int(parts[-3]) * 3600
+    return seconds
+
+
+def iter_subtitle_cues(lines: Iterable[str]) -> Iterator[Tuple[float, float, str]]:
+    """
+    单遍解析SRT/VTT，产出(start, end, text)。
+    时间行开始一条字幕，空行结束；字幕外的行(序号、WEBVTT头、NOTE、cue标识)全部跳过，多行文本以空格连接。
+    """
+    start = end = None
+    text_lines = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if start is not None:
+                yield start, end, " ".join(text_lines)
+                start, text_lines = None, []
+            continue
+        if "-->" in line:
+            head, _, tail = line.partition("-->")
+            try:
+                cue_start, cue_end = _timestamp(head.strip()), _timestamp(tail.split()[0])
+            except (ValueError, IndexError):
+                cue_start = None
+            if cue_start is not None:
+                if start is not None:
+                    yield start, end, " ".join(text_lines)
+                start, end, text_lines = cue_start, cue_end, []
+                continue
+        if start is not None:
+            text_lines.append(line)
+    if start is not None:
+        yield start, end, " ".join(text_lines)
+
+
+def parse_subtitle_file(path: str) -> Transcript:
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return Transcript.from_segments(iter_subtitle_cues(f))
+
+
+def dumps_with_transcripts(obj) -> str:
+    """json.dumps，遇到Transcript时直接嵌入其to_json()结果."""
+    encoded = {}
+
+    def default(value):
+        if isinstance(value, Transcript):
+            token = f"\0transcript{id(value)}\0"
+            encoded[json.dumps(token)] = value.to_json()
+            return token
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    result = json.dumps(obj, ensure_ascii=False, default=default)
+    for token, value in encoded.items():
+        result = result.replace(token, value, 1)
+    return result
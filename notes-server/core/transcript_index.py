@@ -0,0 +1,74 @@
+# backend/app/transcript_index.py
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from base_config import *
+from artifacts import artifact_store
+from result_store import result_store
+from transcript import Transcript, parse_subtitle_file
+
+"""
+字幕时间索引：按video_id加载列式字幕(处理结果或字幕产物)，LRU常驻内存，
+播放器按时间窗口/当前时间分页拉取附近的字幕，不必一次下载整份字幕。
+"""
+
+
+class TranscriptIndex:
+    def __init__(self, max_entries: int = TRANSCRIPT_INDEX_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _version(self, video_id: str):
+        """当前数据的版本标识：处理结果按创建时间，字幕产物按路径和mtime/size；都不存在时返回None."""
+        created = result_store.created(video_id)
+        if created is not None:
+            return f"result:{created}"
+        path = artifact_store.latest(video_id, "transcript")
+        if path is None or not os.path.exists(path):
+            return None
+        st = os.stat(path)
+        return f"{path}:{st.st_mtime_ns}:{st.st_size}"
+
+    def _load(self, video_id: str):
+        """返回(版本标识, Transcript)；处理结果优先，其次最新的字幕产物文件."""
+        version = self._version(video_id)
+        if version is None:
+            return None, None
+        if version.startswith("result:"):
+            payload = result_store.get_json(video_id)
+            if payload is not None:
+                return version, Transcript.from_dicts(json.loads(payload).get("transcript") or [])
+            # 读取期间结果已被删除，按字幕产物重新确定版本
+            version = self._version(video_id)
+            if version is None:
+                return None, None
+        return version, parse_subtitle_file(version.rsplit(":", 2)[0])
+
+    def get(self, video_id: str):
+        """返回(版本标识, Transcript)，不存在时返回(None, None)."""
+        with self._lock:
+            entry = self._entries.get(video_id)
+        # 处理结果被删除/覆盖、字幕文件重新生成(mtime/size变化)后失效
+        if entry is not None and entry[0] == self._version(video_id):
+            with self._lock:
+                self._entries.move_to_end(video_id)
+            return entry
+        entry = self._load(video_id)
+        with self._lock:
+            if entry[1] is None:
+                self._entries.pop(video_id, None)
+                return entry
+            self._entries[video_id] = entry
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def remove(self, video_id: str):
+        with self._lock:
+            self._entries.pop(video_id, None)
+
+transcript_index = TranscriptIndex()
@@ -0,0 +1,251 @@
+# backend/app/uploads.py
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Tuple
+
+from base_config import *
+from sqlite_store import connect
+from executor import run_io
+from artifacts import artifact_store, atomic_write, content_source, job_source
+from result_store import result_store
+from search_index import search_index
+from qa_index import qa_index_store
+from transcript_index import transcript_index
+
+"""
+流式上传：请求体按块写入磁盘并同时计算sha256，内存占用与文件大小无关；
+内容相同的文件只保存一份(按sha256去重并记引用计数)。
+可续传的分片上传：
+POST   /upload/sessions             创建会话，返回upload_id
+PUT    /upload/sessions/{id}?offset 从offset追加一个分片(offset必须等于已接收字节数)
+GET    /upload/sessions/{id}        查询已接收字节数，断线后从该位置继续
+会话状态保存在SQLite中，服务重启后仍可续传(哈希状态丢失时从已写入的部分重新计算)。
+"""
+
+UPLOAD_SESSION_DB = UPLOAD_DIR + "uploads.db"
+
+
+class UploadOffsetError(ValueError):
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+def _write_block(f, hasher, block: bytes):
+    f.write(block)
+    hasher.update(block)
+
+
+async def stream_to_file(chunks: AsyncIterator[bytes], f, hasher, limit: int = None) -> int:
+    """把异步分块写入已打开的文件并更新哈希，攒够UPLOAD_WRITE_BUFFER再写，返回写入的字节数."""
+    written = 0
+    buffer = bytearray()
+    try:
+        async for chunk in chunks:
+            if limit is not None and written + len(buffer) + len(chunk) > limit:
+                raise ValueError("上传数据超过声明的文件大小.")
+            buffer += chunk
+            if len(buffer) >= UPLOAD_WRITE_BUFFER:
+                await run_io(_write_block, f, hasher, bytes(buffer))
+                written += len(buffer)
+                buffer.clear()
+    finally:
+        # 中途断开时已收到的数据同样落盘，续传从这里开始
+        if buffer:
+            await run_io(_write_block, f, hasher, bytes(buffer))
+            written += len(buffer)
+        await run_io(f.flush)
+    return written
+
+
+def register_uploaded_file(file_id: str, digest: str) -> str:
+    """
+    登记上传完成的文件并增加引用计数，返回最终的file_id。
+    内容哈希已存在时删除刚上传的副本，复用已有文件(及其字幕、笔记缓存)。
+    """
+    video_id = os.path.splitext(file_id)[0]
+    file_path = os.path.join(UPLOAD_DIR, file_id)
+    source_key = content_source(digest)
+    # 先登记产物再抢占来源：并发上传相同内容时只有一个video_id胜出
+    artifact_store.put(video_id, "video", file_path)
+    owner = artifact_store.claim_source(source_key, video_id)
+    if owner != video_id:
+        owner_path = artifact_store.get(owner, "video")
+        if owner_path:
+            artifact_store.remove(video_id, "video")
+            os.remove(file_path)
+            artifact_store.acquire(owner)
+            print(f"上传内容重复，复用已有文件: {owner_path}")
+            return os.path.basename(owner_path)
+        # 原文件已被删除，来源改指向新上传的文件
+        artifact_store.register_source(source_key, video_id)
+    artifact_store.acquire(video_id)
+    return file_id
+
+
+async def save_upload(chunks: AsyncIterator[bytes], ext: str) -> Tuple[str, str]:
+    """一次性上传：边收边写临时文件，完成后原子替换，返回(file_id, sha256)."""
+    file_id = f"{uuid.uuid4()}{ext}"
+    hasher = hashlib.sha256()
+    with atomic_write(os.path.join(UPLOAD_DIR, file_id), "wb") as f:
+        await stream_to_file(chunks, f, hasher)
+    digest = hasher.hexdigest()
+    return await run_io(register_uploaded_file, file_id, digest), digest
+
+
+def release_upload(file_id: str):
+    """
+    释放一次上传引用，返回剩余计数；不是登记过的上传返回None。
+    计数归零时删除文件及其字幕等产物，以及由它生成的处理结果、全文索引和问答索引。
+    """
+    remaining = artifact_store.release(os.path.splitext(file_id)[0])
+    if remaining == 0:
+        for video_id in result_store.delete_for_source(job_source(file_id, False)):
+            search_index.remove(video_id)
+            qa_index_store.remove(video_id)
+            transcript_index.remove(video_id)
+    return remaining
+
+
+class UploadSessionStore:
+    def __init__(self, db_path: str = UPLOAD_SESSION_DB, ttl: float = UPLOAD_SESSION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = connect(db_path, """
+            CREATE TABLE IF NOT EXISTS upload_sessions (
+                upload_id TEXT PRIMARY KEY,
+                filename  TEXT,
+                ext       TEXT NOT NULL,
+                size      INTEGER NOT NULL,
+                received  INTEGER NOT NULL,
+                status    TEXT NOT NULL,
+                digest    TEXT,
+                file_id   TEXT,
+                created   REAL NOT NULL,
+                updated   REAL NOT NULL
+            );
+        """)
+        # 进行中会话的增量哈希与互斥锁(同一会话的分片串行写入)
+        self._hashers: dict = {}
+        self._session_locks: dict = {}
+
+    def _execute(self, sql: str, args: tuple = ()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    @staticmethod
+    def part_path(upload_id: str) -> str:
+        return f"{UPLOAD_DIR}{upload_id}.part"
+
+    def get(self, upload_id: str):
+        rows = self._execute("SELECT upload_id, filename, size, received, status, digest, file_id "
+                             "FROM upload_sessions WHERE upload_id = ?", (upload_id,))
+        if not rows:
+            return None
+        keys = ("upload_id", "filename", "size", "offset", "status", "digest", "file_id")
+        return dict(zip(keys, rows[0]))
+
+    def create(self, filename: str, size: int) -> dict:
+        if size <= 0:
+            raise ValueError("文件大小必须大于0.")
+        self.expire()
+        upload_id = str(uuid.uuid4())
+        now = time.time()
+        self._execute("INSERT INTO upload_sessions(upload_id, filename, ext, size, received, status, created, updated) "
+                      "VALUES (?, ?, ?, ?, 0, 'uploading', ?, ?)",
+                      (upload_id, filename, os.path.splitext(filename or "")[1], size, now, now))
+        open(self.part_path(upload_id), "wb").close()
+        return self.get(upload_id)
+
+    def _hasher(self, upload_id: str, received: int):
+        hasher = self._hashers.get(upload_id)
+        if hasher is None:
+            # 服务重启后哈希状态丢失：从已写入的部分重新计算
+            hasher = hashlib.sha256()
+            with open(self.part_path(upload_id), "rb") as f:
+                remaining = received
+                while remaining > 0:
+                    block = f.read(min(UPLOAD_WRITE_BUFFER, remaining))
+                    if not block:
+                        break
+                    hasher.update(block)
+                    remaining -= len(block)
+            self._hashers[upload_id] = hasher
+        return hasher
+
+    def _open_part(self, upload_id: str, received: int):
+        f = open(self.part_path(upload_id), "r+b")
+        # 截掉上次中断时可能写入但未记录的尾部
+        f.truncate(received)
+        f.seek(received)
+        return f
+
+    def _close_part(self, upload_id: str, f) -> int:
+        """关闭分片文件并记录已接收的字节数."""
+        try:
+            received = f.tell()
+        finally:
+            f.close()
+        self._execute("UPDATE upload_sessions SET received = ?, updated = ? WHERE upload_id = ?",
+                      (received, time.time(), upload_id))
+        return received
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> dict:
+        """从offset追加一个分片；收到全部字节后原子改名为正式文件并登记产物."""
+        session = await run_io(self.get, upload_id)
+        if session is None:
+            raise FileNotFoundError(f"上传会话{upload_id}不存在.")
+        if session["status"] != "uploading":
+            return session
+        # 只为存在且未完成的会话创建锁，完成/中止时移除
+        lock = self._session_locks.setdefault(upload_id, asyncio.Lock())
+        async with lock:
+            # 等锁期间其它分片可能已写入，重新读取
+            session = await run_io(self.get, upload_id)
+            if session is None:
+                raise FileNotFoundError(f"上传会话{upload_id}不存在.")
+            if session["status"] != "uploading":
+                return session
+            if offset != session["offset"]:
+                raise UploadOffsetError(f"offset应为{session['offset']}.", session["offset"])
+            received = session["offset"]
+            hasher = await run_io(self._hasher, upload_id, received)
+            f = await run_io(self._open_part, upload_id, received)
+            try:
+                await stream_to_file(chunks, f, hasher, limit=session["size"] - received)
+            finally:
+                received = await run_io(self._close_part, upload_id, f)
+            if received == session["size"]:
+                await run_io(self._finalize, upload_id)
+            return await run_io(self.get, upload_id)
+
+    def _finalize(self, upload_id: str):
+        ext = self._execute("SELECT ext FROM upload_sessions WHERE upload_id = ?", (upload_id,))[0][0]
+        digest = self._hashers.pop(upload_id).hexdigest()
+        file_id = f"{upload_id}{ext}"
+        os.replace(self.part_path(upload_id), os.path.join(UPLOAD_DIR, file_id))
+        file_id = register_uploaded_file(file_id, digest)
+        self._execute("UPDATE upload_sessions SET status = 'complete', digest = ?, file_id = ?, updated = ? "
+                      "WHERE upload_id = ?", (digest, file_id, time.time(), upload_id))
+        self._session_locks.pop(upload_id, None)
+
+    def abort(self, upload_id: str):
+        self._hashers.pop(upload_id, None)
+        self._session_locks.pop(upload_id, None)
+        if os.path.exists(self.part_path(upload_id)):
+            os.remove(self.part_path(upload_id))
+        self._execute("DELETE FROM upload_sessions WHERE upload_id = ?", (upload_id,))
+
+    def expire(self):
+        """清理超过TTL仍未完成的会话及其分片文件."""
+        rows = self._execute("SELECT upload_id FROM upload_sessions WHERE status = 'uploading' AND updated < ?",
+                             (time.time() - self.ttl,))
+        for (upload_id,) in rows:
+            self.abort(upload_id)
+
+
+upload_sessions = UploadSessionStore()
@@ -0,0 +1,139 @@
+# backend/app/whispercpp_server.py
+import atexit
+import contextlib
+import os
+import socket
+import subprocess
+import threading
+import time
+
+import requests
+
+from base_config import *
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，按单worker部署处理(启动锁只在进程内生效)
+    fcntl = None
+
+"""
+常驻的whisper.cpp server进程：
+模型(ggml-*.bin)只加载一次并保持映射，任务通过本地HTTP(/inference)提交，
+进程崩溃后下一次请求会自动重启，避免每个视频都重新启动main并加载1.5GB模型。
+多个uvicorn worker共用同一个server：端口不可连接时，发起请求的worker获取锁文件(UPLOAD_DIR下按端口区分)，
+再次确认端口仍不可连接后启动server，其它worker等锁释放后直接连接，保证同一时间只启动一个。
+"""
+
+
+class WhisperCppServer:
+    def __init__(self, binary: str = WHISPERCPP_SERVER, model: str = WHISPERCPP_MODEL,
+                 host: str = "127.0.0.1", port: int = WHISPERCPP_SERVER_PORT):
+        self.binary = binary
+        self.model_path = f'{WHISPERCPP_PATH}/models/ggml-{model}.bin'
+        self.host = host
+        self.port = port
+        self._proc = None
+        self._lock = threading.Lock()
+        self.lock_path = f"{UPLOAD_DIR}whispercpp_server.{port}.lock"
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def is_running(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _reachable(self) -> bool:
+        try:
+            with socket.create_connection((self.host, self.port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def _wait_ready(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._proc is not None and self._proc.poll() is not None:
+                raise IOError(f"whisper.cpp server启动失败，退出码 {self._proc.returncode}.")
+            if self._reachable():
+                return
+            time.sleep(0.2)
+        raise IOError(f"whisper.cpp server启动超时({timeout}s).")
+
+    @contextlib.contextmanager
+    def _spawn_lock(self):
+        """跨worker的启动锁(阻塞文件锁)：其它worker正在启动时等待其完成."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _start(self):
+        if not os.path.exists(self.binary):
+            raise FileNotFoundError(f"未找到whisper.cpp server: {self.binary}")
+        command = [self.binary, "-m", self.model_path, "--host", self.host, "--port", str(self.port),
+                   "-t", str(WHISPERCPP_THREADS)]
+        print(f"启动whisper.cpp server: {' '.join(command)}")
+        self._proc = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._wait_ready(WHISPERCPP_SERVER_START_TIMEOUT)
+
+    def ensure_running(self):
+        """保证端口上有可用的server：本worker启动的进程存活或端口可连接则直接使用，否则加锁后(重新)启动."""
+        with self._lock:
+            if self.is_running() or self._reachable():
+                return
+            with self._spawn_lock():
+                # 等锁期间其它worker可能已经启动了server
+                if self._reachable():
+                    return
+                if self._proc is not None:
+                    print(f"whisper.cpp server已退出(code={self._proc.returncode})，重启中...")
+                    self._proc = None
+                self._start()
+
+    def _stop(self):
+        if self.is_running():
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+        self._proc = None
+
+    def stop(self):
+        with self._lock:
+            self._stop()
+
+    def inference(self, audio, response_format: str = "srt", **fields):
+        """
+        提交一次转写任务。audio为wav文件路径或wav字节内容，
+        fields透传给/inference(language, prompt, translate, temperature...)。
+        """
+        data = dict(fields, response_format=response_format)
+        timeout = (WHISPERCPP_CONNECT_TIMEOUT, WHISPERCPP_INFERENCE_TIMEOUT)
+        for attempt in range(2):
+            self.ensure_running()
+            try:
+                if isinstance(audio, (bytes, bytearray, memoryview)):
+                    files = {"file": ("audio.wav", audio, "audio/wav")}
+                    response = requests.post(f"{self.url}/inference", files=files, data=data, timeout=timeout)
+                else:
+                    with open(audio, "rb") as f:
+                        files = {"file": (os.path.basename(audio), f, "audio/wav")}
+                        response = requests.post(f"{self.url}/inference", files=files, data=data, timeout=timeout)
+                response.raise_for_status()
+                return response.json() if response_format.endswith("json") else response.text
+            except requests.ConnectionError:
+                # 请求过程中server崩溃：下一轮ensure_running只在端口确实不可连接时重启，不会打断其它请求
+                if attempt:
+                    raise
+                print("whisper.cpp server连接失败，重试.")
+
+
+whispercpp_server = WhisperCppServer()
+atexit.register(whispercpp_server.stop)